@@ -0,0 +1 @@
+# Benchmark scripts. Run from the repo root, e.g. `python -m benchmarks.bench_image_preprocess`.
@@ -0,0 +1,142 @@
+"""
+Database throughput under concurrent requests for three engine setups:
+
+  legacy   create_engine(url) defaults (rollback journal), sync sessions in the threadpool
+  tuned    pool sizing + WAL/pragmas, sync sessions in the threadpool
+  async    pool sizing + WAL/pragmas on aiosqlite, DAOs via AsyncSession.run_sync
+
+Each setup gets a fresh copy of the same pre-filled database; --concurrency tasks then run a
+read-heavy mix (a 30-day rollup read, or a meal insert + summary bump with --write-ratio)
+for --ops operations in total.
+
+  python -m benchmarks.bench_db --concurrency 64 --ops 5000 --write-ratio 0.2
+"""
+import argparse
+import asyncio
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from benchmarks.bench_meal_history import FIRST_DAY, DAYS, _fill
+from benchmarks.harness import percentile
+from server.app.dbs import session as db_session
+from server.app.dbs.daos import MealRecordDAO
+from server.app.dbs.models import DailyNutritionSummary, MealRecord
+
+USERS = 500
+
+
+def _sync_runner(url: str, tuned: bool):
+  engine = create_engine(url, **db_session.engine_options(db_session.make_url(url))) if tuned else create_engine(url)
+  if tuned:
+    event.listen(engine, "connect", db_session._set_sqlite_pragmas)
+  factory = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+  async def run(fn, *args):
+    def call():
+      with factory() as db:
+        return fn(*args, db)
+
+    return await run_in_threadpool(call)
+
+  async def close():
+    engine.dispose()
+
+  return run, close
+
+
+def _async_runner(url: str):
+  async_url = db_session.async_url_for(url)
+  engine = create_async_engine(async_url, **db_session.engine_options(async_url))
+  event.listen(engine.sync_engine, "connect", db_session._set_sqlite_pragmas)
+  factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+  async def run(fn, *args):
+    async with factory() as db:
+      return await db.run_sync(lambda session: fn(*args, session))
+
+  async def close():
+    await engine.dispose()
+
+  return run, close
+
+
+async def _drive(run, concurrency: int, ops: int, write_ratio: float) -> tuple[float, list[float], int]:
+  rnd = random.Random(7)
+  counter = iter(range(ops))
+  latencies: list[float] = []
+  errors = 0
+  last_day = FIRST_DAY + timedelta(days=DAYS - 1)
+
+  async def worker() -> None:
+    nonlocal errors
+    for _ in counter:
+      user = f"user{rnd.randrange(USERS)}"
+      start = time.perf_counter()
+      try:
+        if rnd.random() < write_ratio:
+          now = datetime.now(timezone.utc)
+          record = MealRecord(user_id=user, eaten_at=now, day=last_day, foods="[]", calories=500.0, weight=300.0)
+          await run(MealRecordDAO.create, record)
+        else:
+          await run(MealRecordDAO.list_daily, user, last_day - timedelta(days=29), last_day)
+      except Exception as e:  # noqa: BLE001
+        errors += 1
+        if errors == 1:
+          print(f"  first error: {e}")
+      latencies.append((time.perf_counter() - start) * 1000)
+
+  start = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  return time.perf_counter() - start, latencies, errors
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--concurrency", type=int, default=64)
+  parser.add_argument("--ops", type=int, default=5000)
+  parser.add_argument("--write-ratio", type=float, default=0.2)
+  parser.add_argument("--rows", type=int, default=100_000, help="meals pre-filled before each run")
+  args = parser.parse_args()
+
+  workdir = Path(tempfile.mkdtemp())
+  template = workdir / "template.db"
+  template_engine = create_engine(f"sqlite:///{template}")
+  SQLModel.metadata.create_all(template_engine, tables=[MealRecord.__table__, DailyNutritionSummary.__table__])
+  _fill(template_engine, args.rows, USERS)
+  template_engine.dispose()
+
+  print(f"concurrency={args.concurrency} ops={args.ops} write_ratio={args.write_ratio} prefilled_meals={args.rows}")
+  print(f"{'setup':>8} {'ops/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'errors':>7}")
+  for name in ("legacy", "tuned", "async"):
+    path = workdir / f"{name}.db"
+    shutil.copy(template, path)
+    url = f"sqlite:///{path}"
+    run, close = _async_runner(url) if name == "async" else _sync_runner(url, tuned=(name == "tuned"))
+
+    async def bench():
+      try:
+        return await _drive(run, args.concurrency, args.ops, args.write_ratio)
+      finally:
+        await close()
+
+    wall, latencies, errors = asyncio.run(bench())
+    print(
+      f"{name:>8} {len(latencies) / wall:8.0f} {percentile(latencies, 50):8.2f} {percentile(latencies, 95):8.2f} "
+      f"{percentile(latencies, 99):8.2f} {errors:7d}"
+    )
+  shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+  main()
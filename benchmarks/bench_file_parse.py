@@ -0,0 +1,75 @@
+"""
+Document parsing benchmark over synthetic PDFs/DOCX of increasing size.
+
+Compares the previous path (temp file round trip, serial full extraction) with
+file_service.extract_text: in-memory, process-pool page batches for large PDFs,
+and early stop at FILE_PARSE_CHAR_LIMIT (TEXT_LIMIT by default). "full" disables the early stop to show
+the page-parallel speed-up on its own.
+
+  python -m benchmarks.bench_file_parse --pages 10 50 200 500
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import docx  # type: ignore
+from PyPDF2 import PdfReader  # type: ignore
+
+from benchmarks.corpus import make_docx, make_pdf
+from server.app.core.config import settings
+from server.app.services import file_service
+
+
+def _legacy_parse(data: bytes, ext: str) -> str:
+  with tempfile.NamedTemporaryFile(suffix=f".{ext}", delete=False) as out:
+    out.write(data)
+    path = out.name
+  try:
+    if ext == "pdf":
+      raw = "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    else:
+      raw = "\n".join(p.text for p in docx.Document(path).paragraphs)
+  finally:
+    os.remove(path)
+  return file_service.sanitize_text(raw)
+
+
+def _time(fn, repeat: int) -> float:
+  samples = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    samples.append((time.perf_counter() - start) * 1000)
+  return statistics.median(samples)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200, 500])
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  limit = file_service.parse_char_limit()
+  workers = settings.FILE_PARSE_WORKERS or os.cpu_count()
+  print(f"char_limit={limit} workers={workers} parallel_min_pages={settings.FILE_PDF_PARALLEL_MIN_PAGES}")
+  print(f"{'doc':>12} {'KB':>7} {'legacy_ms':>10} {'limited_ms':>11} {'full_ms':>9} {'speedup_lim':>11} {'speedup_full':>12}")
+  try:
+    for pages in args.pages:
+      for ext, data in (("pdf", make_pdf(pages)), ("docx", make_docx(pages * 10))):
+        file_service.extract_text(data, ext, limit)  # warm the process pool
+        legacy = _time(lambda: _legacy_parse(data, ext), args.repeat)
+        limited = _time(lambda: file_service.extract_text(data, ext, limit), args.repeat)
+        full = _time(lambda: file_service.extract_text(data, ext, 10**9), args.repeat)
+        label = f"{ext}:{pages}p" if ext == "pdf" else f"{ext}:{pages * 10}par"
+        print(
+          f"{label:>12} {len(data) / 1024:7.0f} {legacy:10.1f} {limited:11.1f} {full:9.1f} "
+          f"{legacy / limited:10.1f}x {legacy / full:11.1f}x"
+        )
+  finally:
+    file_service.shutdown_parse_pool()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,61 @@
+"""
+Payload size and latency of meal image preprocessing vs. sending the raw upload.
+
+Synthesizes phone-like photos (noisy gradients with shapes, optional EXIF rotation),
+runs them through meal_service.prepare_image, and reports bytes sent upstream plus an
+end-to-end estimate: preprocess + base64 + transfer at --uplink-mbps.
+
+  python -m benchmarks.bench_image_preprocess --uplink-mbps 20
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.corpus import synth_photo
+from server.app.core.config import settings
+from server.app.services import meal_service
+
+PHOTO_SIZES = [(4032, 3024), (3000, 4000), (1920, 1080), (1280, 960)]
+
+
+def _data_url_len(image_bytes: bytes, mime: str) -> tuple[int, float]:
+  start = time.perf_counter()
+  url = meal_service._image_bytes_to_data_url(image_bytes, mime)
+  return len(url), (time.perf_counter() - start) * 1000
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--uplink-mbps", type=float, default=20.0, help="server -> DashScope bandwidth")
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+  bytes_per_ms = args.uplink_mbps * 1_000_000 / 8 / 1000
+
+  print(
+    f"max_edge={settings.MEAL_IMAGE_MAX_EDGE} format={settings.MEAL_IMAGE_FORMAT} quality={settings.MEAL_IMAGE_QUALITY} "
+    f"uplink={args.uplink_mbps}Mbps"
+  )
+  header = f"{'photo':>16} {'orig_KB':>9} {'sent_KB':>8} {'body_raw_KB':>11} {'body_sent_KB':>12} {'prep_ms':>8} {'e2e_raw_ms':>10} {'e2e_sent_ms':>11}"
+  print(header)
+  for i, size in enumerate(PHOTO_SIZES):
+    photo = synth_photo(size, seed=i, rotated=(i % 2 == 1))
+    prep_times, sent = [], b""
+    for _ in range(args.repeat):
+      start = time.perf_counter()
+      sent, sent_mime, _ = meal_service.prepare_image(photo, "image/jpeg")
+      prep_times.append((time.perf_counter() - start) * 1000)
+    prep_ms = statistics.median(prep_times)
+
+    raw_body, raw_b64_ms = _data_url_len(photo, "image/jpeg")
+    sent_body, sent_b64_ms = _data_url_len(sent, sent_mime)
+    e2e_raw = raw_b64_ms + raw_body / bytes_per_ms
+    e2e_sent = prep_ms + sent_b64_ms + sent_body / bytes_per_ms
+    label = f"{size[0]}x{size[1]}{'/rot' if i % 2 else ''}"
+    print(
+      f"{label:>16} {len(photo) / 1024:9.0f} {len(sent) / 1024:8.0f} {raw_body / 1024:11.0f} {sent_body / 1024:12.0f} "
+      f"{prep_ms:8.1f} {e2e_raw:10.1f} {e2e_sent:11.1f}"
+    )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,154 @@
+"""
+Nutrition rollups from per-day summary rows vs. rescanning raw meal history.
+
+Fills a throwaway SQLite database with --rows synthetic MealRecord rows (default one
+million, spread over --users users and a year), builds the DailyNutritionSummary rows the
+incremental path would have produced, then times per-user daily/weekly/monthly rollups both
+ways, plus the per-meal write cost of maintaining the summary.
+
+  python -m benchmarks.bench_meal_history --rows 1000000 --users 2000
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import func, insert, text
+from sqlmodel import Session, SQLModel, col, create_engine, select
+
+from server.app.dbs.daos import MealRecordDAO
+from server.app.dbs.models import DailyNutritionSummary, MealRecord
+from server.app.services import meal_history_service
+
+FIRST_DAY = date(2025, 10, 1)
+DAYS = 365
+
+
+def _fill(engine, rows: int, users: int, seed: int = 0) -> None:
+  rnd = random.Random(seed)
+  origin = datetime(FIRST_DAY.year, FIRST_DAY.month, FIRST_DAY.day, tzinfo=timezone.utc)
+  table = MealRecord.__table__
+  chunk = 50_000
+  with engine.begin() as conn:
+    for offset in range(0, rows, chunk):
+      batch = []
+      for _ in range(min(chunk, rows - offset)):
+        eaten_at = origin + timedelta(seconds=rnd.randrange(DAYS * 86400))
+        calories = rnd.uniform(100, 1200)
+        batch.append({
+          "user_id": f"user{rnd.randrange(users)}",
+          "eaten_at": eaten_at,
+          "day": meal_history_service.local_day(eaten_at),
+          "filename": "meal.jpg",
+          "foods": "[]",
+          "weight": rnd.uniform(100, 800),
+          "calories": calories,
+          "carbohydrates": calories * 0.5 / 4,
+          "protein": calories * 0.2 / 4,
+          "fat": calories * 0.3 / 9,
+          "created_at": eaten_at,
+        })
+      conn.execute(insert(table), batch)
+    # What MealRecordDAO.create would have accumulated one meal at a time.
+    conn.execute(text(
+      "INSERT INTO dailynutritionsummary (user_id, day, meals, weight, calories, carbohydrates, protein, fat, updated_at) "
+      "SELECT user_id, day, count(*), sum(weight), sum(calories), sum(carbohydrates), sum(protein), sum(fat), max(created_at) "
+      "FROM mealrecord GROUP BY user_id, day"
+    ))
+
+
+def _raw_days(user_id: str, start: date, end: date, db: Session) -> list[DailyNutritionSummary]:
+  """
+  The same per-day rows, aggregated from raw meals on every request.
+  """
+  record = MealRecord
+  stmt = (
+    select(
+      record.day,
+      func.count(),
+      func.sum(record.weight),
+      func.sum(record.calories),
+      func.sum(record.carbohydrates),
+      func.sum(record.protein),
+      func.sum(record.fat),
+    )
+    .where(col(record.user_id) == user_id, col(record.day) >= start, col(record.day) <= end)
+    .group_by(record.day)
+    .order_by(record.day)
+  )
+  return [
+    DailyNutritionSummary(user_id=user_id, day=d, meals=n, weight=w, calories=c, carbohydrates=cb, protein=p, fat=f)
+    for d, n, w, c, cb, p, f in db.exec(stmt)
+  ]
+
+
+def _time_ms(fn, repeat: int) -> float:
+  samples = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    samples.append((time.perf_counter() - start) * 1000)
+  return statistics.median(samples)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--rows", type=int, default=1_000_000)
+  parser.add_argument("--users", type=int, default=2000)
+  parser.add_argument("--queries", type=int, default=200)
+  parser.add_argument("--writes", type=int, default=2000)
+  args = parser.parse_args()
+
+  path = Path(tempfile.mkdtemp()) / "history.db"
+  engine = create_engine(f"sqlite:///{path}")
+  SQLModel.metadata.create_all(engine, tables=[MealRecord.__table__, DailyNutritionSummary.__table__])
+
+  start = time.perf_counter()
+  _fill(engine, args.rows, args.users)
+  with Session(engine) as db:
+    summaries = db.exec(select(func.count()).select_from(DailyNutritionSummary)).one()
+  print(f"rows={args.rows} users={args.users} summary_rows={summaries} fill_s={time.perf_counter() - start:.1f} db_MB={path.stat().st_size / 1e6:.0f}")
+
+  rnd = random.Random(1)
+  users = [f"user{rnd.randrange(args.users)}" for _ in range(args.queries)]
+  last_day = FIRST_DAY + timedelta(days=DAYS - 1)
+  print(f"{'period':>8} {'days':>5} {'raw_ms':>8} {'summary_ms':>11} {'speedup':>8}")
+  with Session(engine) as db:
+    for period, span in (("daily", 30), ("weekly", 84), ("monthly", 365)):
+      first = last_day - timedelta(days=span - 1)
+
+      def run(load) -> None:
+        for user in users:
+          days = load(user, first, last_day, db)
+          meal_history_service.rollup(days, period)
+
+      raw = _time_ms(lambda: run(_raw_days), 3) / len(users)
+      summary = _time_ms(lambda: run(MealRecordDAO.list_daily), 3) / len(users)
+      print(f"{period:>8} {span:>5} {raw:8.3f} {summary:11.3f} {raw / summary:7.1f}x")
+
+  # Write cost of keeping the summary current: insert + summary bump in one transaction.
+  def write(with_summary: bool) -> float:
+    start = time.perf_counter()
+    with Session(engine) as db:
+      for i in range(args.writes):
+        eaten_at = datetime.now(timezone.utc)
+        record = MealRecord(user_id=f"writer{i % 50}", eaten_at=eaten_at, day=eaten_at.date(), foods="[]", calories=500.0)
+        if with_summary:
+          MealRecordDAO.create(record, db)
+        else:
+          db.add(record)
+          db.commit()
+    return (time.perf_counter() - start) * 1000 / args.writes
+
+  plain, maintained = write(False), write(True)
+  print(f"write_ms/meal insert_only={plain:.3f} insert+summary={maintained:.3f}")
+  engine.dispose()
+  path.unlink()
+  path.parent.rmdir()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,91 @@
+"""
+Food-name matching and nutrient recomputation against the local nutrition table.
+
+Builds model-like food names (canonical names, aliases, names with cooking methods and
+portion words, unknown dishes), then reports load time, index memory, match rate and
+apply_nutrition throughput. --scale N replicates the table N times with suffixed names to
+see how lookups behave on a larger table.
+
+  python -m benchmarks.bench_nutrition --items 20000 --scale 20
+"""
+import argparse
+import csv
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from server.app.services import nutrition_service
+from server.app.services.nutrition_service import DEFAULT_TABLE_PATH, NutritionTable
+
+PREFIXES = ["", "", "一碗", "清炒", "红烧", "凉拌", "香煎", "蒜蓉", "一份"]
+UNKNOWN = ["神秘酱汁", "分子料理", "手工饼", "Rice bowl", "佛跳墙", "螺蛳粉"]
+
+
+def _names(path: Path) -> list[str]:
+  names = []
+  with open(path, newline="", encoding="utf-8") as f:
+    for record in csv.DictReader(f):
+      names.append(record["name"])
+      names.extend(a for a in record["aliases"].split("|") if a)
+  return names
+
+
+def _scaled_table(scale: int) -> Path:
+  with open(DEFAULT_TABLE_PATH, newline="", encoding="utf-8") as f:
+    rows = list(csv.DictReader(f))
+  out = Path(tempfile.mkstemp(suffix=".csv")[1])
+  with open(out, "w", newline="", encoding="utf-8") as f:
+    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+    writer.writeheader()
+    for i in range(scale):
+      for row in rows:
+        suffix = "" if i == 0 else f"{i}"
+        aliases = "|".join(a + suffix for a in row["aliases"].split("|") if a)
+        writer.writerow({**row, "name": row["name"] + suffix, "aliases": aliases})
+  return out
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--items", type=int, default=20000)
+  parser.add_argument("--scale", type=int, default=1)
+  args = parser.parse_args()
+
+  path = DEFAULT_TABLE_PATH if args.scale == 1 else _scaled_table(args.scale)
+  tracemalloc.start()
+  start = time.perf_counter()
+  table = NutritionTable.load(path, min_score=0.6)
+  load_ms = (time.perf_counter() - start) * 1000
+  memory_kb = tracemalloc.get_traced_memory()[0] / 1024
+  tracemalloc.stop()
+  print(f"table foods={len(table)} keys={table.stats()['keys']} load_ms={load_ms:.1f} memory_kb={memory_kb:.0f}")
+
+  rnd = random.Random(0)
+  names = _names(DEFAULT_TABLE_PATH)
+  queries = [rnd.choice(UNKNOWN) if rnd.random() < 0.1 else rnd.choice(PREFIXES) + rnd.choice(names) for _ in range(args.items)]
+
+  start = time.perf_counter()
+  matched = sum(table.match(q) is not None for q in queries)
+  match_s = time.perf_counter() - start
+  print(f"match items={len(queries)} matched={matched / len(queries):.1%} {len(queries) / match_s:,.0f} lookups/s")
+
+  nutrition_service.nutrition_table = table
+  meals = [
+    [{"food_name": q, "weight": rnd.uniform(20, 400), "unit": "g", "calories": rnd.uniform(10, 800),
+      "carbohydrates": 10.0, "protein": 5.0, "fat": 3.0} for q in queries[i : i + 4]]
+    for i in range(0, len(queries), 4)
+  ]
+  start = time.perf_counter()
+  outliers = 0
+  for foods in meals:
+    outliers += nutrition_service.apply_nutrition(foods)[2]
+  apply_s = time.perf_counter() - start
+  print(f"apply_nutrition meals={len(meals)} outliers={outliers} {len(meals) / apply_s:,.0f} meals/s {apply_s / len(meals) * 1e6:.1f} us/meal")
+  if path != DEFAULT_TABLE_PATH:
+    path.unlink()
+
+
+if __name__ == "__main__":
+  main()
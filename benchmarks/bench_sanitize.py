@@ -0,0 +1,124 @@
+"""
+Text sanitizer micro-benchmark.
+
+Compares the previous sanitize_text (four regex passes plus a per-character isprintable()
+generator) with file_service.sanitize_text and the page-by-page StreamingSanitizer, in MB/s
+of UTF-8 input. Before timing, every corpus (plus randomized edge cases: CRLF split across
+pages, control/zero-width characters, whitespace runs) is checked for identical output.
+
+  python -m benchmarks.bench_sanitize --mb 2 8 32
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from server.app.services.file_service import StreamingSanitizer, sanitize_text
+
+
+def legacy_sanitize_text(text: str) -> str:
+  if not text:
+    return text
+  text = text.replace("\r\n", "\n").replace("\r", "\n")
+  text = re.sub(r"[\u200b-\u200f\u202a-\u202e\u2060-\u206f]", "", text)
+  text = "".join(ch for ch in text if ch.isprintable() or ch in "\n\t ")
+  text = re.sub(r"[ \t]+", " ", text)
+  text = re.sub(r"\n{3,}", "\n\n", text)
+  return text.strip()
+
+
+def stream_sanitize(pages: list[str]) -> str:
+  sanitizer = StreamingSanitizer()
+  out = [sanitizer.feed(page if i == 0 else "\n" + page) for i, page in enumerate(pages)]
+  out.append(sanitizer.finish())
+  return "".join(out)
+
+
+CLEAN_LINES = [
+  "人工智能正在改变我们的生活方式，营养分析也不例外。",
+  "Protein, carbohydrate and fat are reported per portion in grams.",
+  "第三章 膳食结构与能量平衡",
+  "Table 3 shows the daily intake for each group over twelve weeks.",
+]
+NOISY_LINES = [
+  "Figure\t2:  energy   intake\x0c by meal",
+  "zero\u200bwidth\u2060joiners\u200f and\u00adsoft hyphens",
+  "  indented  line with trailing spaces   ",
+  "CRLF line endings from Windows exports\r",
+  "\x00\x01 binary residue \x7f from a broken font map",
+  "",
+  "",
+]
+
+
+def make_pages(target_mb: float, noise: float, seed: int = 0, page_lines: int = 45) -> list[str]:
+  """
+  Extracted-PDF-like text: pages of mostly clean mixed CJK/Latin lines with some noisy ones.
+  """
+  rnd = random.Random(seed)
+  pages: list[str] = []
+  size = 0
+  while size < target_mb * 1_000_000:
+    lines = [rnd.choice(NOISY_LINES if rnd.random() < noise else CLEAN_LINES) for _ in range(page_lines)]
+    page = "\n".join(lines)
+    pages.append(page)
+    size += len(page.encode("utf-8"))
+  return pages
+
+
+def check_equivalence(corpora: dict[str, list[str]], fuzz_cases: int = 20000) -> None:
+  for name, pages in corpora.items():
+    text = "\n".join(pages)
+    expected = legacy_sanitize_text(text)
+    assert sanitize_text(text) == expected, f"sanitize_text differs on {name}"
+    assert stream_sanitize(pages) == expected, f"StreamingSanitizer differs on {name}"
+
+  alphabet = ["a", "中", " ", "  ", "\t", "\n", "\n\n\n", "\r", "\r\n", "\x00", "\x0c", "\x7f", "\u200b", "\u2061", "\u3000", "\u00a0"]
+  rnd = random.Random(1)
+  for _ in range(fuzz_cases):
+    pages = ["".join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 12))) for _ in range(rnd.randint(1, 5))]
+    expected = legacy_sanitize_text("\n".join(pages))
+    assert sanitize_text("\n".join(pages)) == expected, repr(pages)
+    assert stream_sanitize(pages) == expected, repr(pages)
+    # Arbitrary split points (mid-CRLF, mid-run) must not change the result either.
+    joined = "\n".join(pages)
+    cut = rnd.randint(0, len(joined))
+    sanitizer = StreamingSanitizer()
+    assert sanitizer.feed(joined[:cut]) + sanitizer.feed(joined[cut:]) + sanitizer.finish() == expected, repr(joined)
+
+
+def _mb_per_s(fn, mb: float, repeat: int) -> float:
+  samples = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    fn()
+    samples.append(time.perf_counter() - start)
+  return mb / statistics.median(samples)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--mb", type=float, nargs="+", default=[2, 8, 32])
+  parser.add_argument("--noise", type=float, default=0.05, help="fraction of noisy lines")
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  corpora = {f"{mb:g}MB": make_pages(mb, args.noise) for mb in args.mb}
+  corpora["all-noisy"] = make_pages(1, 1.0, seed=2)
+  corpora["all-clean"] = make_pages(1, 0.0, seed=3)
+  check_equivalence(corpora)
+  print("equivalence: identical output on all corpora and fuzz cases")
+
+  print(f"{'corpus':>10} {'legacy_MB/s':>12} {'new_MB/s':>10} {'stream_MB/s':>12} {'speedup':>8}")
+  for name, pages in corpora.items():
+    text = "\n".join(pages)
+    mb = len(text.encode("utf-8")) / 1_000_000
+    legacy = _mb_per_s(lambda: legacy_sanitize_text(text), mb, args.repeat)
+    new = _mb_per_s(lambda: sanitize_text(text), mb, args.repeat)
+    stream = _mb_per_s(lambda: stream_sanitize(pages), mb, args.repeat)
+    print(f"{name:>10} {legacy:12.1f} {new:10.1f} {stream:12.1f} {new / legacy:7.1f}x")
+
+
+if __name__ == "__main__":
+  main()
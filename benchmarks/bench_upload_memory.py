@@ -0,0 +1,172 @@
+"""
+Python heap held by the meal image upload path, measured with tracemalloc.
+
+1. Reading an upload (a spooled multipart part, as Starlette hands it over): 1 MiB chunks
+   joined into bytes (the previous read_image_upload) vs. readinto one preallocated bytearray.
+2. One Qwen-VL request carrying the image: data URL + SDK serialization
+   (QWEN_VL_STREAM_BODY=false) vs. the streamed body with incremental base64. The upstream is a
+   local transport that consumes the body chunk by chunk, as a socket would.
+3. --concurrency uploads read and sent at once, as /meal/analyze does, with the image memory
+   budget off (unbounded) and at --budget-mb.
+
+Peaks are over the heap in use before each run. The image is not preprocessed here (the
+worst case: an image that cannot be shrunk goes upstream as uploaded).
+
+  python -m benchmarks.bench_upload_memory --image-mb 10 --concurrency 32 --budget-mb 64
+"""
+import argparse
+import asyncio
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+from server.app.core import http_core
+from server.app.core.concurrency import ByteBudget
+from server.app.core.config import settings
+from server.app.services import meal_service
+
+MiB = 1024 * 1024
+COMPLETION = {
+  "id": "bench",
+  "object": "chat.completion",
+  "created": 0,
+  "model": "bench",
+  "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": '{"foods": []}'}}],
+  "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class SinkTransport(httpx.AsyncBaseTransport):
+  """
+  Reads request bodies chunk by chunk without keeping them, then answers after `delay`.
+  """
+
+  def __init__(self, delay: float = 0.0):
+    self.delay = delay
+
+  async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+    async for _ in request.stream:
+      pass
+    if self.delay:
+      await asyncio.sleep(self.delay)
+    return httpx.Response(200, json=COMPLETION)
+
+
+def _spooled(data: bytes):
+  part = tempfile.SpooledTemporaryFile(max_size=MiB)  # Starlette's multipart spool threshold
+  part.write(data)
+  part.seek(0)
+  return part
+
+
+def _read_joined(part, max_bytes: int) -> bytes:
+  chunks: list[bytes] = []
+  written = 0
+  while True:
+    chunk = part.read(MiB)
+    if not chunk:
+      break
+    written += len(chunk)
+    if written > max_bytes:
+      raise ValueError("image too large")
+    chunks.append(chunk)
+  return b"".join(chunks)
+
+
+def _peak_mb(fn) -> tuple[float, float]:
+  """
+  (peak heap above the starting point in MiB, wall ms) for one call of fn.
+  """
+  gc.collect()
+  tracemalloc.reset_peak()
+  base = tracemalloc.get_traced_memory()[0]
+  start = time.perf_counter()
+  result = fn()
+  elapsed = (time.perf_counter() - start) * 1000
+  peak = tracemalloc.get_traced_memory()[1]
+  del result
+  return (peak - base) / MiB, elapsed
+
+
+def _header(title: str) -> None:
+  print(f"{title}\n   {'':<30} {'peak MiB':>8} {'ms':>6}")
+
+
+def _use_transport(delay: float) -> None:
+  http_core.qwen_client = None
+  http_core.qwen_http_client = httpx.AsyncClient(transport=SinkTransport(delay), timeout=60)
+
+
+def bench_read(image: bytes) -> None:
+  max_bytes = len(image) + 1
+  _header(f"1. read a {len(image) / MiB:.0f} MiB upload")
+  for label, read in (
+    ("chunks + join", lambda part: _read_joined(part, max_bytes)),
+    ("preallocated readinto", lambda part: meal_service._read_into_buffer(part, len(image), max_bytes)),
+  ):
+    part = _spooled(image)
+    peak, ms = _peak_mb(lambda: read(part))
+    part.close()
+    print(f"   {label:<30} {peak:8.1f} {ms:6.1f}")
+
+
+def bench_request(image: bytearray) -> None:
+  _header(f"\n2. one upstream request, {len(image) / MiB:.0f} MiB image")
+  for label, streamed in (("data URL + SDK serialization", False), ("streamed body", True)):
+    settings.QWEN_VL_STREAM_BODY = streamed
+    _use_transport(0.0)
+    peak, ms = _peak_mb(lambda: asyncio.run(meal_service.analyze_meal_photo(image, "image/jpeg")))
+    print(f"   {label:<30} {peak:8.1f} {ms:6.1f}")
+
+
+async def _concurrent(image: bytes, concurrency: int, budget: ByteBudget | None) -> None:
+  async def one() -> None:
+    part = _spooled(image)
+    try:
+      if budget is not None:
+        async with budget.reserve(len(image)):
+          data = meal_service._read_into_buffer(part, len(image), len(image) + 1)
+          await meal_service.analyze_meal_photo(data, "image/jpeg")
+      else:
+        data = meal_service._read_into_buffer(part, len(image), len(image) + 1)
+        await meal_service.analyze_meal_photo(data, "image/jpeg")
+    finally:
+      part.close()
+
+  await asyncio.gather(*(one() for _ in range(concurrency)))
+
+
+def bench_concurrency(image: bytes, concurrency: int, budget_mb: int, delay: float) -> None:
+  settings.QWEN_VL_STREAM_BODY = True
+  _header(f"\n3. {concurrency} concurrent uploads, upstream {delay * 1000:.0f} ms")
+  for label, budget_bytes in (("no budget", None), (f"budget {budget_mb} MiB", budget_mb * MiB)):
+    _use_transport(delay)
+    budget = ByteBudget("bench", budget_bytes, wait_timeout=600) if budget_bytes else None
+    peak, ms = _peak_mb(lambda: asyncio.run(_concurrent(image, concurrency, budget)))
+    print(f"   {label:<30} {peak:8.1f} {ms:6.1f}")
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--image-mb", type=float, default=10.0)
+  parser.add_argument("--concurrency", type=int, default=32)
+  parser.add_argument("--budget-mb", type=int, default=64)
+  parser.add_argument("--upstream-ms", type=float, default=50.0)
+  args = parser.parse_args()
+
+  settings.DASHSCOPE_API_KEY = settings.DASHSCOPE_API_KEY or "bench"
+  settings.UPSTREAM_GUARD_ENABLED = False
+  image = os.urandom(int(args.image_mb * MiB))  # content does not matter on this path
+  tracemalloc.start()
+  bench_read(image)
+  bench_request(bytearray(image))
+  bench_concurrency(image, args.concurrency, args.budget_mb, args.upstream_ms / 1000)
+  tracemalloc.stop()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,94 @@
+"""
+Synthetic inputs for benchmarks: multi-page text PDFs, DOCX files and phone-like meal photos.
+"""
+import io
+import random
+
+WORDS = (
+  "nutrition protein calories carbohydrate fiber vitamin mineral portion breakfast lunch dinner "
+  "vegetable fruit grain rice noodle tofu chicken beef fish soup sauce oil sugar salt energy "
+  "balance health diet report analysis summary chapter section figure table result method"
+).split()
+
+
+def _lines(rnd: random.Random, count: int, width: int = 12) -> list[str]:
+  return [" ".join(rnd.choice(WORDS) for _ in range(width)) for _ in range(count)]
+
+
+def make_pdf(pages: int, lines_per_page: int = 45, seed: int = 0) -> bytes:
+  """
+  Minimal valid PDF (Helvetica text pages) written by hand, so no PDF writer dependency is needed.
+  """
+  rnd = random.Random(seed)
+  objects: list[bytes] = []
+
+  def add(body: bytes) -> int:
+    objects.append(body)
+    return len(objects)
+
+  catalog = add(b"")  # patched below once the pages object number is known
+  pages_obj = add(b"")
+  font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+  kids = []
+  for _ in range(pages):
+    ops = ["BT", "/F1 10 Tf", "12 TL", "40 800 Td"]
+    for line in _lines(rnd, lines_per_page):
+      ops.append(f"({line}) Tj T*")
+    ops.append("ET")
+    stream = "\n".join(ops).encode("latin-1")
+    content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    page = add(
+      b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+      % (pages_obj, font, content)
+    )
+    kids.append(page)
+  objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+  objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+    b" ".join(b"%d 0 R" % k for k in kids),
+    len(kids),
+  )
+
+  out = io.BytesIO()
+  out.write(b"%PDF-1.4\n")
+  offsets = []
+  for number, body in enumerate(objects, start=1):
+    offsets.append(out.tell())
+    out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+  xref = out.tell()
+  out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+  for offset in offsets:
+    out.write(b"%010d 00000 n \n" % offset)
+  out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+  return out.getvalue()
+
+
+def make_docx(paragraphs: int, seed: int = 0) -> bytes:
+  import docx  # type: ignore
+
+  rnd = random.Random(seed)
+  doc = docx.Document()
+  for line in _lines(rnd, paragraphs, width=40):
+    doc.add_paragraph(line)
+  out = io.BytesIO()
+  doc.save(out)
+  return out.getvalue()
+
+
+def synth_photo(size: tuple[int, int], seed: int, quality: int = 92, rotated: bool = False) -> bytes:
+  from PIL import Image, ImageDraw
+
+  rnd = random.Random(seed)
+  base = Image.effect_noise(size, 40).convert("RGB")
+  tint = Image.new("RGB", size, (rnd.randrange(150, 255), rnd.randrange(120, 230), rnd.randrange(90, 200)))
+  img = Image.blend(base, tint, 0.6)
+  draw = ImageDraw.Draw(img)
+  for _ in range(40):
+    x, y = rnd.randrange(size[0]), rnd.randrange(size[1])
+    r = rnd.randrange(size[0] // 40, size[0] // 6)
+    draw.ellipse((x - r, y - r, x + r, y + r), fill=(rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+  out = io.BytesIO()
+  exif = Image.Exif()
+  if rotated:
+    exif[0x0112] = 6  # Orientation: rotate 90 CW on display
+  img.save(out, "JPEG", quality=quality, exif=exif)
+  return out.getvalue()
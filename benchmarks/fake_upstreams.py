@@ -0,0 +1,183 @@
+"""
+Local fake DashScope (Qwen-VL) and OpenRouter servers for load tests.
+
+One ASGI app serves both OpenAI-compatible chat completion APIs:
+  POST /dashscope/v1/chat/completions    -> meal "foods" JSON; http(s) image URLs are downloaded
+                                            first (400 when that fails), as DashScope does
+  POST /openrouter/v1/chat/completions   -> summary text (supports "stream": true)
+  GET  /_stats, POST /_config             -> counters / live reconfiguration
+
+Latency, jitter, error rate and streaming speed are read from FAKE_CONFIG on every request,
+so a benchmark can change them between phases. Run standalone with:
+
+  python -m benchmarks.fake_upstreams --port 8900 --latency-ms 800 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict, dataclass, fields
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeUpstreamConfig:
+  latency_ms: float = 200.0
+  jitter_ms: float = 50.0
+  error_rate: float = 0.0
+  error_status: int = 503
+  retry_after: str | None = None
+  stream_token_delay_ms: float = 5.0
+  summary_chars: int = 400
+
+
+FAKE_CONFIG = FakeUpstreamConfig()
+STATS = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "request_bytes": 0, "image_downloads": 0}
+
+FAKE_FOODS = {
+  "foods": [
+    {"food_name": "米饭", "weight": 150, "unit": "g", "calories": 174, "carbohydrates": 38.9, "protein": 3.9, "fat": 0.5},
+    {"food_name": "番茄炒蛋", "weight": 200, "unit": "g", "calories": 172, "carbohydrates": 8.4, "protein": 10.6, "fat": 11.2},
+  ]
+}
+SUMMARY_SENTENCE = "这是一段用于压测的模拟摘要内容，包含若干关键要点。"
+
+app = FastAPI(title="fake-upstreams")
+_download_client: httpx.AsyncClient | None = None
+
+
+def _completion(model: str, content: str) -> dict:
+  return {
+    "id": "fake-completion",
+    "object": "chat.completion",
+    "created": int(time.time()),
+    "model": model,
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    "usage": {"prompt_tokens": 100, "completion_tokens": len(content), "total_tokens": 100 + len(content)},
+  }
+
+
+async def _simulate_latency() -> None:
+  cfg = FAKE_CONFIG
+  delay = max(0.0, random.gauss(cfg.latency_ms, cfg.jitter_ms)) / 1000 if cfg.jitter_ms else cfg.latency_ms / 1000
+  await asyncio.sleep(delay)
+
+
+def _maybe_error() -> JSONResponse | None:
+  cfg = FAKE_CONFIG
+  if cfg.error_rate and random.random() < cfg.error_rate:
+    STATS["errors"] += 1
+    headers = {"Retry-After": cfg.retry_after} if cfg.retry_after else None
+    return JSONResponse({"error": {"message": "injected failure"}}, status_code=cfg.error_status, headers=headers)
+  return None
+
+
+def _summary_text() -> str:
+  repeat = max(1, FAKE_CONFIG.summary_chars // len(SUMMARY_SENTENCE))
+  return SUMMARY_SENTENCE * repeat
+
+
+async def _stream_summary(model: str):
+  text = _summary_text()
+  delay = FAKE_CONFIG.stream_token_delay_ms / 1000
+  for i in range(0, len(text), 4):
+    chunk = {"id": "fake", "object": "chat.completion.chunk", "model": model,
+             "choices": [{"index": 0, "delta": {"content": text[i:i + 4]}, "finish_reason": None}]}
+    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    if delay:
+      await asyncio.sleep(delay)
+  yield "data: [DONE]\n\n"
+
+
+async def _download_images(body: dict) -> JSONResponse | None:
+  global _download_client
+  for message in body.get("messages") or []:
+    content = message.get("content")
+    for part in content if isinstance(content, list) else []:
+      url = (part.get("image_url") or {}).get("url", "") if part.get("type") == "image_url" else ""
+      if not url.startswith(("http://", "https://")):
+        continue
+      if _download_client is None:
+        _download_client = httpx.AsyncClient(timeout=30)
+      try:
+        resp = await _download_client.get(url)
+        resp.raise_for_status()
+      except httpx.HTTPError as e:
+        return JSONResponse({"error": {"message": f"image download failed: {e}"}}, status_code=400)
+      STATS["image_downloads"] += 1
+  return None
+
+
+async def _handle(request: Request, kind: str):
+  STATS["requests"] += 1
+  STATS["in_flight"] += 1
+  STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+  try:
+    raw = await request.body()
+    STATS["request_bytes"] += len(raw)
+    body = json.loads(raw)
+    if kind == "dashscope":
+      failed = await _download_images(body)
+      if failed is not None:
+        return failed
+    await _simulate_latency()
+    error = _maybe_error()
+    if error is not None:
+      return error
+    model = body.get("model", "fake-model")
+    if kind == "dashscope":
+      return _completion(model, json.dumps(FAKE_FOODS, ensure_ascii=False))
+    if body.get("stream"):
+      return StreamingResponse(_stream_summary(model), media_type="text/event-stream")
+    return _completion(model, _summary_text())
+  finally:
+    STATS["in_flight"] -= 1
+
+
+@app.post("/dashscope/v1/chat/completions")
+async def dashscope_completions(request: Request):
+  return await _handle(request, "dashscope")
+
+
+@app.post("/openrouter/v1/chat/completions")
+async def openrouter_completions(request: Request):
+  return await _handle(request, "openrouter")
+
+
+@app.get("/_stats")
+async def get_stats():
+  return {**STATS, "config": asdict(FAKE_CONFIG)}
+
+
+@app.post("/_config")
+async def set_config(request: Request):
+  updates = await request.json()
+  for field in fields(FakeUpstreamConfig):
+    if field.name in updates:
+      setattr(FAKE_CONFIG, field.name, updates[field.name])
+  STATS.update(requests=0, errors=0, max_in_flight=0, request_bytes=0, image_downloads=0)
+  return asdict(FAKE_CONFIG)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--port", type=int, default=8900)
+  parser.add_argument("--latency-ms", type=float, default=FAKE_CONFIG.latency_ms)
+  parser.add_argument("--jitter-ms", type=float, default=FAKE_CONFIG.jitter_ms)
+  parser.add_argument("--error-rate", type=float, default=FAKE_CONFIG.error_rate)
+  parser.add_argument("--error-status", type=int, default=FAKE_CONFIG.error_status)
+  args = parser.parse_args()
+  FAKE_CONFIG.latency_ms = args.latency_ms
+  FAKE_CONFIG.jitter_ms = args.jitter_ms
+  FAKE_CONFIG.error_rate = args.error_rate
+  FAKE_CONFIG.error_status = args.error_status
+  uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,187 @@
+"""
+Shared plumbing for load tests: server subprocesses and a closed-loop request driver.
+
+Servers run as separate uvicorn processes so the driver, the app and the fake upstreams
+do not share an event loop (or a GIL) with each other.
+"""
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+def percentile(values: list[float], pct: float) -> float:
+  ordered = sorted(values)
+  if not ordered:
+    return 0.0
+  index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+  return ordered[index]
+
+
+class ServerProcess:
+  """
+  `uvicorn <target>` in a child process; blocks on enter until the port accepts connections.
+  stdout=subprocess.PIPE hands the app's log stream to the caller (self.proc.stdout);
+  factory=True treats target as an app factory ("server.main:create_app").
+  """
+
+  def __init__(
+    self,
+    target: str,
+    env: dict[str, str] | None = None,
+    port: int | None = None,
+    quiet: bool = True,
+    stdout: int | None = None,
+    factory: bool = False,
+  ):
+    self.target = target
+    self.factory = factory
+    self.port = port or free_port()
+    self.env = {**os.environ, **(env or {})}
+    self.quiet = quiet
+    self.stdout = stdout
+    self.proc: subprocess.Popen | None = None
+
+  @property
+  def base_url(self) -> str:
+    return f"http://127.0.0.1:{self.port}"
+
+  def __enter__(self) -> "ServerProcess":
+    cmd = [sys.executable, "-m", "uvicorn", self.target, "--port", str(self.port), "--log-level", "warning", "--no-access-log"]
+    if self.factory:
+      cmd.append("--factory")
+    output = subprocess.DEVNULL if self.quiet else None
+    stdout = self.stdout if self.stdout is not None else output
+    self.proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env=self.env, stdout=stdout, stderr=output)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+      if self.proc.poll() is not None:
+        raise RuntimeError(f"{self.target} exited with code {self.proc.returncode}")
+      try:
+        with socket.create_connection(("127.0.0.1", self.port), timeout=0.2):
+          return self
+      except OSError:
+        time.sleep(0.05)
+    raise RuntimeError(f"{self.target} did not start on port {self.port}")
+
+  def __exit__(self, *exc) -> None:
+    if self.proc is not None:
+      self.proc.terminate()
+      try:
+        self.proc.wait(timeout=10)
+      except subprocess.TimeoutExpired:
+        self.proc.kill()
+
+
+def process_memory(pid: int) -> dict[str, float]:
+  """
+  Current (rss_mb) and peak (peak_rss_mb) resident memory of a process, from /proc/<pid>/status.
+  Empty where /proc is unavailable (non-Linux).
+  """
+  try:
+    status = Path(f"/proc/{pid}/status").read_text()
+  except OSError:
+    return {}
+  memory = {}
+  for line in status.splitlines():
+    key, _, value = line.partition(":")
+    if key in ("VmRSS", "VmHWM"):
+      memory["rss_mb" if key == "VmRSS" else "peak_rss_mb"] = round(int(value.split()[0]) / 1024, 1)
+  return memory
+
+
+FAKE_UPSTREAMS = "benchmarks.fake_upstreams:app"
+
+
+def configure_fake(base_url: str, **config) -> dict:
+  return httpx.post(f"{base_url}/_config", json=config).json()
+
+
+def fake_stats(base_url: str) -> dict:
+  return httpx.get(f"{base_url}/_stats").json()
+
+
+def app_env(upstream_url: str, **overrides: str) -> dict[str, str]:
+  """
+  Environment for an app process wired to the fake upstreams.
+  """
+  env = {
+    "DASHSCOPE_API_KEY": "bench",
+    "DASHSCOPE_BASE_URL": f"{upstream_url}/dashscope/v1",
+    "OPENROUTER_API_KEY": "bench",
+    "OPENROUTER_BASE_URL": f"{upstream_url}/openrouter/v1",
+  }
+  env.update(overrides)
+  return env
+
+
+@dataclass
+class LoadResult:
+  latencies_ms: list[float] = field(default_factory=list)
+  statuses: dict[int, int] = field(default_factory=dict)
+  wall_s: float = 0.0
+
+  @property
+  def total(self) -> int:
+    return len(self.latencies_ms)
+
+  @property
+  def failures(self) -> int:
+    return sum(count for status, count in self.statuses.items() if status != 200)
+
+  def summary(self) -> dict:
+    return {
+      "requests": self.total,
+      "failures": self.failures,
+      "throughput_rps": round(self.total / self.wall_s, 2) if self.wall_s else 0.0,
+      "p50_ms": round(percentile(self.latencies_ms, 50), 1),
+      "p95_ms": round(percentile(self.latencies_ms, 95), 1),
+      "p99_ms": round(percentile(self.latencies_ms, 99), 1),
+      "max_ms": round(max(self.latencies_ms, default=0.0), 1),
+      "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+    }
+
+
+async def run_load(
+  base_url: str,
+  concurrency: int,
+  total: int,
+  send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+) -> LoadResult:
+  """
+  Closed-loop load: `concurrency` workers issue `total` requests, each via send(client, i).
+  """
+  result = LoadResult()
+  counter = iter(range(total))
+  limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+  async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=180) as client:
+
+    async def worker() -> None:
+      for i in counter:
+        start = time.perf_counter()
+        try:
+          status = (await send(client, i)).status_code
+        except httpx.HTTPError:
+          status = 0
+        result.latencies_ms.append((time.perf_counter() - start) * 1000)
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.wall_s = time.perf_counter() - start
+  return result
@@ -0,0 +1,89 @@
+"""
+Login throughput vs. hashing-pool size.
+
+For each --workers value, starts the app with AUTH_HASH_WORKERS set to it (fresh SQLite
+database), registers --users accounts, then drives closed-loop POST /api/auth/login load
+while a side task probes GET /health every 50 ms. Login throughput should grow with the
+pool up to the core count. The probe latency shows whether the event loop stays
+responsive while bcrypt runs; with inline hashing it would wait out every hash.
+
+  python -m benchmarks.load_auth --workers 1,2,4,8 --concurrency 32 --requests 400 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.harness import ServerProcess, percentile, run_load
+
+PASSWORD = "bench-password"
+
+
+async def _register(base_url: str, users: int) -> None:
+  async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+    for i in range(users):
+      resp = await client.post("/api/auth/register", json={"username": f"bench{i}", "password": PASSWORD})
+      resp.raise_for_status()
+
+
+async def _probe(base_url: str, stop: asyncio.Event) -> list[float]:
+  latencies: list[float] = []
+  async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+    while not stop.is_set():
+      start = time.perf_counter()
+      await client.get("/health")
+      latencies.append((time.perf_counter() - start) * 1000)
+      await asyncio.sleep(0.05)
+  return latencies
+
+
+async def _run(base_url: str, users: int, concurrency: int, total: int):
+  async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/api/auth/login", json={"username": f"bench{i % users}", "password": PASSWORD})
+
+  stop = asyncio.Event()
+  probe = asyncio.create_task(_probe(base_url, stop))
+  result = await run_load(base_url, concurrency, total, send)
+  stop.set()
+  return result, await probe
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma-separated AUTH_HASH_WORKERS values")
+  parser.add_argument("--concurrency", type=int, default=32)
+  parser.add_argument("--requests", type=int, default=400)
+  parser.add_argument("--users", type=int, default=20)
+  parser.add_argument("--rounds", type=int, default=12, help="AUTH_BCRYPT_ROUNDS")
+  args = parser.parse_args()
+
+  print(f"cpu_count={os.cpu_count()} rounds={args.rounds} concurrency={args.concurrency} requests={args.requests}")
+  print(f"{'workers':>7} {'logins/s':>9} {'p50_ms':>8} {'p99_ms':>8} {'fail':>5} {'probe_p50':>10} {'probe_p99':>10}")
+  for workers in sorted({int(w) for w in args.workers.split(",")}):
+    with tempfile.TemporaryDirectory() as workdir:
+      env = {
+        "DEBUG": "false",
+        "DATABASE_URL": f"sqlite:///{Path(workdir) / 'app.db'}",
+        "TEMP_DIR": workdir,
+        "DOC_CACHE_PATH": str(Path(workdir) / "doc_cache.sqlite3"),
+        "JOB_SPOOL_DIR": str(Path(workdir) / "jobs"),
+        "AUTH_BCRYPT_ROUNDS": str(args.rounds),
+        "AUTH_HASH_WORKERS": str(workers),
+        "AUTH_HASH_MAX_PENDING": str(max(64, args.concurrency)),
+      }
+      with ServerProcess("server.main:app", env=env) as app:
+        asyncio.run(_register(app.base_url, args.users))
+        result, probes = asyncio.run(_run(app.base_url, args.users, args.concurrency, args.requests))
+    summary = result.summary()
+    print(
+      f"{workers:>7} {summary['throughput_rps']:9.1f} {summary['p50_ms']:8.1f} {summary['p99_ms']:8.1f} "
+      f"{result.failures:5d} {percentile(probes, 50):10.1f} {percentile(probes, 99):10.1f}"
+    )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,85 @@
+"""
+Meal analysis with images inline vs. stored and sent to the model by signed URL.
+
+The app runs against the fake DashScope, which downloads http(s) image URLs before answering,
+as the real one does. Modes:
+  inline  STORAGE_BACKEND=none: every request body carries the image as base64
+  url     STORAGE_BACKEND=local: images of at least MEAL_IMAGE_URL_MIN_KB are stored under their
+          content hash (served back by the app's /api/storage route) and sent as a URL
+
+--distinct photos are cycled over --requests, so repeats show the deduplicated path (the
+result cache is off, so each repeat still reaches the model). Images are sent without
+preprocessing unless --preprocess, to exercise the large-photo case.
+
+  python -m benchmarks.load_image_store --concurrency 16 --requests 200 --distinct 50
+"""
+import argparse
+import asyncio
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from benchmarks.corpus import synth_photo
+from benchmarks.harness import FAKE_UPSTREAMS, ServerProcess, app_env, configure_fake, fake_stats, free_port, run_load
+
+
+def _run_mode(upstream_url: str, backend: str, photos: list[bytes], args) -> tuple[dict, dict, dict]:
+  port = free_port()
+  with tempfile.TemporaryDirectory() as workdir:
+    env = app_env(
+      upstream_url,
+      DEBUG="false",
+      DATABASE_URL=f"sqlite:///{Path(workdir) / 'app.db'}",
+      TEMP_DIR=workdir,
+      DOC_CACHE_PATH=str(Path(workdir) / "doc_cache.sqlite3"),
+      JOB_SPOOL_DIR=str(Path(workdir) / "jobs"),
+      MEAL_CACHE_MAX_ENTRIES="1",
+      MEAL_CACHE_TTL_SECONDS="0",
+      MEAL_PHASH_ENABLED="false",
+      MEAL_IMAGE_PREPROCESS=str(args.preprocess).lower(),
+      STORAGE_BACKEND=backend,
+      STORAGE_LOCAL_DIR=str(Path(workdir) / "objects"),
+      STORAGE_PUBLIC_BASE_URL=f"http://127.0.0.1:{port}",
+      MEAL_IMAGE_URL_MIN_KB=str(args.min_kb),
+    )
+
+    async def analyze(client: httpx.AsyncClient, i: int) -> httpx.Response:
+      photo = photos[i % len(photos)]
+      return await client.post("/api/meal/analyze", files={"file": (f"{i}.jpg", photo, "image/jpeg")})
+
+    with ServerProcess("server.main:app", env=env, port=port) as service:
+      configure_fake(upstream_url, latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 5)  # resets its counters
+      result = asyncio.run(run_load(service.base_url, args.concurrency, args.requests, analyze))
+      store_stats = httpx.get(f"{service.base_url}/health", timeout=60).json()["caches"]["image_store"]
+  return result.summary(), fake_stats(upstream_url), store_stats
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--concurrency", type=int, default=16)
+  parser.add_argument("--requests", type=int, default=200)
+  parser.add_argument("--distinct", type=int, default=50)
+  parser.add_argument("--width", type=int, default=2400, help="photo width; height is 3/4 of it")
+  parser.add_argument("--latency-ms", type=float, default=300.0)
+  parser.add_argument("--min-kb", type=int, default=256)
+  parser.add_argument("--preprocess", action="store_true")
+  args = parser.parse_args()
+
+  photos = [synth_photo((args.width, args.width * 3 // 4), seed, quality=92) for seed in range(args.distinct)]
+  mean_kb = sum(map(len, photos)) / len(photos) / 1024
+  print(f"concurrency={args.concurrency} requests={args.requests} distinct={args.distinct} photo~{mean_kb:.0f}KB upstream_latency={args.latency_ms}ms")
+  print(f"{'mode':>6} {'req/s':>7} {'p50_ms':>8} {'p95_ms':>8} {'fail':>5} {'body_KB/call':>13} {'downloads':>10} {'stored':>7} {'dedup':>6}")
+  with ServerProcess(FAKE_UPSTREAMS) as upstream:
+    for mode, backend in (("inline", "none"), ("url", "local")):
+      summary, upstream_stats, store_stats = _run_mode(upstream.base_url, backend, photos, args)
+      body_kb = upstream_stats["request_bytes"] / max(1, upstream_stats["requests"]) / 1024
+      print(
+        f"{mode:>6} {summary['throughput_rps']:7.1f} {summary['p50_ms']:8.1f} {summary['p95_ms']:8.1f} "
+        f"{summary['failures']:5d} {body_kb:13.1f} {upstream_stats['image_downloads']:10d} "
+        f"{store_stats['stored']:7d} {store_stats['deduplicated']:6d}"
+      )
+
+
+if __name__ == "__main__":
+  main()
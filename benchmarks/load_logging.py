@@ -0,0 +1,106 @@
+"""
+Request throughput while the log collector behind stdout is slow.
+
+The app's stdout is a pipe drained by a reader thread. With --drain-bps set, the reader
+takes at most that many bytes per second (a slow log shipper or a throttled container log
+driver). Once the pipe buffer fills, every stdout write blocks.
+
+Each mode runs the same /api/text/summarize load against the fake OpenRouter:
+  inline  LOG_QUEUE_SIZE=0: records are written on the calling thread, like the old print()
+  queued  the default pipeline: a bounded queue drained by a background thread, dropping
+          records (counted) when full
+
+  python -m benchmarks.load_logging --concurrency 50 --requests 2000 --drain-bps 16384
+"""
+import argparse
+import asyncio
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+import httpx
+
+from benchmarks.harness import FAKE_UPSTREAMS, ServerProcess, app_env, configure_fake, run_load
+
+ARTICLE = "人工智能正在改变我们的生活方式。" * 50
+
+
+class ThrottledReader(threading.Thread):
+  """
+  Drains a pipe at no more than bytes_per_s; unthrottle() lets it read freely so the
+  server can exit.
+  """
+
+  def __init__(self, pipe, bytes_per_s: int | None, chunk: int = 1024):
+    super().__init__(daemon=True)
+    self.pipe = pipe
+    self.bytes_per_s = bytes_per_s
+    self.chunk = chunk
+    self.read_bytes = 0
+    self._free = threading.Event()
+    if not bytes_per_s:
+      self._free.set()
+
+  def unthrottle(self) -> None:
+    self._free.set()
+
+  def run(self) -> None:
+    while True:
+      data = self.pipe.read1(self.chunk) if not self._free.is_set() else self.pipe.read1(65536)
+      if not data:
+        return
+      self.read_bytes += len(data)
+      if not self._free.is_set():
+        self._free.wait(len(data) / self.bytes_per_s)
+
+
+async def _summarize(client: httpx.AsyncClient, i: int) -> httpx.Response:
+  return await client.post("/api/text/summarize", json={"text": f"{i}:{ARTICLE}", "max_tokens": 200})
+
+
+def _run_mode(upstream_url: str, queue_size: int, drain_bps: int | None, args) -> tuple[dict, dict, int]:
+  with tempfile.TemporaryDirectory() as workdir:
+    env = app_env(
+      upstream_url,
+      DEBUG="false",
+      DATABASE_URL=f"sqlite:///{Path(workdir) / 'app.db'}",
+      TEMP_DIR=workdir,
+      DOC_CACHE_PATH=str(Path(workdir) / "doc_cache.sqlite3"),
+      JOB_SPOOL_DIR=str(Path(workdir) / "jobs"),
+      LOG_QUEUE_SIZE=str(queue_size),
+    )
+    with ServerProcess("server.main:app", env=env, stdout=subprocess.PIPE) as service:
+      reader = ThrottledReader(service.proc.stdout, drain_bps)
+      reader.start()
+      result = asyncio.run(run_load(service.base_url, args.concurrency, args.requests, _summarize))
+      logging_stats = httpx.get(f"{service.base_url}/health", timeout=60).json()["caches"]["logging"]
+      read_bytes = reader.read_bytes
+      reader.unthrottle()
+  return result.summary(), logging_stats, read_bytes
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--concurrency", type=int, default=50)
+  parser.add_argument("--requests", type=int, default=2000)
+  parser.add_argument("--latency-ms", type=float, default=50.0)
+  parser.add_argument("--drain-bps", type=int, default=16384, help="stdout drain rate when throttled, bytes/s")
+  args = parser.parse_args()
+
+  print(f"concurrency={args.concurrency} requests={args.requests} upstream_latency={args.latency_ms}ms")
+  print(f"{'mode':>7} {'stdout':>10} {'req/s':>8} {'p50_ms':>8} {'p99_ms':>8} {'fail':>5} {'emitted':>8} {'dropped':>8} {'drained':>9}")
+  with ServerProcess(FAKE_UPSTREAMS) as upstream:
+    configure_fake(upstream.base_url, latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 5)
+    for drain_bps in (None, args.drain_bps):
+      for mode, queue_size in (("inline", 0), ("queued", 10000)):
+        summary, stats, read_bytes = _run_mode(upstream.base_url, queue_size, drain_bps, args)
+        stdout = "free" if drain_bps is None else f"{drain_bps}B/s"
+        print(
+          f"{mode:>7} {stdout:>10} {summary['throughput_rps']:8.1f} {summary['p50_ms']:8.1f} {summary['p99_ms']:8.1f} "
+          f"{summary['failures']:5d} {stats['emitted']:8d} {stats['dropped']:8d} {read_bytes:9d}"
+        )
+
+
+if __name__ == "__main__":
+  main()
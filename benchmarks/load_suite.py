@@ -0,0 +1,301 @@
+"""
+Capacity suite: the app (booted from server.main:create_app) against the fake upstreams.
+
+Each scenario gets a fresh app process with its own temp database and caches, a short
+warm-up, then --requests closed-loop requests at --concurrency. Every request carries a
+unique input, so no cache can answer for the upstream or the parser:
+
+  meal              POST /api/meal/analyze         a distinct synthetic photo per request
+  summarize         POST /api/text/summarize       a distinct ~1.6k-char article
+  files             POST /api/files/parse          a distinct --pdf-pages page PDF
+  summarize_stream  POST /api/text/summarize/stream (not in the default set)
+
+Reported per scenario: throughput, p50/p95/p99 latency, failures, and the app process's
+resident memory when idle, at the end and at peak (Linux /proc; the PDF parse pool's child
+processes are not included).
+
+--save-baseline NAME writes benchmarks/baselines/NAME.json; --baseline NAME compares against
+it and exits 1 when any scenario regresses past --tolerance (throughput down, p95/p99 or peak
+memory up, or failure rate up). Baselines are only comparable on the same machine and with the
+same parameters; a mismatch is reported.
+
+  python -m benchmarks.load_suite --save-baseline local
+  python -m benchmarks.load_suite --baseline local --tolerance 0.15
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import httpx
+
+from benchmarks.corpus import make_pdf, synth_photo
+from benchmarks.harness import (
+  FAKE_UPSTREAMS,
+  REPO_ROOT,
+  ServerProcess,
+  app_env,
+  configure_fake,
+  process_memory,
+  run_load,
+)
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+ARTICLE = "人工智能正在改变我们的生活方式。" * 100
+DEFAULT_SCENARIOS = ("meal", "summarize", "files")
+
+Sender = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+@dataclass
+class Scenario:
+  send: Sender
+  prepare: Callable[[int], bytes] | None = None  # builds request i's input ahead of the run
+
+
+def _meal(args) -> Scenario:
+  photos: dict[int, bytes] = {}
+
+  def photo(i: int) -> bytes:
+    if i not in photos:
+      photos[i] = synth_photo((args.image_width, args.image_width * 3 // 4), seed=i, quality=85)
+    return photos[i]
+
+  async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/api/meal/analyze", files={"file": (f"meal{i}.jpg", photo(i), "image/jpeg")})
+
+  return Scenario(send, photo)
+
+
+def _summarize(args) -> Scenario:
+  async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/api/text/summarize", json={"text": f"{i}:{ARTICLE}", "max_tokens": 500})
+
+  return Scenario(send)
+
+
+def _summarize_stream(args) -> Scenario:
+  async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    # The request is timed until the final "done" event has been read.
+    async with client.stream("POST", "/api/text/summarize/stream", json={"text": f"{i}:{ARTICLE}", "max_tokens": 500}) as resp:
+      await resp.aread()
+    return resp
+
+  return Scenario(send)
+
+
+def _files(args) -> Scenario:
+  documents: dict[int, bytes] = {}
+
+  def document(i: int) -> bytes:
+    if i not in documents:
+      documents[i] = make_pdf(args.pdf_pages, seed=i)
+    return documents[i]
+
+  async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    return await client.post("/api/files/parse", files={"file": (f"doc{i}.pdf", document(i), "application/pdf")})
+
+  return Scenario(send, document)
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], Scenario]] = {
+  "meal": _meal,
+  "summarize": _summarize,
+  "files": _files,
+  "summarize_stream": _summarize_stream,
+}
+
+
+def _params(args) -> dict:
+  return {
+    "concurrency": args.concurrency,
+    "requests": args.requests,
+    "latency_ms": args.latency_ms,
+    "jitter_ms": args.jitter_ms,
+    "error_rate": args.error_rate,
+    "stream_token_delay_ms": args.stream_token_delay_ms,
+    "image_width": args.image_width,
+    "pdf_pages": args.pdf_pages,
+  }
+
+
+def _git_commit() -> str | None:
+  try:
+    out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=10)
+  except (OSError, subprocess.SubprocessError):
+    return None
+  return out.stdout.strip() or None
+
+
+def run_scenario(name: str, upstream_url: str, args) -> dict:
+  scenario = SCENARIOS[name](args)
+  send = scenario.send
+  warmup = min(args.warmup, args.requests)
+  if scenario.prepare is not None:
+    # Inputs are built before the app starts so the driver does not compete with it for CPU.
+    for i in range(args.requests + warmup):
+      scenario.prepare(i)
+
+  with tempfile.TemporaryDirectory() as workdir:
+    env = app_env(
+      upstream_url,
+      DEBUG="false",
+      DATABASE_URL=f"sqlite:///{Path(workdir) / 'app.db'}",
+      TEMP_DIR=workdir,
+      DOC_CACHE_PATH=str(Path(workdir) / "doc_cache.sqlite3"),
+      JOB_SPOOL_DIR=str(Path(workdir) / "jobs"),
+      LOG_LEVEL="WARNING",
+      OPENROUTER_MAX_CONNECTIONS=str(max(args.concurrency, 16)),
+      QWEN_VL_MAX_CONNECTIONS=str(max(args.concurrency, 16)),
+    )
+    with ServerProcess("server.main:create_app", env=env, factory=True) as service:
+      idle = process_memory(service.proc.pid)
+
+      async def offset(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        return await send(client, args.requests + i)
+
+      if warmup:
+        asyncio.run(run_load(service.base_url, min(args.concurrency, warmup), warmup, offset))
+      result = asyncio.run(run_load(service.base_url, args.concurrency, args.requests, send))
+      end = process_memory(service.proc.pid)
+
+  summary = result.summary()
+  summary["failure_rate"] = round(result.failures / result.total, 4) if result.total else 0.0
+  summary["rss_idle_mb"] = idle.get("rss_mb")
+  summary["rss_end_mb"] = end.get("rss_mb")
+  summary["rss_peak_mb"] = end.get("peak_rss_mb")
+  return summary
+
+
+# metric -> True when higher is better
+_COMPARED = {
+  "throughput_rps": True,
+  "p95_ms": False,
+  "p99_ms": False,
+  "rss_peak_mb": False,
+}
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+  """
+  Regression messages for every scenario present in both runs.
+  """
+  regressions = []
+  for name, now in current["scenarios"].items():
+    before = baseline["scenarios"].get(name)
+    if before is None:
+      continue
+    for metric, higher_is_better in _COMPARED.items():
+      old, new = before.get(metric), now.get(metric)
+      if not old or new is None:
+        continue
+      change = (new - old) / old
+      if (-change if higher_is_better else change) > tolerance:
+        regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.1%})")
+    # Failure rates are compared in absolute percentage points; the baseline is often 0.
+    old_rate, new_rate = before.get("failure_rate", 0.0), now.get("failure_rate", 0.0)
+    if new_rate - old_rate > 0.01:
+      regressions.append(f"{name}: failure_rate {old_rate:.2%} -> {new_rate:.2%}")
+  return regressions
+
+
+def _print_table(results: dict, baseline: dict | None) -> None:
+  print(f"{'scenario':>16} {'req/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'fail':>5} {'rss_idle':>9} {'rss_peak':>9} {'rss_end':>8}")
+  for name, s in results["scenarios"].items():
+    print(
+      f"{name:>16} {s['throughput_rps']:8.1f} {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['failures']:5d} "
+      f"{s['rss_idle_mb'] or 0:9.1f} {s['rss_peak_mb'] or 0:9.1f} {s['rss_end_mb'] or 0:8.1f}"
+    )
+    before = (baseline or {}).get("scenarios", {}).get(name)
+    if before:
+      deltas = []
+      for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "rss_peak_mb"):
+        if before.get(metric) and s.get(metric) is not None:
+          deltas.append(f"{metric} {(s[metric] - before[metric]) / before[metric]:+.1%}")
+      print(f"{'vs baseline':>16} " + ", ".join(deltas))
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--scenarios", default=",".join(DEFAULT_SCENARIOS), help=f"comma-separated: {', '.join(SCENARIOS)}")
+  parser.add_argument("--concurrency", type=int, default=32)
+  parser.add_argument("--requests", type=int, default=400, help="measured requests per scenario")
+  parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario first")
+  parser.add_argument("--latency-ms", type=float, default=200.0, help="fake upstream latency")
+  parser.add_argument("--jitter-ms", type=float, default=50.0)
+  parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls that fail")
+  parser.add_argument("--stream-token-delay-ms", type=float, default=5.0)
+  parser.add_argument("--image-width", type=int, default=1024, help="meal photo width (4:3)")
+  parser.add_argument("--pdf-pages", type=int, default=5)
+  parser.add_argument("--save-baseline", metavar="NAME", help="write results to benchmarks/baselines/NAME.json")
+  parser.add_argument("--baseline", metavar="NAME", help="compare against benchmarks/baselines/NAME.json")
+  parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+  parser.add_argument("--json", metavar="PATH", help="also write the results to PATH")
+  args = parser.parse_args()
+
+  names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+  unknown = [name for name in names if name not in SCENARIOS]
+  if unknown:
+    parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+  baseline = None
+  if args.baseline:
+    baseline = json.loads((BASELINE_DIR / f"{args.baseline}.json").read_text())
+
+  params = _params(args)
+  results = {
+    "meta": {
+      "commit": _git_commit(),
+      "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "cpu_count": os.cpu_count(),
+      "params": params,
+    },
+    "scenarios": {},
+  }
+  print(f"commit={results['meta']['commit']} cpu_count={os.cpu_count()} " + " ".join(f"{k}={v}" for k, v in params.items()))
+
+  with ServerProcess(FAKE_UPSTREAMS) as upstream:
+    configure_fake(
+      upstream.base_url,
+      latency_ms=args.latency_ms,
+      jitter_ms=args.jitter_ms,
+      error_rate=args.error_rate,
+      stream_token_delay_ms=args.stream_token_delay_ms,
+    )
+    for name in names:
+      results["scenarios"][name] = run_scenario(name, upstream.base_url, args)
+
+  _print_table(results, baseline)
+
+  if args.json:
+    Path(args.json).write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n")
+  if args.save_baseline:
+    BASELINE_DIR.mkdir(exist_ok=True)
+    path = BASELINE_DIR / f"{args.save_baseline}.json"
+    path.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n")
+    print(f"baseline written to {path.relative_to(REPO_ROOT)}")
+
+  if baseline is not None:
+    if baseline["meta"].get("params") != params or baseline["meta"].get("cpu_count") != os.cpu_count():
+      print(f"warning: baseline {args.baseline} was recorded with different parameters or hardware")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+      print(f"REGRESSIONS vs {args.baseline} (commit {baseline['meta'].get('commit')}, tolerance {args.tolerance:.0%}):")
+      for line in regressions:
+        print(f"  {line}")
+      sys.exit(1)
+    print(f"no regressions vs {args.baseline} (commit {baseline['meta'].get('commit')}, tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,50 @@
+"""
+Load test for /api/text/summarize against a local fake OpenRouter.
+
+Boots the fake upstream and the real app as separate processes, then fires --requests
+summaries at --concurrency and reports throughput and latency percentiles.
+
+  python -m benchmarks.load_summarize --concurrency 200 --requests 2000 --latency-ms 300
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks.harness import FAKE_UPSTREAMS, ServerProcess, app_env, configure_fake, fake_stats, run_load
+
+ARTICLE = "人工智能正在改变我们的生活方式。" * 200
+
+
+async def _summarize(client: httpx.AsyncClient, i: int) -> httpx.Response:
+  # Unique text per request so no layer can short-circuit the upstream call.
+  return await client.post("/api/text/summarize", json={"text": f"{i}:{ARTICLE}", "max_tokens": 500})
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--concurrency", type=int, default=100)
+  parser.add_argument("--requests", type=int, default=1000)
+  parser.add_argument("--latency-ms", type=float, default=300.0)
+  parser.add_argument("--error-rate", type=float, default=0.0)
+  args = parser.parse_args()
+
+  with ServerProcess(FAKE_UPSTREAMS) as upstream:
+    configure_fake(upstream.base_url, latency_ms=args.latency_ms, error_rate=args.error_rate)
+    with ServerProcess("server.main:app", env=app_env(upstream.base_url)) as service:
+      result = asyncio.run(run_load(service.base_url, args.concurrency, args.requests, _summarize))
+    upstream_stats = fake_stats(upstream.base_url)
+
+  summary = result.summary()
+  print(f"concurrency={args.concurrency} upstream_latency={args.latency_ms}ms error_rate={args.error_rate}")
+  print(
+    f"requests={summary['requests']} failures={summary['failures']} throughput={summary['throughput_rps']} req/s "
+    f"wall={result.wall_s:.2f}s"
+  )
+  print(f"latency_ms p50={summary['p50_ms']} p95={summary['p95_ms']} p99={summary['p99_ms']} max={summary['max_ms']}")
+  print(f"statuses={summary['statuses']}")
+  print(f"upstream requests={upstream_stats['requests']} errors={upstream_stats['errors']} max_in_flight={upstream_stats['max_in_flight']}")
+
+
+if __name__ == "__main__":
+  main()
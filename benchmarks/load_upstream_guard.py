@@ -0,0 +1,83 @@
+"""
+Load test for the upstream guard (adaptive limit + circuit breaker) on /api/text/summarize.
+
+Runs the same closed-loop load through four phases, reconfiguring the fake OpenRouter
+between them, and prints per-phase latency/status counts next to the guard's state:
+
+  healthy   normal upstream latency
+  slow      upstream latency x --slow-factor: the limit shrinks until the baseline catches up;
+            excess calls queue for up to 2x the baseline latency, then are shed (503)
+  outage    every upstream call fails: the breaker should open and requests fail fast
+  recovery  healthy again: after the cooldown a probe closes the breaker
+
+  python -m benchmarks.load_upstream_guard --concurrency 64 --requests 400 --latency-ms 300
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.harness import FAKE_UPSTREAMS, ServerProcess, app_env, configure_fake, fake_stats, run_load
+
+ARTICLE = "人工智能正在改变我们的生活方式。" * 200
+
+
+def _sender(phase: str):
+  async def send(client: httpx.AsyncClient, i: int) -> httpx.Response:
+    # Unique text per request so the summary cache never answers for the upstream.
+    return await client.post("/api/text/summarize", json={"text": f"{phase}:{i}:{ARTICLE}", "max_tokens": 500})
+
+  return send
+
+
+def _guard_stats(base_url: str) -> dict:
+  return httpx.get(f"{base_url}/health").json()["caches"].get("upstream_openrouter", {})
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--concurrency", type=int, default=64)
+  parser.add_argument("--requests", type=int, default=400, help="requests per phase")
+  parser.add_argument("--latency-ms", type=float, default=300.0)
+  parser.add_argument("--slow-factor", type=float, default=5.0)
+  parser.add_argument("--cooldown", type=float, default=3.0, help="UPSTREAM_BREAKER_COOLDOWN for the app")
+  args = parser.parse_args()
+
+  phases = [
+    ("healthy", {"latency_ms": args.latency_ms, "error_rate": 0.0}),
+    ("slow", {"latency_ms": args.latency_ms * args.slow_factor, "error_rate": 0.0}),
+    ("outage", {"latency_ms": args.latency_ms, "error_rate": 1.0}),
+    ("recovery", {"latency_ms": args.latency_ms, "error_rate": 0.0}),
+  ]
+
+  with ServerProcess(FAKE_UPSTREAMS) as upstream:
+    env = app_env(
+      upstream.base_url,
+      UPSTREAM_BREAKER_COOLDOWN=str(args.cooldown),
+      OPENROUTER_MAX_CONNECTIONS=str(args.concurrency),
+    )
+    with ServerProcess("server.main:app", env=env) as service:
+      print(f"concurrency={args.concurrency} requests/phase={args.requests} upstream_latency={args.latency_ms}ms")
+      for name, config in phases:
+        if name == "recovery":
+          time.sleep(args.cooldown)
+        configure_fake(upstream.base_url, **config)
+        before = fake_stats(upstream.base_url)["requests"]
+        result = asyncio.run(run_load(service.base_url, args.concurrency, args.requests, _sender(name)))
+        summary = result.summary()
+        guard = _guard_stats(service.base_url)
+        upstream_calls = fake_stats(upstream.base_url)["requests"] - before
+        print(
+          f"[{name}] rps={summary['throughput_rps']} p50={summary['p50_ms']} p95={summary['p95_ms']} "
+          f"p99={summary['p99_ms']} statuses={summary['statuses']} upstream_calls={upstream_calls}"
+        )
+        print(
+          f"[{name}] guard state={guard.get('state')} limit={guard.get('limit')} shed={guard.get('shed')} "
+          f"rejected_open={guard.get('rejected_open')} opened={guard.get('opened')} "
+          f"baseline_ms={guard.get('baseline_latency_ms')}"
+        )
+
+
+if __name__ == "__main__":
+  main()
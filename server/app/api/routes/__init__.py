@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from server.app.api.routes import auth, text, files, meal
+from server.app.api.routes import auth, text, files, meal, jobs, storage
 
 router = APIRouter()
 
@@ -8,3 +8,5 @@ router.include_router(auth.router)
 router.include_router(text.router)
 router.include_router(files.router)
 router.include_router(meal.router)
+router.include_router(jobs.router)
+router.include_router(storage.router)
@@ -1,11 +1,74 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from server.app.core.deps import get_current_user
+from server.app.core.password_hasher import HashPoolBusyError
+from server.app.schemas.auth import Token, TokenRefresh, UserCreate, UserLogin, UserPublic
+from server.app.services.user_service import UserExistsError, UserService
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-@router.get("/placeholder")
-def auth_placeholder():
+def _busy(e: HashPoolBusyError) -> HTTPException:
+  return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": e.retry_after_header})
+
+
+@router.post("/register", response_model=UserPublic, status_code=status.HTTP_201_CREATED)
+async def register(payload: UserCreate):
+  """
+  Create an account. Password hashing runs in the dedicated hashing pool.
+  """
+  try:
+    user = await UserService.create_user(payload.username, payload.password)
+  except UserExistsError as e:
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+  except HashPoolBusyError as e:
+    raise _busy(e)
+  return UserPublic.model_validate(user, from_attributes=True)
+
+
+async def _login(username: str, password: str) -> Token:
+  try:
+    user = await UserService.authenticate(username, password)
+  except HashPoolBusyError as e:
+    raise _busy(e)
+  if user is None:
+    raise HTTPException(
+      status_code=status.HTTP_401_UNAUTHORIZED,
+      detail="Incorrect username or password",
+      headers={"WWW-Authenticate": "Bearer"},
+    )
+  return UserService.issue_tokens(user.id)
+
+
+@router.post("/login", response_model=Token)
+async def login(payload: UserLogin):
   """
-  Placeholder auth route. Replace with real register/login when needed.
+  Exchange username and password (JSON) for an access/refresh token pair.
   """
-  return {"message": "auth placeholder"}
+  return await _login(payload.username, payload.password)
+
+
+@router.post("/token", response_model=Token)
+async def login_form(form: OAuth2PasswordRequestForm = Depends()):
+  """
+  OAuth2 password flow: the same exchange as /login with form fields, as OAuth2 clients
+  (and the docs' Authorize button) send it.
+  """
+  return await _login(form.username, form.password)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(payload: TokenRefresh):
+  """
+  Exchange a refresh token for a new token pair.
+  """
+  try:
+    return await UserService.refresh(payload.refresh_token)
+  except ValueError as e:
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/me", response_model=UserPublic)
+async def me(user: UserPublic = Depends(get_current_user)):
+  return user
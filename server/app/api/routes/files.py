@@ -1,5 +1,8 @@
+import logging
+
 from fastapi import APIRouter, UploadFile, File, HTTPException
 
+from server.app.core.log_core import log_event
 from server.app.schemas.file import FileParseResponse, FileMeta
 from server.app.services.file_service import read_file_content, validate_file
 
@@ -11,15 +14,28 @@ async def parse_file(file: UploadFile = File(...)) -> FileParseResponse:
   try:
     ext, _ = validate_file(file)
   except ValueError as e:
-    print(f"[file_parse][reject] filename={file.filename} err={e}")
+    log_event("file_parse.reject", level=logging.WARNING, filename=file.filename, err=e)
+    raise HTTPException(status_code=400, detail=str(e))
+
+  try:
+    text, info = await read_file_content(file)
+  except ValueError as e:
+    log_event("file_parse.reject", level=logging.WARNING, filename=file.filename, err=e)
     raise HTTPException(status_code=400, detail=str(e))
+  finally:
+    await file.close()
 
-  text = await read_file_content(file)
   meta = FileMeta(
     filename=file.filename or "unnamed",
-    size=file.size or 0,  # type: ignore[attr-defined]
+    size=info["size"],
     ext=ext,
-    note="parser placeholder for non-txt files" if ext != "txt" else None,
+    pages=info["pages"],
+    pages_parsed=info["pages_parsed"],
+    truncated=info["truncated"],
+    cached=info["cached"],
+  )
+  log_event(
+    "file_parse", sample=True, filename=meta.filename, size=meta.size, ext=ext, text_len=len(text),
+    pages=meta.pages, pages_parsed=meta.pages_parsed, truncated=meta.truncated, cached=meta.cached,
   )
-  print(f"[file_parse] filename={meta.filename} size={meta.size} ext={ext} text_len={len(text)}")
   return FileParseResponse(text=text, meta=meta)
@@ -0,0 +1,135 @@
+import json
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.dbs.models import Job
+from server.app.schemas.job import JobStatusResponse, JobSubmitResponse
+from server.app.schemas.text import SummarizeRequest
+from server.app.services import file_service, job_service, meal_service
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _submitted(request: Request, job: Job) -> JobSubmitResponse:
+  return JobSubmitResponse(
+    job_id=job.id,
+    kind=job.kind,
+    status=job.status,
+    status_url=request.app.url_path_for("get_job", job_id=job.id),
+    result_url=request.app.url_path_for("get_job_result", job_id=job.id),
+  )
+
+
+async def _submit(kind: str, payload: dict) -> Job:
+  try:
+    queue = job_service.get_job_queue()
+    return await queue.submit(kind, payload)
+  except (job_service.JobQueueFullError, RuntimeError) as e:
+    log_event("jobs.reject", level=logging.WARNING, kind=kind, err=e)
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+async def _submit_spooled(kind: str, data: bytes, suffix: str, payload: dict) -> Job:
+  spool_path = await job_service.spool_upload(data, suffix)
+  try:
+    return await _submit(kind, {**payload, "spool_path": spool_path})
+  except HTTPException:
+    job_service.discard_spool({"spool_path": spool_path})
+    raise
+
+
+@router.post("/summarize", response_model=JobSubmitResponse, status_code=202)
+async def submit_summarize(payload: SummarizeRequest, request: Request) -> JobSubmitResponse:
+  job = await _submit("summarize", payload.model_dump())
+  log_event("jobs.submit", sample=True, job_id=job.id, kind="summarize", len_in=len(payload.text))
+  return _submitted(request, job)
+
+
+@router.post("/files/parse", response_model=JobSubmitResponse, status_code=202)
+async def submit_file_parse(
+  request: Request,
+  file: UploadFile = File(...),
+  summarize: bool = Form(False, description="also summarize the extracted text"),
+  ratio: Optional[float] = Form(None, ge=0.05, le=1.0),
+  max_tokens: Optional[int] = Form(None, ge=10, le=2000),
+) -> JobSubmitResponse:
+  """
+  Accept a document for background parsing (and optionally summarization).
+  The upload is validated and read now; parsing happens on a job worker.
+  """
+  try:
+    ext, _ = file_service.validate_file(file)
+    data, digest = await file_service.read_upload_bytes(file, settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+  except ValueError as e:
+    log_event("jobs.reject", level=logging.WARNING, filename=file.filename, err=e)
+    raise HTTPException(status_code=400, detail=str(e))
+  finally:
+    await file.close()
+
+  options = {"ratio": ratio, "max_tokens": max_tokens} if summarize else None
+  if options is not None:
+    options = {k: v for k, v in options.items() if v is not None}
+  payload = {"filename": file.filename or "unnamed", "ext": ext, "digest": digest, "summarize": options}
+  job = await _submit_spooled("file_parse", data, ext, payload)
+  log_event("jobs.submit", sample=True, job_id=job.id, kind="file_parse", filename=payload["filename"], size=len(data), summarize=summarize)
+  return _submitted(request, job)
+
+
+@router.post("/meal/analyze", response_model=JobSubmitResponse, status_code=202)
+async def submit_meal_analyze(request: Request, file: UploadFile = File(...)) -> JobSubmitResponse:
+  filename = file.filename or "unnamed"
+  try:
+    image_bytes, mime_type, size = await meal_service.read_image_upload(file)
+  except ValueError as e:
+    log_event("jobs.reject", level=logging.WARNING, filename=filename, err=e)
+    raise HTTPException(status_code=400, detail=str(e))
+  finally:
+    await file.close()
+
+  payload = {"filename": filename, "mime": mime_type, "size": size}
+  job = await _submit_spooled("meal_analyze", image_bytes, mime_type.rsplit("/", 1)[-1], payload)
+  log_event("jobs.submit", sample=True, job_id=job.id, kind="meal_analyze", filename=filename, size=size)
+  return _submitted(request, job)
+
+
+async def _get_job(job_id: str) -> Job:
+  try:
+    job = await job_service.get_job_queue().get(job_id)
+  except RuntimeError as e:
+    raise HTTPException(status_code=503, detail=str(e))
+  if job is None:
+    raise HTTPException(status_code=404, detail="job not found")
+  return job
+
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str) -> JobStatusResponse:
+  job = await _get_job(job_id)
+  return JobStatusResponse(
+    job_id=job.id,
+    kind=job.kind,
+    status=job.status,
+    attempts=job.attempts,
+    error=job.error,
+    created_at=job.created_at,
+    started_at=job.started_at,
+    finished_at=job.finished_at,
+    result=json.loads(job.result) if job.result else None,
+  )
+
+
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str) -> dict:
+  """
+  The job's result document (same shape as the synchronous endpoint's response);
+  409 while the job is queued or running, or if it failed.
+  """
+  job = await _get_job(job_id)
+  if job.status != job_service.SUCCEEDED:
+    detail = f"job {job.status}" + (f": {job.error}" if job.error else "")
+    raise HTTPException(status_code=409, detail=detail)
+  return json.loads(job.result or "{}")
@@ -1,56 +1,157 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from starlette.concurrency import run_in_threadpool
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 
-from server.app.schemas.meal import FoodNutritionItem, MealAnalyzeMeta, MealAnalyzeResponse, MealTotals
-from server.app.services import meal_service
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+
+from server.app.core.concurrency import BudgetExhaustedError, BudgetLease
+from server.app.core.config import settings
+from server.app.core.deps import get_current_user, get_optional_user
+from server.app.core.log_core import log_event
+from server.app.core.upstream_guard import UpstreamUnavailableError
+from server.app.schemas.auth import UserPublic
+from server.app.schemas.meal import HistoryPeriod, MealAnalyzeResponse, MealBatchResponse, NutritionHistoryResponse
+from server.app.services import meal_history_service, meal_service
 
 router = APIRouter(prefix="/meal", tags=["meal"])
 
 
+def _history_user(user: UserPublic | None) -> str | None:
+  return str(user.id) if user is not None else None
+
+
+async def _record(user_id: str | None, result: MealAnalyzeResponse | None, eaten_at: datetime | None = None) -> None:
+  if settings.MEAL_HISTORY_ENABLED and user_id and result is not None:
+    result.record_id = await meal_history_service.record_meal(user_id, result, eaten_at)
+
+
+async def _acquire_image_memory(nbytes: int) -> BudgetLease:
+  """
+  Hold nbytes of the meal image memory budget, waiting for other requests to release theirs;
+  503 + Retry-After when the wait times out.
+  """
+  try:
+    return await meal_service.image_budget.acquire(nbytes)
+  except BudgetExhaustedError as e:
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": e.retry_after_header})
+
+
+@asynccontextmanager
+async def _image_memory(nbytes: int) -> AsyncIterator[BudgetLease]:
+  lease = await _acquire_image_memory(nbytes)
+  try:
+    yield lease
+  finally:
+    lease.release()
+
+
 @router.post("/analyze", response_model=MealAnalyzeResponse)
-async def analyze_meal(file: UploadFile = File(...)) -> MealAnalyzeResponse:
+async def analyze_meal(
+  file: UploadFile = File(...),
+  user: UserPublic | None = Depends(get_optional_user),
+  eaten_at: datetime | None = Query(None, description="when the meal was eaten (default: now); recorded for signed-in users"),
+) -> MealAnalyzeResponse:
+  """
+  Analyze one meal photo. For a signed-in user (bearer token) the result is also stored in
+  their meal history (see /meal/history/{period}) and record_id is set.
+  """
   filename = file.filename or "unnamed"
+  async with _image_memory(meal_service.upload_reservation(file)) as lease:
+    try:
+      image_bytes, mime_type, size = await meal_service.read_image_upload(file)
+    except ValueError as e:
+      log_event("meal_analyze.reject", level=logging.WARNING, filename=filename, err=e)
+      raise HTTPException(status_code=400, detail=str(e))
+    finally:
+      await file.close()
+
+    try:
+      response = await meal_service.analyze_meal(image_bytes, mime_type, filename, size, lease)
+    except UpstreamUnavailableError as e:
+      raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": e.retry_after_header})
+    except ValueError as e:
+      raise HTTPException(status_code=502, detail=str(e))
+  await _record(_history_user(user), response, eaten_at)
+  return response
+
+
+async def _ndjson_batch(
+  images: list[meal_service.BatchImage], user_key: str, history_user: str | None, lease: BudgetLease
+) -> AsyncIterator[str]:
+  started = time.perf_counter()
+  items = []
   try:
-    image_bytes, mime_type, size = await meal_service.read_image_upload(file)
-  except ValueError as e:
-    print(f"[meal_analyze][reject] filename={filename} err={e}")
-    raise HTTPException(status_code=400, detail=str(e))
+    async for item in meal_service.analyze_meal_batch(images, user_key, lease):
+      await _record(history_user, item.result)
+      items.append(item)
+      yield json.dumps({"event": "item", **item.model_dump()}, ensure_ascii=False) + "\n"
   finally:
-    await file.close()
+    lease.release()
+  totals, meta = meal_service.batch_summary(items, started)
+  log_event("meal_batch", sample=True, user=user_key, images=meta.images, succeeded=meta.succeeded, failed=meta.failed, wall_ms=meta.wall_ms)
+  yield json.dumps({"event": "done", "totals": totals.model_dump(), "meta": meta.model_dump()}, ensure_ascii=False) + "\n"
+
+
+@router.post("/analyze/batch", response_model=MealBatchResponse)
+async def analyze_meal_batch(
+  request: Request,
+  files: list[UploadFile] = File(...),
+  stream: bool = Query(True, description="stream NDJSON events as images complete"),
+  user: UserPublic | None = Depends(get_optional_user),
+):
+  """
+  Analyze up to MEAL_BATCH_MAX_IMAGES photos concurrently.
+  Each image gets its own item with the status /meal/analyze would have returned, so one bad
+  photo does not fail the batch. With stream=true (default) the response is NDJSON:
+  {"event": "item", ...MealBatchItem} per image in completion order, then
+  {"event": "done", "totals", "meta"}. With stream=false a MealBatchResponse is returned.
+  Concurrency is capped per user (the signed-in user, else client address) and globally.
+  For a signed-in user, successful items are also stored in their meal history.
+  The whole batch's upload size is held from the image memory budget until it completes.
+  """
+  if len(files) > settings.MEAL_BATCH_MAX_IMAGES:
+    for file in files:
+      await file.close()
+    raise HTTPException(status_code=400, detail=f"too many images (max {settings.MEAL_BATCH_MAX_IMAGES})")
 
+  lease = await _acquire_image_memory(sum(meal_service.upload_reservation(file) for file in files))
+  history_user = _history_user(user)
+  user_key = f"user:{history_user}" if history_user else (request.client.host if request.client else "anonymous")
   try:
-    result, used_json_schema, model = await run_in_threadpool(
-      meal_service.analyze_meal_image_bytes,
-      image_bytes,
-      mime_type,
-    )
-  except ValueError as e:
-    print(f"[meal_analyze][error] filename={filename} size={size} mime={mime_type} err={e}")
-    raise HTTPException(status_code=502, detail=str(e))
+    images = await meal_service.read_batch_uploads(files)
+  except BaseException:
+    lease.release()
+    raise
+  if stream:
+    # The generator releases the lease when the stream ends.
+    return StreamingResponse(_ndjson_batch(images, user_key, history_user, lease), media_type="application/x-ndjson")
 
   try:
-    foods_raw = (result or {}).get("foods") or []
-    foods = [FoodNutritionItem(**item) for item in foods_raw]
-  except Exception as e:  # noqa: BLE001
-    print(f"[meal_analyze][invalid_output] filename={filename} err={e} raw={result}")
-    raise HTTPException(status_code=502, detail=f"Invalid model output: {e}")
-
-  totals = MealTotals(
-    weight=sum(item.weight for item in foods),
-    calories=sum(item.calories for item in foods),
-    carbohydrates=sum(item.carbohydrates for item in foods),
-    protein=sum(item.protein for item in foods),
-    fat=sum(item.fat for item in foods),
-  )
-  meta = MealAnalyzeMeta(
-    filename=filename,
-    size=size,
-    mime=mime_type,
-    model=model,
-    used_json_schema=used_json_schema,
-  )
-  print(
-    f"[meal_analyze] filename={filename} size={size} mime={mime_type} foods={len(foods)} model={model} schema={used_json_schema}"
-  )
-  return MealAnalyzeResponse(foods=foods, totals=totals, meta=meta)
+    response = await meal_service.analyze_meal_batch_response(images, user_key, lease)
+  finally:
+    lease.release()
+  for item in response.items:
+    await _record(history_user, item.result)
+  log_event("meal_batch", sample=True, user=user_key, images=response.meta.images, succeeded=response.meta.succeeded, failed=response.meta.failed, wall_ms=response.meta.wall_ms)
+  return response
+
 
+@router.get("/history/{period}", response_model=NutritionHistoryResponse)
+async def nutrition_history(
+  period: HistoryPeriod,
+  start: date | None = Query(None, description="first day (default: a period-dependent window ending at end)"),
+  end: date | None = Query(None, description="last day (default: today in MEAL_HISTORY_TZ)"),
+  user: UserPublic = Depends(get_current_user),
+) -> NutritionHistoryResponse:
+  """
+  daily / weekly (ISO, Monday-based) / monthly nutrition totals for the signed-in user,
+  read from per-day summary rows. The range is widened to whole periods.
+  """
+  try:
+    return await meal_history_service.nutrition_history(_history_user(user), period, start, end)
+  except ValueError as e:
+    raise HTTPException(status_code=400, detail=str(e))
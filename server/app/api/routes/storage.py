@@ -0,0 +1,32 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.services.storage_service import LocalStore, image_store
+
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+
+@router.get("/objects/{key:path}", include_in_schema=False)
+async def get_object(key: str, expires: int = Query(...), signature: str = Query(...)) -> FileResponse:
+  """
+  Serve an object of the local storage backend to whoever holds a URL from its signed_url
+  (the model provider). 404 unless STORAGE_BACKEND=local.
+  """
+  try:
+    backend = image_store.backend() if settings.STORAGE_BACKEND.lower() == "local" else None
+  except ValueError:
+    backend = None
+  if not isinstance(backend, LocalStore):
+    raise HTTPException(status_code=404, detail="not found")
+  try:
+    path = backend.verified_path(key, expires, signature)
+  except ValueError as e:
+    log_event("storage.reject", level=logging.WARNING, key=key, err=e)
+    raise HTTPException(status_code=403, detail=str(e))
+  if not path.is_file():
+    raise HTTPException(status_code=404, detail="not found")
+  return FileResponse(path, headers={"Cache-Control": "private, no-transform"})
@@ -1,8 +1,17 @@
+import json
+import logging
+import time
+from collections.abc import AsyncIterator
+
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 
-from server.app.schemas.text import TextParseRequest, TextParseResponse, SummarizeRequest, SummarizeResponse, SummarizeMeta, TextMeta
+from server.app.schemas.text import TextParseRequest, TextParseResponse, SummarizeRequest, SummarizeResponse, TextMeta
 from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.core.upstream_guard import UpstreamUnavailableError
 from server.app.services import text_service
+from server.app.services.file_service import sanitize_text
 
 router = APIRouter(prefix="/text", tags=["text"])
 
@@ -11,29 +20,99 @@ router = APIRouter(prefix="/text", tags=["text"])
 def parse_text(payload: TextParseRequest) -> TextParseResponse:
   text, truncated = text_service.clamp_text(payload.content)
   meta = TextMeta(length=len(text), truncated=truncated)
-  print(f"[parse_text] len_in={len(payload.content)} len_out={len(text)} truncated={truncated}")
+  log_event("parse_text", sample=True, len_in=len(payload.content), len_out=len(text), truncated=truncated)
   return TextParseResponse(text=text, meta=meta)
 
 
 @router.post("/summarize", response_model=SummarizeResponse)
-def summarize_text(payload: SummarizeRequest) -> SummarizeResponse:
-  base_text, truncated_input = text_service.clamp_text(payload.text)
+async def summarize_text(payload: SummarizeRequest) -> SummarizeResponse:
+  try:
+    response = await text_service.summarize_request(payload)
+  except UpstreamUnavailableError as e:
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": e.retry_after_header})
+  except ValueError as e:
+    # If not configured or failed, expose as 502 to front-end
+    raise HTTPException(status_code=502, detail=str(e))
+  if not response.summary:
+    raise HTTPException(status_code=400, detail="No content to summarize")
+  return response
+
+
+def _sse(event: str, data: dict) -> str:
+  return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/summarize/stream")
+async def summarize_text_stream(payload: SummarizeRequest) -> StreamingResponse:
+  """
+  Server-Sent Events summary. Events:
+  - token: {"text"} raw deltas as they arrive
+  - sentence: {"index", "text"} sentence-boundary chunks of at most TTS_SLICE_LIMIT chars, for TTS
+  - done: {"model", "ttfb_ms", "total_ms", "length", "truncated"}
+  - error: {"detail"} if the upstream fails mid-stream
+  Upstream time-to-first-token is also returned in the X-Upstream-TTFB-Ms / Server-Timing headers.
+  """
+  started = time.perf_counter()
+  # Same cleanup as /text/summarize, so control and zero-width characters never reach the model.
+  base_text, truncated_input = text_service.clamp_text(sanitize_text(payload.text))
   ratio = payload.ratio or settings.SUMMARY_DEFAULT_RATIO
   max_tokens = payload.max_tokens or settings.TTS_SLICE_LIMIT
+  target_len = text_service.summary_target_len(base_text, ratio, max_tokens)
 
+  # Wait for the first delta before committing to a 200, so config/upstream errors still map to 502.
+  deltas = text_service.stream_summarize_llm(base_text, max_tokens=max_tokens)
   try:
-    summary, truncated_output, model = text_service.summarize_llm(
-      base_text,
-      ratio=ratio,
-      max_tokens=max_tokens,
-    )
+    first = await deltas.__anext__()
+  except StopAsyncIteration:
+    raise HTTPException(status_code=400, detail="No content to summarize")
+  except UpstreamUnavailableError as e:
+    log_event("summarize_stream.shed", level=logging.WARNING, len_in=len(payload.text), err=e)
+    raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": e.retry_after_header})
   except ValueError as e:
-    # If not configured or failed, expose as 502 to front-end
-    print(f"[summarize_text][error] len_in={len(payload.text)} ratio={ratio} max_tokens={max_tokens} err={e}")
+    log_event("summarize_stream.error", level=logging.ERROR, len_in=len(payload.text), ratio=ratio, max_tokens=max_tokens, err=e)
     raise HTTPException(status_code=502, detail=str(e))
+  ttfb_ms = round((time.perf_counter() - started) * 1000, 1)
 
-  meta = SummarizeMeta(ratio=ratio, truncated=truncated_input or truncated_output, model=model)
-  print(f"[summarize_text] len_in={len(payload.text)} ratio={ratio} max_tokens={max_tokens} len_out={len(summary)} model={model} truncated_out={truncated_output}")
-  if not summary:
-    raise HTTPException(status_code=400, detail="No content to summarize")
-  return SummarizeResponse(summary=summary, meta=meta)
+  async def events() -> AsyncIterator[str]:
+    chunker = text_service.SentenceChunker(settings.TTS_SLICE_LIMIT)
+    sentence_index = 0
+    length = 0
+    delta: str | None = first
+    try:
+      while delta is not None:
+        length += len(delta)
+        yield _sse("token", {"text": delta})
+        for sentence in chunker.feed(delta):
+          yield _sse("sentence", {"index": sentence_index, "text": sentence})
+          sentence_index += 1
+        delta = await anext(deltas, None)
+    except ValueError as e:
+      log_event("summarize_stream.error", level=logging.ERROR, len_in=len(payload.text), emitted=length, err=e)
+      yield _sse("error", {"detail": str(e)})
+      return
+    finally:
+      # Release the upstream connection promptly if the client went away mid-stream.
+      await deltas.aclose()
+    for sentence in chunker.flush():
+      yield _sse("sentence", {"index": sentence_index, "text": sentence})
+      sentence_index += 1
+    total_ms = round((time.perf_counter() - started) * 1000, 1)
+    log_event(
+      "summarize_stream", sample=True, len_in=len(payload.text), ratio=ratio, max_tokens=max_tokens, len_out=length,
+      sentences=sentence_index, ttfb_ms=ttfb_ms, total_ms=total_ms,
+    )
+    yield _sse("done", {
+      "model": settings.OPENROUTER_MODEL,
+      "ttfb_ms": ttfb_ms,
+      "total_ms": total_ms,
+      "length": length,
+      "truncated": truncated_input or length > target_len,
+    })
+
+  headers = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+    "X-Upstream-TTFB-Ms": str(ttfb_ms),
+    "Server-Timing": f"upstream-ttfb;dur={ttfb_ms}",
+  }
+  return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
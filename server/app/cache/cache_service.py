@@ -1,4 +1,242 @@
 """
-Placeholder cache service. Wire real Redis helpers when needed.
+In-process result caches (TTL + LRU), optionally backed by Redis via redis_core.
 """
-from server.app.core.redis_core import get_redis  # noqa: F401
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, Protocol
+
+from server.app.cache.document_cache import DocumentCache
+from server.app.cache.phash_index import PerceptualHashIndex
+from server.app.cache.singleflight import SingleFlight
+from server.app.core import redis_core
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+
+
+def make_cache_key(*parts: str | bytes) -> str:
+  """
+  Build a stable hex key from ordered parts. Parts are length-prefixed so
+  ("ab", "c") and ("a", "bc") never collide.
+  """
+  h = hashlib.sha256()
+  for part in parts:
+    data = part.encode("utf-8") if isinstance(part, str) else part
+    h.update(len(data).to_bytes(8, "big"))
+    h.update(data)
+  return h.hexdigest()
+
+
+class TTLCache:
+  """
+  Size-bounded LRU cache with a per-entry TTL.
+  Not thread-safe: use from the event loop only.
+  """
+
+  def __init__(self, max_entries: int, ttl_seconds: float):
+    self.max_entries = max(1, max_entries)
+    self.ttl_seconds = ttl_seconds
+    self._data: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+  def __len__(self) -> int:
+    return len(self._data)
+
+  def get(self, key: str) -> Any | None:
+    entry = self._data.get(key)
+    if entry is None:
+      return None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+      del self._data[key]
+      return None
+    self._data.move_to_end(key)
+    return value
+
+  def set(self, key: str, value: Any) -> None:
+    self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+    self._data.move_to_end(key)
+    while len(self._data) > self.max_entries:
+      self._data.popitem(last=False)
+
+  def delete(self, key: str) -> None:
+    self._data.pop(key, None)
+
+  def clear(self) -> None:
+    self._data.clear()
+
+
+class ResultCache:
+  """
+  Named two-level cache: in-process TTLCache in front of an optional Redis namespace.
+  Values must be JSON-serializable when Redis is used.
+  Redis failures degrade to local-only caching and never fail the request.
+  """
+
+  def __init__(self, name: str, max_entries: int, ttl_seconds: int, use_redis: bool = False):
+    self.name = name
+    self.ttl_seconds = ttl_seconds
+    self.use_redis = use_redis
+    self.local = TTLCache(max_entries, ttl_seconds)
+    self.hits = 0
+    self.misses = 0
+    self.redis_hits = 0
+    self.redis_errors = 0
+    self.computes = 0
+    self.avg_compute_ms = 0.0
+    self.saved_ms = 0.0
+    self._flight = SingleFlight(name)
+    register_stats(name, self)
+
+  def _redis_key(self, key: str) -> str:
+    return f"cache:{self.name}:{key}"
+
+  async def get(self, key: str) -> Any | None:
+    value = self.local.get(key)
+    if value is not None:
+      self.hits += 1
+      return value
+
+    client = redis_core.redis_client if self.use_redis else None
+    if client is not None:
+      try:
+        raw = await client.get(self._redis_key(key))
+      except Exception as e:  # noqa: BLE001
+        self.redis_errors += 1
+        log_event("cache.redis_error", level=logging.WARNING, cache=self.name, op="get", err=e)
+        raw = None
+      if raw is not None:
+        try:
+          value = json.loads(raw)
+        except ValueError as e:
+          # A corrupt or foreign value is a miss; the recomputed value overwrites it.
+          self.redis_errors += 1
+          log_event("cache.redis_error", level=logging.WARNING, cache=self.name, op="decode", err=e)
+          value = None
+      if value is not None:
+        self.local.set(key, value)
+        self.hits += 1
+        self.redis_hits += 1
+        return value
+
+    self.misses += 1
+    return None
+
+  async def set(self, key: str, value: Any) -> None:
+    self.local.set(key, value)
+    client = redis_core.redis_client if self.use_redis else None
+    if client is None:
+      return
+    try:
+      await client.set(self._redis_key(key), json.dumps(value, ensure_ascii=False), ex=self.ttl_seconds)
+    except Exception as e:  # noqa: BLE001
+      self.redis_errors += 1
+      log_event("cache.redis_error", level=logging.WARNING, cache=self.name, op="set", err=e)
+
+  async def delete(self, key: str) -> None:
+    self.local.delete(key)
+    client = redis_core.redis_client if self.use_redis else None
+    if client is None:
+      return
+    try:
+      await client.delete(self._redis_key(key))
+    except Exception as e:  # noqa: BLE001
+      self.redis_errors += 1
+      log_event("cache.redis_error", level=logging.WARNING, cache=self.name, op="delete", err=e)
+
+  async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+    """
+    Cached value, or one shared computation per key (single-flight) that is stored on success.
+    Failures reach every waiter and are not cached.
+    Returns (value, from_cache); from_cache is True for cache hits and coalesced waiters.
+    """
+    if not self._flight.in_flight(key):
+      value = await self.get(key)
+      if value is not None:
+        self.saved_ms += self.avg_compute_ms
+        return value, True
+
+    value, shared = await self._flight.do(key, lambda: self._compute_and_store(key, compute))
+    if shared:
+      self.saved_ms += self.avg_compute_ms
+    return value, shared
+
+  async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    started = time.perf_counter()
+    value = await compute()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    self.computes += 1
+    # EWMA of upstream cost, used to estimate latency saved by hits.
+    self.avg_compute_ms = elapsed_ms if self.computes == 1 else 0.9 * self.avg_compute_ms + 0.1 * elapsed_ms
+    await self.set(key, value)
+    return value
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "entries": len(self.local),
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+      "redis_hits": self.redis_hits,
+      "redis_errors": self.redis_errors,
+      "coalesced": self._flight.coalesced,
+      "in_flight": len(self._flight),
+      "avg_compute_ms": round(self.avg_compute_ms, 1),
+      "saved_upstream_ms": round(self.saved_ms, 1),
+    }
+
+
+class StatsProvider(Protocol):
+  def stats(self) -> dict: ...
+
+
+_registry: dict[str, StatsProvider] = {}
+
+
+def register_stats(name: str, provider: StatsProvider) -> None:
+  _registry[name] = provider
+
+
+def get_cache_stats() -> dict[str, dict]:
+  return {name: provider.stats() for name, provider in _registry.items()}
+
+
+meal_result_cache = ResultCache(
+  "meal",
+  max_entries=settings.MEAL_CACHE_MAX_ENTRIES,
+  ttl_seconds=settings.MEAL_CACHE_TTL_SECONDS,
+  use_redis=settings.CACHE_USE_REDIS,
+)
+
+summary_cache = ResultCache(
+  "summary",
+  max_entries=settings.SUMMARY_CACHE_MAX_ENTRIES,
+  ttl_seconds=settings.SUMMARY_CACHE_TTL_SECONDS,
+  use_redis=settings.CACHE_USE_REDIS,
+)
+
+summary_chunk_cache = ResultCache(
+  "summary_chunk",
+  max_entries=settings.SUMMARY_CHUNK_CACHE_MAX_ENTRIES,
+  ttl_seconds=settings.SUMMARY_CHUNK_CACHE_TTL_SECONDS,
+  use_redis=settings.CACHE_USE_REDIS,
+)
+
+user_cache = ResultCache(
+  "auth_user",
+  max_entries=settings.USER_CACHE_MAX_ENTRIES,
+  ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+  use_redis=settings.CACHE_USE_REDIS,
+)
+
+meal_phash_index = PerceptualHashIndex(
+  max_entries=settings.MEAL_PHASH_MAX_ENTRIES,
+  max_distance=settings.MEAL_PHASH_MAX_DISTANCE,
+)
+register_stats("meal_phash", meal_phash_index)
+
+document_cache = DocumentCache(settings.DOC_CACHE_PATH, max_bytes=settings.DOC_CACHE_MAX_BYTES)
+register_stats("documents", document_cache)
@@ -0,0 +1,152 @@
+"""
+Disk-backed cache of parsed documents (SQLite), keyed by upload content hash.
+
+Entries survive restarts and are shared by every worker process on the host. Total stored
+text is capped at max_bytes; the least recently used entries are evicted first.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from server.app.core.log_core import log_event
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+  key TEXT PRIMARY KEY,
+  text TEXT NOT NULL,
+  info TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_documents_last_access ON documents (last_access);
+"""
+
+
+def _totals(conn: sqlite3.Connection) -> tuple[int, int]:
+  return conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents").fetchone()
+
+
+class DocumentCache:
+  """
+  Blocking API (sqlite3): call from a worker thread. One connection guarded by a lock.
+  SQLite failures are counted and degrade to a miss; they never fail the request.
+  Entry and byte totals are kept in memory: loaded at connect, updated on set and eviction,
+  and re-read from the table whenever an eviction pass runs (other processes write too).
+  """
+
+  def __init__(self, path: str, max_bytes: int):
+    self.path = path
+    self.max_bytes = max(0, max_bytes)
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.errors = 0
+    self._entries = 0
+    self._bytes = 0
+    self._lock = threading.Lock()
+    self._conn: sqlite3.Connection | None = None
+
+  def _connect(self) -> sqlite3.Connection:
+    if self._conn is None:
+      Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+      conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA synchronous=NORMAL")
+      conn.executescript(_SCHEMA)
+      self._entries, self._bytes = _totals(conn)
+      self._conn = conn
+    return self._conn
+
+  def get(self, key: str) -> tuple[str, dict[str, Any]] | None:
+    """
+    Returns (text, info) or None, refreshing the entry's LRU position on a hit.
+    """
+    try:
+      with self._lock:
+        conn = self._connect()
+        row = conn.execute("SELECT text, info FROM documents WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+          with conn:
+            conn.execute("UPDATE documents SET last_access = ? WHERE key = ?", (time.time(), key))
+    except sqlite3.Error as e:
+      self.errors += 1
+      log_event("doc_cache.error", level=logging.WARNING, op="get", err=e)
+      return None
+    if row is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    return row[0], json.loads(row[1])
+
+  def set(self, key: str, text: str, info: dict[str, Any]) -> None:
+    size = len(text.encode("utf-8"))
+    if size > self.max_bytes:
+      return
+    try:
+      with self._lock:
+        conn = self._connect()
+        with conn:
+          replaced = conn.execute("SELECT size FROM documents WHERE key = ?", (key,)).fetchone()
+          conn.execute(
+            "INSERT OR REPLACE INTO documents (key, text, info, size, last_access) VALUES (?, ?, ?, ?, ?)",
+            (key, text, json.dumps(info), size, time.time()),
+          )
+          entries = self._entries + (replaced is None)
+          total = self._bytes + size - (replaced[0] if replaced is not None else 0)
+          evicted = 0
+          if total > self.max_bytes:
+            entries, total, evicted = self._evict(conn)
+        # Only counted once the transaction committed.
+        self._entries, self._bytes = entries, total
+        self.evictions += evicted
+    except sqlite3.Error as e:
+      self.errors += 1
+      log_event("doc_cache.error", level=logging.WARNING, op="set", err=e)
+
+  def _evict(self, conn: sqlite3.Connection) -> tuple[int, int, int]:
+    """
+    Drop the least recently used entries until the table fits max_bytes.
+    Returns (entries, bytes, evicted) after the deletes.
+    """
+    entries, total = _totals(conn)
+    if total <= self.max_bytes:
+      return entries, total, 0
+    # Walk from the oldest entry and drop until the total fits again.
+    stale: list[str] = []
+    for key, size in conn.execute("SELECT key, size FROM documents ORDER BY last_access"):
+      stale.append(key)
+      total -= size
+      if total <= self.max_bytes:
+        break
+    conn.executemany("DELETE FROM documents WHERE key = ?", [(k,) for k in stale])
+    return entries - len(stale), total, len(stale)
+
+  def clear(self) -> None:
+    with self._lock:
+      conn = self._connect()
+      with conn:
+        conn.execute("DELETE FROM documents")
+      self._entries, self._bytes = 0, 0
+
+  def close(self) -> None:
+    with self._lock:
+      if self._conn is not None:
+        self._conn.close()
+        self._conn = None
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "entries": self._entries,
+      "bytes": self._bytes,
+      "max_bytes": self.max_bytes,
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+      "evictions": self.evictions,
+      "errors": self.errors,
+    }
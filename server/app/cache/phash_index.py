@@ -0,0 +1,88 @@
+"""
+Near-duplicate lookup over 64-bit perceptual image hashes.
+
+Hashes are split into (max_distance + 1) bands and bucketed per band. By the
+pigeonhole principle two hashes within max_distance bits share at least one
+band exactly, so a lookup only compares against candidates in matching buckets.
+"""
+from collections import OrderedDict
+
+
+class PerceptualHashIndex:
+  """
+  LRU-bounded index mapping perceptual hashes to result-cache keys.
+  Not thread-safe: use from the event loop only.
+  """
+
+  def __init__(self, max_entries: int, max_distance: int, hash_bits: int = 64):
+    self.max_entries = max(1, max_entries)
+    self.max_distance = min(max(0, max_distance), hash_bits // 4)
+    self.lookups = 0
+    self.near_hits = 0
+
+    n_bands = self.max_distance + 1
+    base, extra = divmod(hash_bits, n_bands)
+    self._bands: list[tuple[int, int]] = []
+    shift = 0
+    for i in range(n_bands):
+      width = base + (1 if i < extra else 0)
+      self._bands.append((shift, (1 << width) - 1))
+      shift += width
+
+    self._entries: OrderedDict[int, str] = OrderedDict()
+    self._buckets: list[dict[int, set[int]]] = [{} for _ in self._bands]
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def _band_values(self, image_hash: int) -> list[int]:
+    return [(image_hash >> shift) & mask for shift, mask in self._bands]
+
+  def add(self, image_hash: int, value: str) -> None:
+    if image_hash in self._entries:
+      self._entries[image_hash] = value
+      self._entries.move_to_end(image_hash)
+      return
+    self._entries[image_hash] = value
+    for bucket, band in zip(self._buckets, self._band_values(image_hash)):
+      bucket.setdefault(band, set()).add(image_hash)
+    while len(self._entries) > self.max_entries:
+      old_hash, _ = self._entries.popitem(last=False)
+      self._remove_from_buckets(old_hash)
+
+  def _remove_from_buckets(self, image_hash: int) -> None:
+    for bucket, band in zip(self._buckets, self._band_values(image_hash)):
+      members = bucket.get(band)
+      if members is None:
+        continue
+      members.discard(image_hash)
+      if not members:
+        del bucket[band]
+
+  def lookup(self, image_hash: int) -> str | None:
+    """
+    Return the value stored for the closest hash within max_distance, or None.
+    """
+    self.lookups += 1
+    best_hash: int | None = None
+    best_distance = self.max_distance + 1
+    for bucket, band in zip(self._buckets, self._band_values(image_hash)):
+      for candidate in bucket.get(band, ()):
+        distance = (candidate ^ image_hash).bit_count()
+        if distance < best_distance:
+          best_hash, best_distance = candidate, distance
+    if best_hash is None:
+      return None
+    self._entries.move_to_end(best_hash)
+    return self._entries[best_hash]
+
+  def record_near_hit(self) -> None:
+    self.near_hits += 1
+
+  def stats(self) -> dict:
+    return {
+      "entries": len(self._entries),
+      "lookups": self.lookups,
+      "near_hits": self.near_hits,
+      "max_distance": self.max_distance,
+    }
@@ -0,0 +1,80 @@
+"""
+Request coalescing: concurrent calls with the same key share one in-flight execution.
+"""
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+
+class _Flight:
+  __slots__ = ("task", "waiters")
+
+  def __init__(self, task: asyncio.Task):
+    self.task = task
+    self.waiters = 0
+
+
+class SingleFlight:
+  """
+  Per-key coalescing of async calls (Go's singleflight). The shared task is shielded from
+  individual callers: one caller being cancelled (e.g. client disconnect) does not cancel it
+  for the others. When every waiter has gone away the task is cancelled, so abandoned upstream
+  work is not left running. Exceptions propagate to all waiters. Event-loop only.
+  """
+
+  def __init__(self, name: str):
+    self.name = name
+    self.calls = 0
+    self.executions = 0
+    self.coalesced = 0
+    self.abandoned = 0
+    self._flights: dict[str, _Flight] = {}
+
+  def in_flight(self, key: str) -> bool:
+    return key in self._flights
+
+  async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+    """
+    Run fn() once per key among concurrent callers.
+    Returns (value, shared); shared is True when this caller joined another caller's execution.
+    """
+    self.calls += 1
+    flight = self._flights.get(key)
+    shared = flight is not None
+    if flight is None:
+      self.executions += 1
+      flight = _Flight(asyncio.ensure_future(fn()))
+      self._flights[key] = flight
+      flight.task.add_done_callback(lambda t: self._finish(key, t))
+    else:
+      self.coalesced += 1
+
+    flight.waiters += 1
+    try:
+      return await asyncio.shield(flight.task), shared
+    except asyncio.CancelledError:
+      if flight.waiters == 1 and not flight.task.done():
+        self.abandoned += 1
+        flight.task.cancel()
+      raise
+    finally:
+      flight.waiters -= 1
+
+  def _finish(self, key: str, task: asyncio.Task) -> None:
+    flight = self._flights.get(key)
+    if flight is not None and flight.task is task:
+      del self._flights[key]
+    if not task.cancelled():
+      task.exception()  # mark retrieved; waiters re-raise it themselves
+
+  def __len__(self) -> int:
+    return len(self._flights)
+
+  def stats(self) -> dict:
+    return {
+      "calls": self.calls,
+      "executions": self.executions,
+      "coalesced": self.coalesced,
+      "abandoned": self.abandoned,
+      "in_flight": len(self._flights),
+    }
@@ -0,0 +1,63 @@
+"""
+Decoded-JWT cache: repeated requests with the same bearer token skip signature
+verification and claim parsing.
+
+Keys are digests of the token, so the cache never holds the raw credential. An entry
+lives for at most the cache TTL and never past the token's own "exp" claim.
+"""
+import hashlib
+import time
+from collections.abc import Callable
+
+from server.app.cache.cache_service import TTLCache
+
+
+class TokenCache:
+  """
+  Process-local cache of verified token payloads. Only successful decodes are stored.
+  Not thread-safe: use from the event loop only.
+  """
+
+  def __init__(self, max_entries: int, ttl_seconds: float, enabled: bool = True):
+    self.enabled = enabled
+    self._cache = TTLCache(max_entries, ttl_seconds)
+    self.hits = 0
+    self.misses = 0
+    self.expired = 0
+
+  @staticmethod
+  def _key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+  def decode(self, token: str, verify: Callable[[str], dict]) -> dict:
+    """
+    Cached payload for token, else verify(token) and store the result.
+    Exceptions from verify propagate and nothing is stored.
+    """
+    if not self.enabled:
+      return verify(token)
+    key = self._key(token)
+    payload = self._cache.get(key)
+    if payload is not None:
+      if payload.get("exp", 0) > time.time():
+        self.hits += 1
+        return payload
+      self._cache.delete(key)
+      self.expired += 1
+    self.misses += 1
+    payload = verify(token)
+    self._cache.set(key, payload)
+    return payload
+
+  def clear(self) -> None:
+    self._cache.clear()
+
+  def stats(self) -> dict:
+    lookups = self.hits + self.misses
+    return {
+      "entries": len(self._cache),
+      "hits": self.hits,
+      "misses": self.misses,
+      "expired": self.expired,
+      "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+    }
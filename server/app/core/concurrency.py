@@ -0,0 +1,165 @@
+"""
+Concurrency caps shared across requests.
+"""
+import asyncio
+import math
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+
+class KeyedSemaphore:
+  """
+  One asyncio.Semaphore per key (e.g. per user), created on first use and dropped once no
+  caller holds or waits for it, so the map stays bounded by the number of active keys.
+  Event-loop only.
+  """
+
+  def __init__(self, limit: int):
+    self.limit = max(1, limit)
+    self._entries: dict[str, tuple[asyncio.Semaphore, list[int]]] = {}
+
+  @asynccontextmanager
+  async def acquire(self, key: str) -> AsyncIterator[None]:
+    entry = self._entries.get(key)
+    if entry is None:
+      entry = self._entries[key] = (asyncio.Semaphore(self.limit), [0])
+    semaphore, users = entry
+    users[0] += 1
+    try:
+      async with semaphore:
+        yield
+    finally:
+      users[0] -= 1
+      if users[0] == 0:
+        del self._entries[key]
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def stats(self) -> dict:
+    return {"limit": self.limit, "active_keys": len(self._entries)}
+
+
+class BudgetExhaustedError(ValueError):
+  """
+  A ByteBudget reservation waited out its timeout; routes map this to 503 + Retry-After.
+  """
+
+  def __init__(self, name: str, retry_after: float):
+    super().__init__(f"{name} busy, retry after {math.ceil(retry_after)}s")
+    self.retry_after = retry_after
+
+  @property
+  def retry_after_header(self) -> str:
+    return str(max(1, math.ceil(self.retry_after)))
+
+
+class BudgetLease:
+  """
+  Bytes held from a ByteBudget; release() is idempotent. A lease dropped without being
+  released (e.g. handed to a response generator that never ran) releases when collected.
+  share() hands the same bytes to another holder (e.g. a task that may outlive the caller);
+  they go back to the budget once every holder has released.
+  """
+  __slots__ = ("_budget", "nbytes", "_holders")
+
+  def __init__(self, budget: "ByteBudget", nbytes: int, holders: list[int] | None = None):
+    self._budget = budget
+    self.nbytes = nbytes
+    self._holders = holders if holders is not None else [1]
+
+  def share(self) -> "BudgetLease":
+    if not self.nbytes:
+      return BudgetLease(self._budget, 0)
+    self._holders[0] += 1
+    return BudgetLease(self._budget, self.nbytes, self._holders)
+
+  def release(self) -> None:
+    if self.nbytes:
+      self._holders[0] -= 1
+      if self._holders[0] == 0:
+        self._budget._release(self.nbytes)
+      self.nbytes = 0
+
+  def __del__(self) -> None:
+    self.release()
+
+
+class ByteBudget:
+  """
+  A semaphore counted in bytes: callers reserve what they are about to hold in memory and
+  wait, first come first served, while the total in flight would exceed max_bytes. Waiting
+  longer than wait_timeout raises BudgetExhaustedError. A reservation larger than the whole
+  budget is clamped to it, so it still runs, alone. Event-loop only.
+  """
+
+  def __init__(self, name: str, max_bytes: int, wait_timeout: float):
+    self.name = name
+    self.max_bytes = max(1, max_bytes)
+    self.wait_timeout = wait_timeout
+    self.in_use = 0
+    self.peak = 0
+    self.waited = 0
+    self.rejected = 0
+    self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+
+  async def acquire(self, nbytes: int) -> BudgetLease:
+    nbytes = min(max(0, nbytes), self.max_bytes)
+    if not self._waiters and self.in_use + nbytes <= self.max_bytes:
+      self._take(nbytes)
+      return BudgetLease(self, nbytes)
+
+    self.waited += 1
+    waiter = asyncio.get_running_loop().create_future()
+    entry = (nbytes, waiter)
+    self._waiters.append(entry)
+    try:
+      await asyncio.wait_for(asyncio.shield(waiter), self.wait_timeout)
+    except asyncio.TimeoutError:
+      if not waiter.done():
+        self._waiters.remove(entry)
+        self.rejected += 1
+        self._wake()  # the head may have been blocking smaller reservations behind it
+        raise BudgetExhaustedError(self.name, self.wait_timeout) from None
+    except asyncio.CancelledError:
+      if waiter.done():
+        self._release(nbytes)  # granted while being cancelled: hand it back
+      else:
+        self._waiters.remove(entry)
+        self._wake()
+      raise
+    return BudgetLease(self, nbytes)
+
+  @asynccontextmanager
+  async def reserve(self, nbytes: int) -> AsyncIterator[BudgetLease]:
+    lease = await self.acquire(nbytes)
+    try:
+      yield lease
+    finally:
+      lease.release()
+
+  def _take(self, nbytes: int) -> None:
+    self.in_use += nbytes
+    self.peak = max(self.peak, self.in_use)
+
+  def _release(self, nbytes: int) -> None:
+    self.in_use -= nbytes
+    self._wake()
+
+  def _wake(self) -> None:
+    # Strict FIFO: a large reservation at the head is not starved by smaller ones behind it.
+    while self._waiters and self.in_use + self._waiters[0][0] <= self.max_bytes:
+      nbytes, waiter = self._waiters.popleft()
+      self._take(nbytes)
+      waiter.set_result(None)
+
+  def stats(self) -> dict:
+    return {
+      "max_bytes": self.max_bytes,
+      "in_use": self.in_use,
+      "peak": self.peak,
+      "waiting": len(self._waiters),
+      "waited": self.waited,
+      "rejected": self.rejected,
+    }
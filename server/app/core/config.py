@@ -14,9 +14,37 @@ class Settings(BaseSettings):
   JWT_ALGORITHM: str = "HS256"
   ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
   REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+  # Password hashing: bcrypt work factor (hashes made with another one are upgraded on login)
+  # and the dedicated hashing pool; 0 workers = cpu count
+  AUTH_BCRYPT_ROUNDS: int = 12
+  AUTH_HASH_WORKERS: int = 0
+  AUTH_HASH_MAX_PENDING: int = 64  # queued + running hashes before login/register get 503
+  # Authenticated-user resolution: decoded tokens (in-process) and users by id (LRU, plus
+  # Redis when CACHE_USE_REDIS is on). A changed user can be served stale by other processes
+  # for at most USER_CACHE_TTL_SECONDS; the changing process invalidates immediately.
+  AUTH_CACHE_ENABLED: bool = True
+  TOKEN_CACHE_MAX_ENTRIES: int = 10000
+  TOKEN_CACHE_TTL_SECONDS: int = 300
+  USER_CACHE_MAX_ENTRIES: int = 10000
+  USER_CACHE_TTL_SECONDS: int = 60
 
   # Database
   DATABASE_URL: str = "sqlite:///./data/app.db"
+  ASYNC_DATABASE_URL: str | None = None  # default: DATABASE_URL with its async driver (aiosqlite/asyncpg)
+  # Run DAO calls on the async engine; None = yes unless SQLite, where aiosqlite measured
+  # slower than sync sessions in the threadpool (benchmarks/bench_db.py)
+  DB_ASYNC: bool | None = None
+  DB_ECHO: bool = False  # log every SQL statement
+  DB_POOL_SIZE: int = 10
+  DB_MAX_OVERFLOW: int = 0  # extra connections only add lock contention on SQLite
+  DB_POOL_TIMEOUT: float = 30.0
+  DB_POOL_RECYCLE: int = 1800
+  DB_POOL_PRE_PING: bool = True
+  # SQLite file databases: WAL journal plus per-connection pragmas
+  SQLITE_WAL: bool = True
+  SQLITE_SYNCHRONOUS: str = "NORMAL"
+  SQLITE_BUSY_TIMEOUT_MS: int = 5000
+  SQLITE_CACHE_SIZE_KB: int = 16384
 
   # Text/file constraints
   TEXT_LIMIT: int = 10000
@@ -25,14 +53,38 @@ class Settings(BaseSettings):
   MAX_FILE_SIZE_MB: int = 10
   ALLOW_FILE_EXT: str = "txt,pdf,doc,docx"
   TEMP_DIR: str = "./tmp"
+  # Document parsing: extraction stops early past this many chars; 0 = TEXT_LIMIT
+  FILE_PARSE_CHAR_LIMIT: int = 0
+  FILE_PARSE_WORKERS: int = 0  # process pool size for PDF pages; 0 = cpu count, 1 = serial
+  FILE_PDF_PARALLEL_MIN_PAGES: int = 32
+  FILE_PDF_PAGES_PER_TASK: int = 16
+  # Parsed-document cache (SQLite), keyed by upload content hash
+  DOC_CACHE_ENABLED: bool = True
+  DOC_CACHE_PATH: str = "./tmp/doc_cache.sqlite3"
+  DOC_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
 
   # OpenRouter (LLM) settings
   OPENROUTER_API_KEY: str | None = None
   OPENROUTER_MODEL: str = "google/gemini-2.5-flash"
   OPENROUTER_TIMEOUT: int = 15
   OPENROUTER_RETRIES: int = 1
+  OPENROUTER_BASE_URL: str = "https://openrouter.ai/api/v1"
+  OPENROUTER_HTTP2: bool = True
+  OPENROUTER_MAX_CONNECTIONS: int = 100
+  OPENROUTER_MAX_KEEPALIVE: int = 20
+  OPENROUTER_KEEPALIVE_EXPIRY: float = 30.0
+  # Full-jitter exponential backoff for 429/5xx/network errors, honouring Retry-After
+  OPENROUTER_BACKOFF_BASE: float = 0.5
+  OPENROUTER_BACKOFF_MAX: float = 8.0
   SUMMARY_MIN_LENGTH: int = 300
   SUMMARY_DEFAULT_RATIO: float = 0.6
+  # Map-reduce summarization for inputs beyond TEXT_LIMIT (token counts are estimates)
+  SUMMARY_MAP_REDUCE_ENABLED: bool = True
+  SUMMARY_MAX_INPUT_CHARS: int = 300000
+  SUMMARY_CHUNK_TOKENS: int = 3000
+  SUMMARY_CHUNK_SUMMARY_TOKENS: int = 400
+  SUMMARY_CHUNK_CONCURRENCY: int = 4
+  SUMMARY_MAX_LEVELS: int = 3
 
   # DashScope (Qwen VL) settings
   DASHSCOPE_API_KEY: str | None = None
@@ -44,10 +96,68 @@ class Settings(BaseSettings):
   QWEN_VL_TEMPERATURE: float = 0.1
   QWEN_VL_MAX_TOKENS: int = 800
   QWEN_VL_USE_JSON_SCHEMA: bool = True
+  # Shared async connection pool (replaces the per-request client + threadpool worker)
+  QWEN_VL_MAX_CONNECTIONS: int = 200
+  QWEN_VL_MAX_KEEPALIVE: int = 50
+  QWEN_VL_KEEPALIVE_EXPIRY: float = 30.0
+  # Send the request JSON as a stream with the image base64-encoded chunk by chunk, instead of
+  # building a data URL string and letting the SDK serialize it again (several full copies)
+  QWEN_VL_STREAM_BODY: bool = True
+
+  # Upstream guard (Qwen-VL / OpenRouter): adaptive concurrency limit + circuit breaker
+  UPSTREAM_GUARD_ENABLED: bool = True
+  UPSTREAM_LIMIT_MIN: int = 2
+  UPSTREAM_LIMIT_INITIAL: int = 16  # the max is the provider's *_MAX_CONNECTIONS
+  UPSTREAM_LATENCY_TOLERANCE: float = 2.0  # recent median latency above baseline x this shrinks the limit
+  UPSTREAM_QUEUE_TIMEOUT: float = 2.0  # seconds a call may wait for a slot before a 503; 2x baseline latency if longer
+  UPSTREAM_BREAKER_FAILURES: int = 5
+  UPSTREAM_BREAKER_COOLDOWN: float = 10.0
 
   # Meal image constraints
   MAX_IMAGE_SIZE_MB: int = 10
   ALLOW_IMAGE_EXT: str = "jpg,jpeg,png,webp"
+  # Image bytes held in memory across all meal requests at once; beyond it requests wait (in
+  # arrival order) and get 503 + Retry-After after MEAL_INFLIGHT_WAIT_SECONDS
+  MEAL_INFLIGHT_MAX_MB: int = 256
+  MEAL_INFLIGHT_WAIT_SECONDS: float = 10.0
+  # Downscale/re-encode before upload to Qwen-VL (needs Pillow); format is jpeg or webp
+  MEAL_IMAGE_PREPROCESS: bool = True
+  MEAL_IMAGE_MAX_EDGE: int = 1280
+  MEAL_IMAGE_FORMAT: str = "jpeg"
+  MEAL_IMAGE_QUALITY: int = 85
+  # Batch analysis: images per request, in-flight analyses across all batches and per user
+  MEAL_BATCH_MAX_IMAGES: int = 20
+  MEAL_BATCH_CONCURRENCY: int = 32
+  MEAL_BATCH_USER_CONCURRENCY: int = 4
+  # Local nutrition table: per-item nutrients recomputed from the model's food names and weights
+  NUTRITION_DB_ENABLED: bool = True
+  NUTRITION_DB_PATH: str | None = None  # CSV; defaults to the bundled server/app/data/nutrition.csv
+  NUTRITION_MATCH_MIN_SCORE: float = 0.6  # character-bigram score (0..1) a fuzzy name match needs
+  NUTRITION_MATCH_STRONG_SCORE: float = 0.9  # below this a fuzzy match must end the name ("红烧鸡腿" -> 鸡腿)
+  NUTRITION_OUTLIER_RATIO: float = 0.5  # model calories off by more than this fraction are flagged
+  NUTRITION_OUTLIER_MIN_KCAL: float = 50.0
+  NUTRITION_MAX_ITEM_WEIGHT: float = 2000.0
+  # Ask Qwen-VL for food names and weights only; nutrients then come from the table alone
+  MEAL_IDENTIFY_ONLY: bool = False
+  QWEN_VL_IDENTIFY_MAX_TOKENS: int = 300
+  # Meal history: signed-in users' analyses are stored with per-day summary rows for rollups
+  MEAL_HISTORY_ENABLED: bool = True
+  MEAL_HISTORY_TZ: str = "Asia/Shanghai"  # where a user's day starts and ends
+  MEAL_HISTORY_MAX_DAYS: int = 731  # longest range one rollup request may cover
+
+  # Metrics: per-route latency/size histograms and stage timings on /metrics (Prometheus text format)
+  METRICS_ENABLED: bool = True
+  METRICS_PATH: str = "/metrics"
+
+  # Logging: JSON lines on stdout written by a background thread from a bounded queue; records
+  # beyond LOG_QUEUE_SIZE are dropped (counted on /health), 0 = write inline on the caller
+  LOG_LEVEL: str = "INFO"
+  LOG_JSON: bool = True  # false = "[event] k=v" text lines
+  LOG_QUEUE_SIZE: int = 10000
+  LOG_FIELD_MAX_CHARS: int = 1000  # longer field values are truncated
+  LOG_SUCCESS_SAMPLE_RATE: float = 1.0  # fraction of high-volume success events kept; errors always are
+  LOG_ACCESS: bool = True  # one http.access event per request
+  REQUEST_ID_HEADER: str = "X-Request-Id"  # read from the request (or generated) and echoed back
 
   # Redis (optional, not required now)
   REDIS_HOST: str = "localhost"
@@ -55,7 +165,41 @@ class Settings(BaseSettings):
   REDIS_DB: int = 0
   REDIS_PASSWORD: str | None = None
 
-  # OSS (optional, placeholder)
+  # Result caches (in-process LRU; Redis-backed when CACHE_USE_REDIS is on)
+  CACHE_USE_REDIS: bool = False
+  MEAL_CACHE_MAX_ENTRIES: int = 1024
+  MEAL_CACHE_TTL_SECONDS: int = 86400
+  SUMMARY_CACHE_MAX_ENTRIES: int = 2048
+  SUMMARY_CACHE_TTL_SECONDS: int = 86400
+  SUMMARY_CHUNK_CACHE_MAX_ENTRIES: int = 4096
+  SUMMARY_CHUNK_CACHE_TTL_SECONDS: int = 86400
+  # Perceptual near-duplicate reuse (needs Pillow); distance is in dHash bits out of 64
+  MEAL_PHASH_ENABLED: bool = True
+  MEAL_PHASH_MAX_DISTANCE: int = 4
+  MEAL_PHASH_MAX_ENTRIES: int = 4096
+
+  # Background jobs: "sql" persists jobs in DATABASE_URL across restarts, "memory" is process-local
+  JOB_BACKEND: str = "sql"
+  JOB_WORKERS: int = 4
+  JOB_MAX_PENDING: int = 1000  # submissions beyond this many queued jobs get 503
+  JOB_MAX_ATTEMPTS: int = 3  # jobs interrupted by a restart are retried up to this many times
+  JOB_RESULT_TTL_SECONDS: int = 86400
+  JOB_CLEANUP_INTERVAL_SECONDS: int = 600
+  JOB_SPOOL_DIR: str = "./tmp/jobs"  # uploads waiting for a worker
+
+  # Image storage: meal photos of at least MEAL_IMAGE_URL_MIN_KB (as sent, after preprocessing)
+  # are stored under their content hash and passed to Qwen-VL as a short-lived signed URL
+  # instead of inline base64. "oss" uses the OSS_* settings (needs oss2); "local" writes to
+  # STORAGE_LOCAL_DIR and serves signed URLs from /api/storage/objects under
+  # STORAGE_PUBLIC_BASE_URL, which the upstream must be able to reach; "none" always inlines
+  STORAGE_BACKEND: str = "none"
+  STORAGE_KEY_PREFIX: str = "meal-images/"
+  STORAGE_URL_EXPIRE_SECONDS: int = 900
+  STORAGE_LOCAL_DIR: str = "./tmp/objects"
+  STORAGE_PUBLIC_BASE_URL: str | None = None
+  MEAL_IMAGE_URL_MIN_KB: int = 256
+
+  # OSS (STORAGE_BACKEND=oss)
   OSS_ACCESS_KEY_ID: str | None = None
   OSS_ACCESS_KEY_SECRET: str | None = None
   OSS_BUCKET_NAME: str | None = None
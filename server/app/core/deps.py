@@ -1,15 +1,16 @@
 from collections.abc import Generator
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
 from sqlmodel import Session
 
 from server.app.core.config import settings
 from server.app.core.security import create_access_token, create_refresh_token  # noqa: F401
 from server.app.dbs.session import SessionLocal
-from server.app.dbs.daos import UserDAO  # type: ignore[attr-defined]
+from server.app.schemas.auth import UserPublic
+from server.app.services.user_service import resolve_user
 
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/login")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/token", auto_error=False)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -17,29 +18,26 @@ def get_db() -> Generator[Session, None, None]:
     yield session
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserPublic:
   """
-  Placeholder current user dependency. User model/DAO not implemented yet.
-  Keep here for future expansion; will raise if called now.
+  The user behind the bearer token. Decoded tokens and users are cached
+  (see user_service), so a warm request does no signature check and no query.
   """
   try:
-    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-    user_id: str | None = payload.get("sub")
-    if user_id is None:
-      raise ValueError("Invalid token subject")
-  except (JWTError, ValueError):
-    from fastapi import HTTPException, status
-
-    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
-  # Placeholder: replace with actual user lookup when model exists.
-  if not hasattr(UserDAO, "get_by_id"):
-    from fastapi import HTTPException, status
-
-    raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="User model not implemented")
-  user = UserDAO.get_by_id(int(user_id), db)  # type: ignore[attr-defined]
-  if not user:
-    from fastapi import HTTPException, status
-
-    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-  return user
+    return await resolve_user(token)
+  except ValueError as e:
+    raise HTTPException(
+      status_code=status.HTTP_401_UNAUTHORIZED,
+      detail=str(e),
+      headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_optional_user(token: str | None = Depends(optional_oauth2_scheme)) -> UserPublic | None:
+  """
+  Like get_current_user for routes that also serve anonymous callers: None without a bearer
+  token, 401 for an invalid one.
+  """
+  if token is None:
+    return None
+  return await get_current_user(token)
@@ -0,0 +1,127 @@
+"""
+Shared upstream HTTP clients. Created once in the app lifespan and reused by every request,
+so connections (and their TLS sessions) stay warm in a bounded keep-alive pool.
+"""
+import importlib.util
+from typing import Optional
+
+try:
+  import httpx  # type: ignore
+except ImportError:  # pragma: no cover
+  httpx = None  # type: ignore
+
+try:
+  from openai import AsyncOpenAI, DefaultAsyncHttpxClient  # type: ignore
+except ImportError:  # pragma: no cover
+  AsyncOpenAI = None  # type: ignore
+  DefaultAsyncHttpxClient = None  # type: ignore
+
+from server.app.core.config import settings
+
+qwen_client: Optional["AsyncOpenAI"] = None
+# The connection pool to DashScope, shared by qwen_client and the streamed-body requests
+# meal_service sends without the SDK.
+qwen_http_client: Optional["httpx.AsyncClient"] = None
+openrouter_client: Optional["httpx.AsyncClient"] = None
+
+
+def _build_qwen_http_client() -> "httpx.AsyncClient":
+  if httpx is None:
+    raise ValueError("Missing dependency: pip install httpx")
+  if not settings.DASHSCOPE_API_KEY:
+    raise ValueError("DASHSCOPE_API_KEY not configured")
+  client_class = DefaultAsyncHttpxClient or httpx.AsyncClient
+  return client_class(
+    limits=httpx.Limits(
+      max_connections=settings.QWEN_VL_MAX_CONNECTIONS,
+      max_keepalive_connections=settings.QWEN_VL_MAX_KEEPALIVE,
+      keepalive_expiry=settings.QWEN_VL_KEEPALIVE_EXPIRY,
+    ),
+    timeout=settings.QWEN_VL_TIMEOUT,
+  )
+
+
+def _build_qwen_client() -> "AsyncOpenAI":
+  if AsyncOpenAI is None:
+    raise ValueError("Missing dependency: pip install openai")
+  if not settings.DASHSCOPE_API_KEY:
+    raise ValueError("DASHSCOPE_API_KEY not configured")
+  return AsyncOpenAI(
+    api_key=settings.DASHSCOPE_API_KEY,
+    base_url=settings.DASHSCOPE_BASE_URL,
+    timeout=settings.QWEN_VL_TIMEOUT,
+    max_retries=0,
+    http_client=get_qwen_http_client(),
+  )
+
+
+def _build_openrouter_client() -> "httpx.AsyncClient":
+  if httpx is None:
+    raise ValueError("Missing dependency: pip install httpx")
+  # HTTP/2 multiplexes concurrent summaries over a few connections; needs the optional h2 package.
+  http2 = settings.OPENROUTER_HTTP2 and importlib.util.find_spec("h2") is not None
+  return httpx.AsyncClient(
+    base_url=settings.OPENROUTER_BASE_URL,
+    http2=http2,
+    limits=httpx.Limits(
+      max_connections=settings.OPENROUTER_MAX_CONNECTIONS,
+      max_keepalive_connections=settings.OPENROUTER_MAX_KEEPALIVE,
+      keepalive_expiry=settings.OPENROUTER_KEEPALIVE_EXPIRY,
+    ),
+    timeout=settings.OPENROUTER_TIMEOUT,
+  )
+
+
+async def init_http_clients() -> None:
+  global qwen_client, qwen_http_client, openrouter_client
+  if qwen_http_client is None and httpx is not None and settings.DASHSCOPE_API_KEY:
+    qwen_http_client = _build_qwen_http_client()
+  if qwen_client is None and AsyncOpenAI is not None and settings.DASHSCOPE_API_KEY:
+    qwen_client = _build_qwen_client()
+  if openrouter_client is None and httpx is not None:
+    openrouter_client = _build_openrouter_client()
+
+
+def get_qwen_client() -> "AsyncOpenAI":
+  """
+  Return the shared Qwen-VL client, creating it lazily outside the app lifespan (scripts, tests).
+  Raises ValueError on missing config.
+  """
+  global qwen_client
+  if qwen_client is None:
+    qwen_client = _build_qwen_client()
+  return qwen_client
+
+
+def get_qwen_http_client() -> "httpx.AsyncClient":
+  """
+  Return the shared DashScope connection pool, creating it lazily outside the app lifespan.
+  Raises ValueError on missing config.
+  """
+  global qwen_http_client
+  if qwen_http_client is None:
+    qwen_http_client = _build_qwen_http_client()
+  return qwen_http_client
+
+
+def get_openrouter_client() -> "httpx.AsyncClient":
+  """
+  Return the shared OpenRouter client, creating it lazily outside the app lifespan.
+  """
+  global openrouter_client
+  if openrouter_client is None:
+    openrouter_client = _build_openrouter_client()
+  return openrouter_client
+
+
+async def close_http_clients() -> None:
+  global qwen_client, qwen_http_client, openrouter_client
+  if qwen_client is not None:
+    await qwen_client.close()
+    qwen_client = None
+  if qwen_http_client is not None:
+    await qwen_http_client.aclose()
+    qwen_http_client = None
+  if openrouter_client is not None:
+    await openrouter_client.aclose()
+    openrouter_client = None
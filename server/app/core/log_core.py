@@ -0,0 +1,225 @@
+"""
+Structured logging that never blocks the event loop.
+
+log_event("meal_analyze.error", level=logging.WARNING, filename=..., err=e) builds a record
+and puts it on a bounded in-memory queue; a background QueueListener thread formats it (JSON
+lines, or the old "[event] k=v" text with LOG_JSON=false) and writes it to stdout. When the
+collector behind stdout is slow the queue fills and new records are dropped and counted,
+instead of stalling requests. LOG_QUEUE_SIZE=0 writes inline (the old print() behaviour).
+
+Every record carries the request id of the request it was logged under (RequestIdMiddleware),
+high-volume success events can be sampled (LOG_SUCCESS_SAMPLE_RATE), and oversized field
+values are truncated to LOG_FIELD_MAX_CHARS.
+"""
+import atexit
+import datetime
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from collections.abc import Iterable
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from server.app.core.config import settings
+
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+_SCALARS = (bool, int, float)
+
+
+def _truncate(value, limit: int):
+  """
+  A JSON-safe, size-bounded version of a field value.
+  """
+  if value is None or isinstance(value, _SCALARS):
+    return value
+  if isinstance(value, str):
+    text = value
+  elif isinstance(value, (dict, list, tuple)):
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) <= limit:
+      return value
+  else:
+    text = str(value)
+  if len(text) > limit:
+    return f"{text[:limit]}...[+{len(text) - limit} chars]"
+  return text
+
+
+class JsonFormatter(logging.Formatter):
+  def format(self, record: logging.LogRecord) -> str:
+    limit = settings.LOG_FIELD_MAX_CHARS
+    entry = {
+      "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+      "level": record.levelname.lower(),
+      "event": record.msg,
+    }
+    request_id = getattr(record, "request_id", None)
+    if request_id:
+      entry["request_id"] = request_id
+    for key, value in getattr(record, "fields", {}).items():
+      entry[key] = _truncate(value, limit)
+    return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+  def format(self, record: logging.LogRecord) -> str:
+    limit = settings.LOG_FIELD_MAX_CHARS
+    event = "][".join(str(record.msg).split("."))
+    parts = [f"[{event}]"]
+    parts.extend(f"{key}={_truncate(value, limit)}" for key, value in getattr(record, "fields", {}).items())
+    request_id = getattr(record, "request_id", None)
+    if request_id:
+      parts.append(f"request_id={request_id}")
+    return " ".join(parts)
+
+
+class _DroppingQueueHandler(QueueHandler):
+  """
+  Hands records to the listener thread as-is (formatting happens there, not on the caller)
+  and drops them when the queue is full rather than blocking.
+  """
+
+  def __init__(self, log_queue: queue.Queue):
+    super().__init__(log_queue)
+    self.dropped = 0
+
+  def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+    return record
+
+  def enqueue(self, record: logging.LogRecord) -> None:
+    try:
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+
+
+class LogPipeline:
+  """
+  The "server" logger with its handler chain; stats() is exposed on /health and /metrics.
+  """
+
+  def __init__(self):
+    self.logger = logging.getLogger("server")
+    self.logger.setLevel(settings.LOG_LEVEL.upper())
+    self.logger.propagate = False
+    self.emitted = 0
+    self.sampled_out = 0
+    self._queue: queue.Queue | None = None
+    self._queue_handler: _DroppingQueueHandler | None = None
+    self._listener: QueueListener | None = None
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if settings.LOG_JSON else TextFormatter())
+    if settings.LOG_QUEUE_SIZE > 0:
+      self._queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+      self._queue_handler = _DroppingQueueHandler(self._queue)
+      self._listener = QueueListener(self._queue, output)
+      self._listener.start()
+      self.logger.addHandler(self._queue_handler)
+      atexit.register(self.stop)
+    else:
+      self.logger.addHandler(output)
+
+  def stop(self) -> None:
+    """
+    Flush what is queued and stop the listener thread (at interpreter exit).
+    """
+    if self._listener is not None:
+      self._listener.stop()
+      self._listener = None
+
+  def stats(self) -> dict:
+    return {
+      "queued": self._queue.qsize() if self._queue is not None else 0,
+      "emitted": self.emitted,
+      "dropped": self._queue_handler.dropped if self._queue_handler is not None else 0,
+      "sampled_out": self.sampled_out,
+    }
+
+
+log_pipeline = LogPipeline()
+
+
+def log_event(event: str, level: int = logging.INFO, sample: bool = False, **fields) -> None:
+  """
+  Log one structured event. sample=True marks a high-volume success event: it is kept with
+  probability LOG_SUCCESS_SAMPLE_RATE (kept records carry sample_rate). Warnings and errors
+  are never sampled. Cheap when the level is disabled; never blocks on I/O.
+  """
+  logger = log_pipeline.logger
+  if not logger.isEnabledFor(level):
+    return
+  if sample and level < logging.WARNING:
+    rate = settings.LOG_SUCCESS_SAMPLE_RATE
+    if rate < 1.0:
+      if random.random() >= rate:
+        log_pipeline.sampled_out += 1
+        return
+      fields["sample_rate"] = rate
+  # makeRecord + handle skips Logger._log's caller-frame lookup, the expensive part.
+  record = logger.makeRecord(
+    logger.name, level, "", 0, event, None, None,
+    extra={"fields": fields, "request_id": request_id_var.get()},
+  )
+  log_pipeline.emitted += 1
+  logger.handle(record)
+
+
+class RequestIdMiddleware:
+  """
+  Pure ASGI middleware: takes the request id from REQUEST_ID_HEADER (or makes one), binds it
+  for every log record written while handling the request, echoes it on the response, and
+  writes one http.access event per request (sampled when successful) unless the path is in
+  exclude_paths (health checks and scrapes).
+  """
+
+  def __init__(self, app: ASGIApp, exclude_paths: Iterable[str] = ()):
+    self.app = app
+    self.exclude_paths = frozenset(exclude_paths)
+    self.header = settings.REQUEST_ID_HEADER.lower().encode("latin-1")
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+
+    request_id = None
+    for name, value in scope["headers"]:
+      if name == self.header:
+        # Client-supplied ids are bounded so they cannot bloat every log line.
+        request_id = value.decode("latin-1")[:64]
+        break
+    request_id = request_id or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    started = time.perf_counter()
+    status = 500
+
+    async def send_wrapper(message: Message) -> None:
+      nonlocal status
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        message.setdefault("headers", [])
+        message["headers"] = [*message["headers"], (self.header, request_id.encode("latin-1"))]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    finally:
+      if settings.LOG_ACCESS and scope["path"] not in self.exclude_paths:
+        log_event(
+          "http.access",
+          level=logging.WARNING if status >= 500 else logging.INFO,
+          sample=status < 400,
+          method=scope["method"],
+          path=scope["path"],
+          status=status,
+          ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+      request_id_var.reset(token)
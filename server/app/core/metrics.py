@@ -0,0 +1,300 @@
+"""
+In-process metrics in the Prometheus text exposition format, served on /metrics.
+
+- http_request_duration_seconds / http_request_size_bytes / http_response_size_bytes per
+  route template (not raw path) from MetricsMiddleware
+- stage_duration_seconds{stage}: timed pipeline steps (upload read, sanitize, extraction,
+  image preprocess, base64 encode, output validation), via `with stage_timer("..."):`
+- upstream_request_duration_seconds, upstream_tokens_total, upstream_errors_total
+- payload_bytes{kind}: upload and upstream payload sizes
+- app_errors_total{where,error}: exception classes raised out of requests and services
+- app_stat{component,stat}: numeric values of every register_stats provider (the /health data)
+
+Recording is a bisect plus a few additions under a per-series lock, so it is safe from worker
+threads and costs around a microsecond; rendering work happens only at scrape time.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from server.app.cache.cache_service import get_cache_stats
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = tuple(float(256 * 4**i) for i in range(10))  # 256 B .. 64 MiB
+
+
+def _escape(value: str) -> str:
+  return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+  parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    parts.append(extra)
+  return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+  return str(int(value)) if value == int(value) else repr(value)
+
+
+class _CounterChild:
+  __slots__ = ("value", "_lock")
+
+  def __init__(self):
+    self.value = 0.0
+    self._lock = threading.Lock()
+
+  def inc(self, amount: float = 1.0) -> None:
+    with self._lock:
+      self.value += amount
+
+
+class _HistogramChild:
+  __slots__ = ("buckets", "counts", "sum", "_lock")
+
+  def __init__(self, buckets: tuple[float, ...]):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+    self.sum = 0.0
+    self._lock = threading.Lock()
+
+  def observe(self, value: float) -> None:
+    index = bisect_left(self.buckets, value)
+    with self._lock:
+      self.counts[index] += 1
+      self.sum += value
+
+
+class _Metric:
+  kind = ""
+
+  def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self._children: dict[tuple[str, ...], object] = {}
+    self._lock = threading.Lock()
+
+  def _new_child(self):
+    raise NotImplementedError
+
+  def labels(self, *values: str):
+    """
+    The series for these label values; hold on to it on hot paths to skip the lookup.
+    """
+    child = self._children.get(values)
+    if child is None:
+      with self._lock:
+        child = self._children.setdefault(values, self._new_child())
+    return child
+
+  def render(self) -> list[str]:
+    lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+    for values, child in sorted(self._children.items()):
+      lines.extend(self._render_child(values, child))
+    return lines
+
+  def _render_child(self, values: tuple[str, ...], child) -> list[str]:
+    raise NotImplementedError
+
+
+class Counter(_Metric):
+  kind = "counter"
+
+  def _new_child(self) -> _CounterChild:
+    return _CounterChild()
+
+  def inc(self, *values: str, amount: float = 1.0) -> None:
+    self.labels(*values).inc(amount)
+
+  def _render_child(self, values: tuple[str, ...], child: _CounterChild) -> list[str]:
+    return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+
+class Histogram(_Metric):
+  kind = "histogram"
+
+  def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+    super().__init__(name, documentation, labelnames)
+    self.buckets = tuple(sorted(buckets))
+
+  def _new_child(self) -> _HistogramChild:
+    return _HistogramChild(self.buckets)
+
+  def observe(self, value: float, *values: str) -> None:
+    self.labels(*values).observe(value)
+
+  def _render_child(self, values: tuple[str, ...], child: _HistogramChild) -> list[str]:
+    with child._lock:
+      counts, total = list(child.counts), child.sum
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*self.buckets, float("inf")), counts):
+      cumulative += count
+      le = "+Inf" if bound == float("inf") else _format_value(bound)
+      bucket_labels = _format_labels(self.labelnames, values, f'le="{le}"')
+      lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+    labels = _format_labels(self.labelnames, values)
+    lines.append(f"{self.name}_sum{labels} {_format_value(round(total, 6))}")
+    lines.append(f"{self.name}_count{labels} {cumulative}")
+    return lines
+
+
+class MetricsRegistry:
+  def __init__(self):
+    self._metrics: dict[str, _Metric] = {}
+
+  def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    return self._register(Counter(name, documentation, labelnames))
+
+  def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+    return self._register(Histogram(name, documentation, labelnames, buckets))
+
+  def _register(self, metric: _Metric):
+    if metric.name in self._metrics:
+      raise ValueError(f"metric {metric.name} already registered")
+    self._metrics[metric.name] = metric
+    return metric
+
+  def render(self) -> str:
+    lines: list[str] = []
+    for metric in self._metrics.values():
+      lines.extend(metric.render())
+    lines.extend(_render_component_stats())
+    return "\n".join(lines) + "\n"
+
+
+def _render_component_stats() -> list[str]:
+  lines = ["# HELP app_stat Numeric values from the /health component stats.", "# TYPE app_stat gauge"]
+  for component, stats in sorted(get_cache_stats().items()):
+    for key, value in stats.items():
+      if isinstance(value, bool):
+        value = int(value)
+      if isinstance(value, (int, float)):
+        lines.append(f'app_stat{{component="{_escape(component)}",stat="{_escape(key)}"}} {_format_value(value)}')
+  return lines
+
+
+registry = MetricsRegistry()
+
+http_request_duration = registry.histogram(
+  "http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status")
+)
+http_request_size = registry.histogram(
+  "http_request_size_bytes", "Request body size (Content-Length).", ("method", "route"), SIZE_BUCKETS
+)
+http_response_size = registry.histogram(
+  "http_response_size_bytes", "Response body size.", ("method", "route"), SIZE_BUCKETS
+)
+stage_duration = registry.histogram("stage_duration_seconds", "Time spent per pipeline stage.", ("stage",))
+upstream_duration = registry.histogram(
+  "upstream_request_duration_seconds", "Upstream model call latency.", ("upstream", "outcome")
+)
+upstream_tokens = registry.counter("upstream_tokens_total", "Tokens reported by upstream models.", ("upstream", "kind"))
+upstream_errors = registry.counter("upstream_errors_total", "Failed upstream calls by exception class.", ("upstream", "error"))
+payload_bytes = registry.histogram("payload_bytes", "Payload sizes by kind.", ("kind",), SIZE_BUCKETS)
+app_errors = registry.counter("app_errors_total", "Errors by where they surfaced and exception class.", ("where", "error"))
+
+
+class stage_timer:
+  """
+  `with stage_timer("base64_encode"):` records the block's wall time in stage_duration_seconds,
+  including when it raises.
+  """
+  __slots__ = ("_child", "_started")
+
+  def __init__(self, stage: str):
+    self._child = stage_duration.labels(stage)
+
+  def __enter__(self) -> "stage_timer":
+    self._started = time.perf_counter()
+    return self
+
+  def __exit__(self, *exc) -> None:
+    self._child.observe(time.perf_counter() - self._started)
+
+
+def observe_upstream(upstream: str, started: float, error: BaseException | str | None = None, usage: dict | None = None) -> None:
+  """
+  Record one upstream call that began at perf_counter() `started`: latency by outcome, the
+  error (exception class, or a label such as "http_429") if it failed, and prompt/completion
+  token counts when the response reported usage.
+  """
+  upstream_duration.labels(upstream, "error" if error else "ok").observe(time.perf_counter() - started)
+  if error is not None:
+    upstream_errors.inc(upstream, error if isinstance(error, str) else type(error).__name__)
+  if usage:
+    for kind in ("prompt_tokens", "completion_tokens"):
+      count = usage.get(kind)
+      if count:
+        upstream_tokens.inc(upstream, kind.removesuffix("_tokens"), amount=count)
+
+
+def record_error(where: str, error: BaseException) -> None:
+  app_errors.inc(where, type(error).__name__)
+
+
+class MetricsMiddleware:
+  """
+  Pure ASGI middleware (no BaseHTTPMiddleware task/queue overhead) recording per-route
+  latency, request/response sizes and unhandled exception classes. The route label is the
+  matched path template, so /api/jobs/{job_id} is one series; unmatched paths share one.
+  """
+
+  def __init__(self, app: ASGIApp, exclude_paths: Iterable[str] = ()):
+    self.app = app
+    self.exclude_paths = frozenset(exclude_paths)
+    # (method, template, status) -> its three series, so a request costs one dict lookup.
+    self._series: dict[tuple[str, str, int], tuple[_HistogramChild, _HistogramChild, _HistogramChild]] = {}
+
+  def _series_for(self, method: str, template: str, status: int):
+    key = (method, template, status)
+    series = self._series.get(key)
+    if series is None:
+      series = self._series[key] = (
+        http_request_duration.labels(method, template, str(status)),
+        http_request_size.labels(method, template),
+        http_response_size.labels(method, template),
+      )
+    return series
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] != "http" or scope["path"] in self.exclude_paths:
+      await self.app(scope, receive, send)
+      return
+
+    started = time.perf_counter()
+    status = 500
+    response_bytes = 0
+
+    async def send_wrapper(message: Message) -> None:
+      nonlocal status, response_bytes
+      if message["type"] == "http.response.body":
+        response_bytes += len(message.get("body", b""))
+      elif message["type"] == "http.response.start":
+        status = message["status"]
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_wrapper)
+    except Exception as e:
+      record_error("http", e)
+      raise
+    finally:
+      elapsed = time.perf_counter() - started
+      route = scope.get("route")
+      template = getattr(route, "path_format", None) or "<unmatched>"
+      duration, request_size, response_size = self._series_for(scope["method"], template, status)
+      duration.observe(elapsed)
+      response_size.observe(response_bytes)
+      for name, value in scope["headers"]:
+        if name == b"content-length":
+          try:
+            request_size.observe(int(value))
+          except ValueError:
+            pass  # malformed header: skip the sample rather than fail the request
+          break
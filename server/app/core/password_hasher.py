@@ -0,0 +1,107 @@
+"""
+Password hashing off the event loop.
+
+bcrypt costs ~100-300 ms of CPU per hash or check at production work factors. Run inline,
+every login would stall all other requests for that long. Calls go to a dedicated thread
+pool instead: bcrypt releases the GIL while hashing, so the pool spreads logins over
+AUTH_HASH_WORKERS cores. It is kept separate from the default threadpool so a burst of
+logins cannot starve DB calls.
+
+The backlog is bounded: past AUTH_HASH_MAX_PENDING queued or running calls, new ones fail
+fast with HashPoolBusyError (a 503) rather than queueing for seconds.
+"""
+import asyncio
+import math
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from server.app.cache.cache_service import register_stats
+from server.app.core import security
+from server.app.core.config import settings
+
+T = TypeVar("T")
+
+
+class HashPoolBusyError(ValueError):
+  """
+  Too many password hashes are queued; retry after `retry_after` seconds.
+  """
+
+  def __init__(self, message: str, retry_after: float):
+    super().__init__(message)
+    self.retry_after = retry_after
+
+  @property
+  def retry_after_header(self) -> str:
+    return str(max(1, math.ceil(self.retry_after)))
+
+
+class PasswordHasher:
+  """
+  Bounded async front for security.get_password_hash / verify_password. Event-loop only.
+  """
+
+  def __init__(self, workers: int, max_pending: int):
+    self.workers = max(1, workers)
+    self.max_pending = max(self.workers, max_pending)
+    self._pool: ThreadPoolExecutor | None = None
+    self.pending = 0
+    self.hashes = 0
+    self.verifies = 0
+    self.rejected = 0
+    self.avg_ms = 0.0
+
+  def _get_pool(self) -> ThreadPoolExecutor:
+    if self._pool is None:
+      self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pwhash")
+    return self._pool
+
+  async def _run(self, fn: Callable[..., T], *args) -> T:
+    if self.pending >= self.max_pending:
+      self.rejected += 1
+      # Roughly how long the current backlog takes to drain.
+      retry_after = self.pending * (self.avg_ms or 100.0) / 1000 / self.workers
+      raise HashPoolBusyError("authentication is busy, retry later", retry_after)
+    self.pending += 1
+    started = time.perf_counter()
+    try:
+      return await asyncio.get_running_loop().run_in_executor(self._get_pool(), fn, *args)
+    finally:
+      self.pending -= 1
+      elapsed_ms = (time.perf_counter() - started) * 1000
+      self.avg_ms = elapsed_ms if not self.avg_ms else 0.9 * self.avg_ms + 0.1 * elapsed_ms
+
+  async def hash(self, password: str) -> str:
+    self.hashes += 1
+    return await self._run(security.get_password_hash, password)
+
+  async def verify(self, password: str, hashed_password: str) -> bool:
+    self.verifies += 1
+    return await self._run(security.verify_password, password, hashed_password)
+
+  def shutdown(self) -> None:
+    if self._pool is not None:
+      self._pool.shutdown(wait=False, cancel_futures=True)
+      self._pool = None
+
+  def stats(self) -> dict:
+    return {
+      "workers": self.workers,
+      "rounds": settings.AUTH_BCRYPT_ROUNDS,
+      "pending": self.pending,
+      "max_pending": self.max_pending,
+      "hashes": self.hashes,
+      "verifies": self.verifies,
+      "rejected": self.rejected,
+      "avg_ms": round(self.avg_ms, 1),
+    }
+
+
+password_hasher = PasswordHasher(
+  workers=settings.AUTH_HASH_WORKERS or os.cpu_count() or 1,
+  max_pending=settings.AUTH_HASH_MAX_PENDING,
+)
+register_stats("password_hashing", password_hasher)
@@ -1,27 +1,73 @@
-from datetime import datetime, timedelta
-from jose import jwt
-from passlib.context import CryptContext
+from datetime import datetime, timedelta, timezone
+
+import bcrypt
+from jose import JWTError, jwt
 
 from server.app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt only reads the first 72 bytes of a secret; bcrypt>=5 raises instead of truncating
+# (and passlib 1.7's backend check trips over that), so truncate explicitly, as bcrypt always has.
+BCRYPT_MAX_BYTES = 72
+BCRYPT_PREFIX = "$2b$"
+
+
+def _secret(password: str) -> bytes:
+  return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-  return pwd_context.verify(plain_password, hashed_password)
+  """
+  CPU-bound (~2^rounds work); call through password_hasher from async code.
+  """
+  try:
+    return bcrypt.checkpw(_secret(plain_password), hashed_password.encode("ascii"))
+  except ValueError:  # malformed hash
+    return False
+
 
+def get_password_hash(password: str, rounds: int | None = None) -> str:
+  """
+  CPU-bound (~2^rounds work); call through password_hasher from async code.
+  """
+  salt = bcrypt.gensalt(rounds or settings.AUTH_BCRYPT_ROUNDS)
+  return bcrypt.hashpw(_secret(password), salt).decode("ascii")
 
-def get_password_hash(password: str) -> str:
-  return pwd_context.hash(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+  """
+  Whether a stored hash was made with another variant or work factor than the current
+  AUTH_BCRYPT_ROUNDS; such hashes are replaced on the next successful login.
+  """
+  if not hashed_password.startswith(BCRYPT_PREFIX):
+    return True
+  try:
+    rounds = int(hashed_password[len(BCRYPT_PREFIX):].split("$", 1)[0])
+  except ValueError:
+    return True
+  return rounds != settings.AUTH_BCRYPT_ROUNDS
 
 
 def create_access_token(subject: str) -> str:
-  expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+  expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
   payload = {"exp": expire, "sub": subject, "type": "access"}
   return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
 def create_refresh_token(subject: str) -> str:
-  expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+  expire = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
   payload = {"exp": expire, "sub": subject, "type": "refresh"}
   return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+def decode_token(token: str, token_type: str = "access") -> dict:
+  """
+  Verify a token's signature and expiry and return its claims.
+  Raises ValueError when it is invalid, expired, of another type or has no subject.
+  """
+  try:
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+  except JWTError as e:
+    raise ValueError("Invalid token") from e
+  if payload.get("type") != token_type or not payload.get("sub"):
+    raise ValueError("Invalid token")
+  return payload
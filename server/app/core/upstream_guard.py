@@ -0,0 +1,326 @@
+"""
+Protection around upstream model providers: adaptive concurrency limit, circuit breaker and
+load shedding.
+
+Each guarded attempt takes a slot. The limit follows AIMD on observed latency: it grows by
+1/limit per healthy response and shrinks by a factor when a call fails, or when the median of
+the last few latencies climbs past UPSTREAM_LATENCY_TOLERANCE x the median of the last couple
+of hundred (the baseline). Comparing medians, not single samples, keeps an upstream whose
+latency is merely variable at its full limit; only a sustained shift shrinks it, until the
+baseline has moved with it. Calls beyond the limit queue (at most the connection pool size of
+them) for UPSTREAM_QUEUE_TIMEOUT or two baseline latencies, whichever is longer, and are then
+shed. After UPSTREAM_BREAKER_FAILURES consecutive failures the breaker opens and
+calls fail fast for UPSTREAM_BREAKER_COOLDOWN seconds; one probe call then decides whether it
+closes again.
+Rejections raise UpstreamUnavailableError, which routes map to 503 + Retry-After.
+"""
+import asyncio
+import logging
+import math
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+
+from server.app.cache.cache_service import register_stats
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Latency samples: the baseline is the median of the long window, the current latency the
+# median of the short one. No latency-based decrease before _MIN_SAMPLES samples.
+_LONG_WINDOW = 200
+_SHORT_WINDOW = 10
+_MIN_SAMPLES = 20
+
+
+class UpstreamUnavailableError(ValueError):
+  """
+  The upstream is shedding load or its breaker is open; retry after `retry_after` seconds.
+  """
+
+  def __init__(self, upstream: str, reason: str, retry_after: float):
+    super().__init__(f"{upstream} unavailable ({reason}), retry after {math.ceil(retry_after)}s")
+    self.upstream = upstream
+    self.reason = reason
+    self.retry_after = retry_after
+
+  @property
+  def retry_after_header(self) -> str:
+    return str(max(1, math.ceil(self.retry_after)))
+
+
+def is_upstream_failure(exc: BaseException) -> bool:
+  """
+  Whether an exception says the upstream is unhealthy: network errors, timeouts, 5xx, 408
+  and 429. Other 4xx responses prove the upstream is alive and do not count.
+  """
+  status = getattr(exc, "status_code", None)
+  if status is None:
+    status = getattr(getattr(exc, "response", None), "status_code", None)
+  return status is None or status >= 500 or status in (408, 429)
+
+
+class GuardSlot:
+  """
+  Handle for one guarded call. Call fail() for failures that are not raised (e.g. an error
+  status the caller handles itself), skip_latency() for answers whose latency says nothing
+  about load (e.g. a 4xx) and mark_latency() to sample latency early (streams).
+  """
+
+  __slots__ = ("started", "latency", "failed", "sample")
+
+  def __init__(self):
+    self.started = time.monotonic()
+    self.latency: float | None = None
+    self.failed = False
+    self.sample = True
+
+  def fail(self) -> None:
+    self.failed = True
+
+  def skip_latency(self) -> None:
+    self.sample = False
+
+  def mark_latency(self) -> None:
+    if self.latency is None:
+      self.latency = time.monotonic() - self.started
+
+
+class UpstreamGuard:
+  """
+  Event-loop only. Use `async with guard.acquire() as slot:` around a single upstream attempt.
+  """
+
+  def __init__(
+    self,
+    name: str,
+    min_limit: int,
+    initial_limit: int,
+    max_limit: int,
+    latency_tolerance: float,
+    queue_timeout: float,
+    breaker_failures: int,
+    breaker_cooldown: float,
+    is_failure: Callable[[BaseException], bool] = is_upstream_failure,
+    enabled: bool = True,
+  ):
+    self.name = name
+    self.enabled = enabled
+    self.min_limit = max(1, min_limit)
+    self.max_limit = max(self.min_limit, max_limit)
+    self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+    self.latency_tolerance = max(1.0, latency_tolerance)
+    self.queue_timeout = max(0.0, queue_timeout)
+    self.breaker_failures = max(1, breaker_failures)
+    self.breaker_cooldown = max(0.1, breaker_cooldown)
+    self.is_failure = is_failure
+
+    self.state = CLOSED
+    self.in_flight = 0
+    self.consecutive_failures = 0
+    self.successes = 0
+    self.failures = 0
+    self.shed = 0
+    self.rejected_open = 0
+    self.opened = 0
+    self.baseline_latency: float | None = None
+    self.last_latency: float | None = None
+    self._latencies: deque[float] = deque(maxlen=_LONG_WINDOW)
+    self._open_until = 0.0
+    self._probe_in_flight = False
+    self._last_decrease = 0.0
+    self._waiters: deque[asyncio.Future] = deque()
+
+  @asynccontextmanager
+  async def acquire(self) -> AsyncIterator[GuardSlot]:
+    """
+    Take a slot (or raise UpstreamUnavailableError) and record the attempt's outcome:
+    raised exceptions count via is_failure, slot.fail() marks a failure explicitly.
+    Cancellation releases the slot without recording anything.
+    """
+    if not self.enabled:
+      yield GuardSlot()
+      return
+
+    probe = await self._take_slot()
+    slot = GuardSlot()
+    try:
+      yield slot
+    except Exception as e:
+      if self.is_failure(e):
+        self._on_failure(probe)
+      else:
+        self._on_success(slot, probe, sample=False)
+      raise
+    except BaseException:
+      if probe:
+        self._probe_in_flight = False
+      raise
+    else:
+      if slot.failed:
+        self._on_failure(probe)
+      else:
+        self._on_success(slot, probe, sample=slot.sample)
+    finally:
+      self._release()
+
+  async def _take_slot(self) -> bool:
+    """
+    Returns True when the slot is the half-open probe.
+    """
+    now = time.monotonic()
+    if self.state == OPEN:
+      if now < self._open_until:
+        self.rejected_open += 1
+        raise UpstreamUnavailableError(self.name, "circuit open", self._open_until - now)
+      self.state = HALF_OPEN
+      log_event("upstream_guard.state", upstream=self.name, state="half_open")
+    if self.state == HALF_OPEN:
+      if self._probe_in_flight:
+        self.rejected_open += 1
+        raise UpstreamUnavailableError(self.name, "circuit half-open", 1.0)
+      self._probe_in_flight = True
+      self.in_flight += 1
+      return True
+
+    if self.in_flight < int(self.limit) and not self._waiters:
+      self.in_flight += 1
+      return False
+    if self.queue_timeout <= 0 or len(self._waiters) >= self.max_limit:
+      self.shed += 1
+      raise UpstreamUnavailableError(self.name, "overloaded", 1.0)
+
+    timeout = self.queue_wait()
+    waiter = asyncio.get_running_loop().create_future()
+    self._waiters.append(waiter)
+    try:
+      # _release hands the slot over (in_flight already counted) by resolving the future.
+      await asyncio.wait_for(waiter, timeout)
+    except asyncio.TimeoutError:
+      self._discard_waiter(waiter)
+      self.shed += 1
+      raise UpstreamUnavailableError(self.name, "overloaded", timeout)
+    except asyncio.CancelledError:
+      if waiter.done() and not waiter.cancelled():
+        self._release()  # granted just as the caller went away
+      else:
+        self._discard_waiter(waiter)
+      raise
+    return False
+
+  def queue_wait(self) -> float:
+    """
+    How long a call may wait for a slot: long enough for a couple of calls ahead of it to finish
+    when the upstream takes longer than queue_timeout per call.
+    """
+    if self.baseline_latency is None:
+      return self.queue_timeout
+    return max(self.queue_timeout, 2 * self.baseline_latency)
+
+  def _discard_waiter(self, waiter: asyncio.Future) -> None:
+    try:
+      self._waiters.remove(waiter)
+    except ValueError:
+      pass
+
+  def _release(self) -> None:
+    self.in_flight -= 1
+    while self._waiters and self.in_flight < int(self.limit):
+      waiter = self._waiters.popleft()
+      if not waiter.done():
+        self.in_flight += 1
+        waiter.set_result(None)
+
+  def _on_success(self, slot: GuardSlot, probe: bool, sample: bool) -> None:
+    self.successes += 1
+    self.consecutive_failures = 0
+    if probe:
+      self._probe_in_flight = False
+      self.state = CLOSED
+      log_event("upstream_guard.state", upstream=self.name, state="closed", limit=int(self.limit))
+    if not sample:
+      return
+
+    latency = slot.latency if slot.latency is not None else time.monotonic() - slot.started
+    self.last_latency = latency
+    self._latencies.append(latency)
+    self.baseline_latency = statistics.median(self._latencies)
+    if len(self._latencies) >= _MIN_SAMPLES:
+      recent = statistics.median([self._latencies[-i] for i in range(1, _SHORT_WINDOW + 1)])
+      if recent > self.baseline_latency * self.latency_tolerance:
+        self._decrease(0.9, recent)
+        return
+    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+  def _on_failure(self, probe: bool) -> None:
+    self.failures += 1
+    self.consecutive_failures += 1
+    self._decrease(0.5, self.last_latency or 1.0)
+    if probe:
+      self._probe_in_flight = False
+      self._open()
+    elif self.state == CLOSED and self.consecutive_failures >= self.breaker_failures:
+      self._open()
+
+  def _decrease(self, factor: float, window: float) -> None:
+    # At most one decrease per latency window, so one burst of slow calls counts once.
+    now = time.monotonic()
+    if now - self._last_decrease < window:
+      return
+    self._last_decrease = now
+    self.limit = max(float(self.min_limit), self.limit * factor)
+
+  def _open(self) -> None:
+    self.state = OPEN
+    self.opened += 1
+    self._open_until = time.monotonic() + self.breaker_cooldown
+    log_event(
+      "upstream_guard.state", level=logging.WARNING, upstream=self.name, state="open",
+      consecutive_failures=self.consecutive_failures, cooldown_s=self.breaker_cooldown,
+    )
+    # Queued callers would only time out against a dead upstream: fail them now.
+    while self._waiters:
+      waiter = self._waiters.popleft()
+      if not waiter.done():
+        waiter.set_exception(UpstreamUnavailableError(self.name, "circuit open", self.breaker_cooldown))
+
+  def stats(self) -> dict:
+    return {
+      "state": self.state,
+      "limit": int(self.limit),
+      "in_flight": self.in_flight,
+      "queued": len(self._waiters),
+      "successes": self.successes,
+      "failures": self.failures,
+      "consecutive_failures": self.consecutive_failures,
+      "shed": self.shed,
+      "rejected_open": self.rejected_open,
+      "opened": self.opened,
+      "baseline_latency_ms": round(self.baseline_latency * 1000, 1) if self.baseline_latency is not None else None,
+      "last_latency_ms": round(self.last_latency * 1000, 1) if self.last_latency is not None else None,
+    }
+
+
+def _build_guard(name: str, max_limit: int) -> UpstreamGuard:
+  guard = UpstreamGuard(
+    name,
+    min_limit=settings.UPSTREAM_LIMIT_MIN,
+    initial_limit=settings.UPSTREAM_LIMIT_INITIAL,
+    max_limit=max_limit,
+    latency_tolerance=settings.UPSTREAM_LATENCY_TOLERANCE,
+    queue_timeout=settings.UPSTREAM_QUEUE_TIMEOUT,
+    breaker_failures=settings.UPSTREAM_BREAKER_FAILURES,
+    breaker_cooldown=settings.UPSTREAM_BREAKER_COOLDOWN,
+    enabled=settings.UPSTREAM_GUARD_ENABLED,
+  )
+  register_stats(f"upstream_{name}", guard)
+  return guard
+
+
+qwen_guard = _build_guard("qwen_vl", settings.QWEN_VL_MAX_CONNECTIONS)
+openrouter_guard = _build_guard("openrouter", settings.OPENROUTER_MAX_CONNECTIONS)
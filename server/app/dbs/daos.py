@@ -1,6 +1,8 @@
-from typing import Optional, List
+from datetime import date, datetime, timezone
+from typing import Any, Optional, List
 
-from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, col, delete, select, update
 
 from server.app.dbs import models
 
@@ -26,6 +28,133 @@ class UserDAO:
     db.refresh(user)
     return user
 
+  @staticmethod
+  def update_password(user_id: int, password_hash: str, db: Session) -> bool:
+    user = db.get(models.User, user_id)
+    if user is None:
+      return False
+    user.password_hash = password_hash
+    db.add(user)
+    db.commit()
+    return True
+
+  @staticmethod
+  def delete(user_id: int, db: Session) -> bool:
+    user = db.get(models.User, user_id)
+    if user is None:
+      return False
+    db.delete(user)
+    db.commit()
+    return True
+
   @staticmethod
   def list_users(offset: int, limit: int, db: Session) -> List[models.User]:
     return db.exec(select(models.User).offset(offset).limit(limit)).all()
+
+
+class JobDAO:
+  """
+  Persistence for background jobs.
+  """
+
+  @staticmethod
+  def create(job: models.Job, db: Session) -> models.Job:
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+  @staticmethod
+  def get_by_id(job_id: str, db: Session) -> Optional[models.Job]:
+    return db.get(models.Job, job_id)
+
+  @staticmethod
+  def update(job_id: str, fields: dict[str, Any], db: Session) -> Optional[models.Job]:
+    job = db.get(models.Job, job_id)
+    if job is None:
+      return None
+    for name, value in fields.items():
+      setattr(job, name, value)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+  @staticmethod
+  def list_by_status(statuses: List[str], db: Session) -> List[models.Job]:
+    stmt = select(models.Job).where(col(models.Job.status).in_(statuses)).order_by(models.Job.created_at)
+    return db.exec(stmt).all()
+
+  @staticmethod
+  def list_finished_before(cutoff: datetime, statuses: List[str], db: Session) -> List[models.Job]:
+    stmt = select(models.Job).where(col(models.Job.status).in_(statuses), col(models.Job.finished_at) < cutoff)
+    return db.exec(stmt).all()
+
+  @staticmethod
+  def delete_many(job_ids: List[str], db: Session) -> None:
+    if job_ids:
+      db.exec(delete(models.Job).where(col(models.Job.id).in_(job_ids)))
+      db.commit()
+
+
+class MealRecordDAO:
+  """
+  Meal history and its per-day summaries.
+  """
+
+  @staticmethod
+  def create(record: models.MealRecord, db: Session) -> models.MealRecord:
+    """
+    Insert the meal and fold it into its DailyNutritionSummary row in one transaction.
+    The summary is bumped with an atomic UPDATE ... SET x = x + :v, so concurrent inserts
+    for the same user and day cannot lose each other's totals.
+    """
+    db.add(record)
+    db.flush()
+    if not MealRecordDAO._bump_summary(record, db):
+      try:
+        with db.begin_nested():
+          db.add(models.DailyNutritionSummary(
+            user_id=record.user_id,
+            day=record.day,
+            meals=1,
+            weight=record.weight,
+            calories=record.calories,
+            carbohydrates=record.carbohydrates,
+            protein=record.protein,
+            fat=record.fat,
+          ))
+      except IntegrityError:
+        # Another writer created the day's row between our UPDATE and INSERT.
+        MealRecordDAO._bump_summary(record, db)
+    db.commit()
+    db.refresh(record)
+    return record
+
+  @staticmethod
+  def _bump_summary(record: models.MealRecord, db: Session) -> bool:
+    summary = models.DailyNutritionSummary
+    stmt = (
+      update(summary)
+      .where(col(summary.user_id) == record.user_id, col(summary.day) == record.day)
+      .values(
+        meals=summary.meals + 1,
+        weight=summary.weight + record.weight,
+        calories=summary.calories + record.calories,
+        carbohydrates=summary.carbohydrates + record.carbohydrates,
+        protein=summary.protein + record.protein,
+        fat=summary.fat + record.fat,
+        updated_at=datetime.now(timezone.utc),
+      )
+    )
+    return db.exec(stmt).rowcount > 0
+
+  @staticmethod
+  def list_daily(user_id: str, start: date, end: date, db: Session) -> List[models.DailyNutritionSummary]:
+    summary = models.DailyNutritionSummary
+    stmt = (
+      select(summary)
+      .where(col(summary.user_id) == user_id, col(summary.day) >= start, col(summary.day) <= end)
+      .order_by(summary.day)
+    )
+    return db.exec(stmt).all()
@@ -1,6 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime, timezone
 from typing import Optional
 
+from sqlalchemy import Index, Text, UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
@@ -11,4 +12,61 @@ class User(SQLModel, table=True):
   id: Optional[int] = Field(default=None, primary_key=True)
   username: str = Field(index=True, unique=True)
   password_hash: str
-  created_at: datetime = Field(default_factory=datetime.utcnow)
+  created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class Job(SQLModel, table=True):
+  """
+  Background job. payload/result are JSON documents; status moves
+  queued -> running -> succeeded | failed.
+  """
+  id: str = Field(primary_key=True, max_length=32)
+  kind: str = Field(index=True, max_length=32)
+  status: str = Field(index=True, max_length=16)
+  payload: str = Field(sa_type=Text)
+  result: Optional[str] = Field(default=None, sa_type=Text)
+  error: Optional[str] = Field(default=None, sa_type=Text)
+  attempts: int = 0
+  created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+  started_at: Optional[datetime] = None
+  finished_at: Optional[datetime] = None
+
+
+class MealRecord(SQLModel, table=True):
+  """
+  One analyzed meal photo. foods is the analysis' food list as JSON; day is the local date
+  (MEAL_HISTORY_TZ) the meal counts towards in DailyNutritionSummary.
+  """
+  __table_args__ = (Index("ix_mealrecord_user_eaten", "user_id", "eaten_at"),)
+
+  id: Optional[int] = Field(default=None, primary_key=True)
+  user_id: str = Field(max_length=64)
+  eaten_at: datetime
+  day: date
+  filename: str = Field(default="", max_length=255)
+  foods: str = Field(sa_type=Text)
+  weight: float = 0.0
+  calories: float = 0.0
+  carbohydrates: float = 0.0
+  protein: float = 0.0
+  fat: float = 0.0
+  created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class DailyNutritionSummary(SQLModel, table=True):
+  """
+  Per-user, per-day running totals, updated in the same transaction as each MealRecord insert
+  so rollups read one row per day instead of rescanning meals.
+  """
+  __table_args__ = (UniqueConstraint("user_id", "day", name="uq_dailynutrition_user_day"),)
+
+  id: Optional[int] = Field(default=None, primary_key=True)
+  user_id: str = Field(max_length=64)
+  day: date
+  meals: int = 0
+  weight: float = 0.0
+  calories: float = 0.0
+  carbohydrates: float = 0.0
+  protein: float = 0.0
+  fat: float = 0.0
+  updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
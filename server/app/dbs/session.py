@@ -1,18 +1,153 @@
-from sqlmodel import SQLModel, create_engine, Session, sessionmaker
+import logging
+from collections.abc import AsyncGenerator, Callable
+from pathlib import Path
+from typing import Any, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
 from server.app.core.config import settings
+from server.app.core.log_core import log_event
+
+T = TypeVar("T")
+
+# Async driver per sync backend, used when ASYNC_DATABASE_URL is not set.
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg", "mysql": "aiomysql"}
+
+
+def _is_sqlite_memory(url: URL) -> bool:
+  return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def async_url_for(url: str) -> URL:
+  """
+  The async-driver equivalent of a sync URL: sqlite:// -> sqlite+aiosqlite://, etc.
+  """
+  parsed = make_url(url)
+  backend = parsed.get_backend_name()
+  if backend not in _ASYNC_DRIVERS:
+    raise ValueError(f"no async driver known for {backend}; set ASYNC_DATABASE_URL")
+  return parsed.set(drivername=f"{backend}+{_ASYNC_DRIVERS[backend]}")
+
+
+def engine_options(url: URL) -> dict:
+  """
+  Pool options for create_engine / create_async_engine. In-memory SQLite uses a
+  single-connection pool that takes no sizing arguments.
+  """
+  options: dict = {"echo": settings.DB_ECHO}
+  if _is_sqlite_memory(url):
+    return options
+  options.update(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+  )
+  return options
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+  # WAL lets readers run alongside the single writer; NORMAL sync is durable across
+  # application crashes (only an OS crash can lose the last commits) and much cheaper than FULL.
+  cursor = dbapi_connection.cursor()
+  cursor.execute("PRAGMA journal_mode=WAL")
+  cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+  cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+  cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+  cursor.execute("PRAGMA temp_store=MEMORY")
+  cursor.execute("PRAGMA foreign_keys=ON")
+  cursor.close()
+
+
+def _configure(sync_engine) -> None:
+  url = sync_engine.url
+  if url.get_backend_name() == "sqlite" and not _is_sqlite_memory(url) and settings.SQLITE_WAL:
+    event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+
+def _ensure_sqlite_dir(url: URL) -> None:
+  if url.get_backend_name() == "sqlite" and not _is_sqlite_memory(url):
+    Path(url.database).parent.mkdir(parents=True, exist_ok=True)
 
-engine = create_engine(
-  settings.DATABASE_URL,
-  echo=settings.DEBUG,
-  pool_recycle=7200,
-)
+
+_sync_url = make_url(settings.DATABASE_URL)
+engine = create_engine(_sync_url, **engine_options(_sync_url))
+_configure(engine)
 
 SessionLocal = sessionmaker(bind=engine, class_=Session, autoflush=False, autocommit=False)
 
 
+def _build_async_engine() -> AsyncEngine | None:
+  """
+  None when the async driver is not installed, unless DB_ASYNC explicitly asks for it.
+  """
+  try:
+    url = make_url(settings.ASYNC_DATABASE_URL) if settings.ASYNC_DATABASE_URL else async_url_for(settings.DATABASE_URL)
+    async_engine = create_async_engine(url, **engine_options(url))
+  except (ImportError, ValueError) as e:
+    if settings.DB_ASYNC:
+      raise
+    log_event("db.async_disabled", level=logging.WARNING, err=e)
+    return None
+  _configure(async_engine.sync_engine)
+  return async_engine
+
+
+async_engine = _build_async_engine()
+# expire_on_commit=False: returned rows stay readable after the session closes.
+AsyncSessionLocal = (
+  async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+  if async_engine is not None
+  else None
+)
+USE_ASYNC_DB = AsyncSessionLocal is not None and (
+  settings.DB_ASYNC if settings.DB_ASYNC is not None else _sync_url.get_backend_name() != "sqlite"
+)
+
+
 def init_db() -> None:
   """
   Create tables. Call this from a startup script or migration step.
+  For SQLite, the database directory is created first (engines connect lazily).
   """
+  _ensure_sqlite_dir(engine.url)
+  # Register every table on the metadata before create_all.
+  from server.app.dbs import models  # noqa: F401
+
   SQLModel.metadata.create_all(engine)
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+  if AsyncSessionLocal is None:
+    raise RuntimeError("async database driver is not installed")
+  async with AsyncSessionLocal() as session:
+    yield session
+
+
+async def run_db(fn: Callable[..., T], *args: Any) -> T:
+  """
+  Run a sync DAO call fn(*args, db) from async code: on an async-driver session when
+  DB_ASYNC is in effect, else on a sync session in the threadpool. DAOs stay plain Session code.
+  """
+  if USE_ASYNC_DB:
+    async with AsyncSessionLocal() as db:
+      return await db.run_sync(lambda session: fn(*args, session))
+
+  def call() -> T:
+    with SessionLocal() as db:
+      return fn(*args, db)
+
+  return await run_in_threadpool(call)
+
+
+async def close_db() -> None:
+  if async_engine is not None:
+    await async_engine.dispose()
+  engine.dispose()
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, EmailStr, Field
@@ -7,6 +8,12 @@ class UserBase(BaseModel):
   username: str = Field(..., min_length=3, max_length=50)
 
 
+# The authenticated user as get_current_user returns it: no password hash, safe to cache.
+class UserPublic(UserBase):
+  id: int
+  created_at: datetime
+
+
 class UserCreate(UserBase):
   password: str = Field(..., min_length=6, max_length=64)
   email: Optional[EmailStr] = None
@@ -20,3 +27,7 @@ class Token(BaseModel):
   access_token: str
   refresh_token: str
   token_type: str = "bearer"
+
+
+class TokenRefresh(BaseModel):
+  refresh_token: str
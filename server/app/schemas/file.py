@@ -8,6 +8,10 @@ class FileMeta(BaseModel):
   size: int
   ext: str
   note: Optional[str] = None
+  pages: Optional[int] = None
+  pages_parsed: Optional[int] = None
+  truncated: bool = False
+  cached: bool = False
 
 
 class FileParseResponse(BaseModel):
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import Any, Literal, Optional
+
+from pydantic import BaseModel
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class JobSubmitResponse(BaseModel):
+  job_id: str
+  kind: str
+  status: JobStatus
+  status_url: str
+  result_url: str
+
+
+class JobStatusResponse(BaseModel):
+  job_id: str
+  kind: str
+  status: JobStatus
+  attempts: int = 0
+  error: Optional[str] = None
+  created_at: datetime
+  started_at: Optional[datetime] = None
+  finished_at: Optional[datetime] = None
+  result: Optional[dict[str, Any]] = None
@@ -1,3 +1,6 @@
+from datetime import date
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -9,6 +12,9 @@ class FoodNutritionItem(BaseModel):
   carbohydrates: float = Field(..., ge=0, description="碳水化合物，单位为克(g)")
   protein: float = Field(..., ge=0, description="蛋白质，单位为克(g)")
   fat: float = Field(..., ge=0, description="脂肪，单位为克(g)")
+  matched: bool = Field(default=False, description="营养数值由本地营养库按重量重新计算")
+  raw_name: str | None = Field(default=None, description="模型给出的原始名称（名称被标准化时）")
+  outlier: bool = Field(default=False, description="模型给出的数值明显不合理")
 
 
 class MealTotals(BaseModel):
@@ -23,12 +29,61 @@ class MealAnalyzeMeta(BaseModel):
   filename: str
   size: int
   mime: str
+  sent_size: int | None = None
+  sent_mime: str | None = None
   model: str | None = None
   used_json_schema: bool | None = None
+  cached: bool = False
+  near_duplicate: bool = False
+  identify_only: bool = False
+  nutrition_matched: int = 0
+  outliers: int = 0
 
 
 class MealAnalyzeResponse(BaseModel):
   foods: list[FoodNutritionItem]
   totals: MealTotals
   meta: MealAnalyzeMeta
+  record_id: int | None = Field(default=None, description="meal history id when the meal was recorded for a user")
+
+
+
+class MealBatchItem(BaseModel):
+  index: int = Field(..., description="position of the image in the upload")
+  filename: str
+  status_code: int = Field(..., description="what /meal/analyze would have returned for this image")
+  error: str | None = None
+  result: MealAnalyzeResponse | None = None
 
+
+class MealBatchMeta(BaseModel):
+  images: int
+  succeeded: int
+  failed: int
+  wall_ms: float
+
+
+class MealBatchResponse(BaseModel):
+  items: list[MealBatchItem]
+  totals: MealTotals
+  meta: MealBatchMeta
+
+
+HistoryPeriod = Literal["daily", "weekly", "monthly"]
+
+
+class NutritionRollup(BaseModel):
+  start: date = Field(..., description="first day of the period")
+  end: date = Field(..., description="last day of the period (inclusive)")
+  meals: int
+  totals: MealTotals
+
+
+class NutritionHistoryResponse(BaseModel):
+  user_id: str
+  period: HistoryPeriod
+  start: date
+  end: date
+  meals: int
+  totals: MealTotals
+  items: list[NutritionRollup] = Field(..., description="periods with at least one meal, oldest first")
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -21,12 +21,22 @@ class SummarizeRequest(BaseModel):
   text: str = Field(..., min_length=1)
   max_tokens: Optional[int] = Field(default=200, ge=10, le=2000)
   ratio: Optional[float] = Field(default=0.3, ge=0.05, le=1.0)
+  mode: Literal["auto", "single", "map_reduce"] = Field(
+    default="auto",
+    description="auto uses map_reduce when text exceeds TEXT_LIMIT; single clamps to TEXT_LIMIT",
+  )
 
 
 class SummarizeMeta(BaseModel):
   truncated: bool = False
   ratio: float
   model: str | None = None
+  mode: str = "single"
+  chunks: int | None = None
+  cached_chunks: int | None = None
+  parallelism: int | None = None
+  wall_ms: float | None = None
+  cached: bool = False
 
 
 class SummarizeResponse(BaseModel):
@@ -1,19 +1,26 @@
+import codecs
+import contextlib
+import hashlib
+import io
 import os
 import re
-from pathlib import Path
+import tempfile
+from collections import deque
+from collections.abc import Generator
+from concurrent.futures import Future, ProcessPoolExecutor
 from typing import Tuple
 
 from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
 from PyPDF2 import PdfReader  # type: ignore
 import docx  # type: ignore
 
+from server.app.cache.cache_service import document_cache, make_cache_key
 from server.app.core.config import settings
+from server.app.core.metrics import payload_bytes, stage_timer
 
-
-def ensure_temp_dir() -> Path:
-  path = Path(settings.TEMP_DIR)
-  path.mkdir(parents=True, exist_ok=True)
-  return path
+# Bump when extraction or sanitizing changes so cached documents are re-parsed.
+PARSER_VERSION = "3"
 
 
 def validate_file(file: UploadFile) -> Tuple[str, int]:
@@ -29,6 +36,36 @@ def validate_file(file: UploadFile) -> Tuple[str, int]:
   return ext_part, size_attr or 0
 
 
+class _PrintableTable(dict):
+  """
+  str.translate table: keeps printable characters, drops every other one (control, format and
+  zero-width characters), maps tab to space and a lone CR to LF. Entries are filled in on first
+  use, so after warm-up each code point is a plain dict hit.
+  """
+
+  def __missing__(self, codepoint: int) -> int | None:
+    value = codepoint if chr(codepoint).isprintable() else None
+    self[codepoint] = value
+    return value
+
+
+_SANITIZE_TABLE = _PrintableTable({ord("\t"): ord(" "), ord("\r"): ord("\n"), ord("\n"): ord("\n")})
+_SPACE_RUN = re.compile(r"  +")
+_BLANK_LINES = re.compile(r"\n\n\n+")
+
+
+def _clean(text: str) -> str:
+  """
+  Character filtering and run collapsing, without the final strip. Expects CRLF already folded.
+  """
+  # Most lines are already printable: isprintable() is a C scan, translate() only runs where needed.
+  table = _SANITIZE_TABLE
+  text = "\n".join([line if line.isprintable() else line.translate(table) for line in text.split("\n")])
+  # Two literal-prefix passes are several times faster in re than one alternation.
+  text = _SPACE_RUN.sub(" ", text)
+  return _BLANK_LINES.sub("\n\n", text)
+
+
 def sanitize_text(text: str) -> str:
   """
   Light cleaning for readability:
@@ -38,66 +75,256 @@ def sanitize_text(text: str) -> str:
   """
   if not text:
     return text
-
-  # Normalize newlines
-  text = text.replace("\r\n", "\n").replace("\r", "\n")
-  # Remove control characters/zero-width
-  text = re.sub(r"[\u200b-\u200f\u202a-\u202e\u2060-\u206f]", "", text)
-  text = "".join(ch for ch in text if ch.isprintable() or ch in "\n\t ")
-  # Collapse multiple spaces
-  text = re.sub(r"[ \t]+", " ", text)
-  # Collapse multiple blank lines to max 1
-  text = re.sub(r"\n{3,}", "\n\n", text)
-  return text.strip()
+  with stage_timer("sanitize"):
+    return _clean(text.replace("\r\n", "\n")).strip()
 
 
-async def read_file_content(file: UploadFile) -> str:
+class StreamingSanitizer:
   """
-  Read file content into text. Supports txt/pdf/docx. Other allowed types can be extended here.
-  Enforces size limit while streaming. Applies light sanitization.
+  Incremental sanitize_text for text that arrives piece by piece (PDF pages, docx paragraphs).
+  Joining every feed() result and finish() gives exactly sanitize_text() of the joined input.
+  A trailing CR and the trailing run of spaces/newlines are held back until the next piece, so
+  CRLF pairs and whitespace runs split across pieces collapse the same way.
   """
-  ext_part, declared_size = validate_file(file)
-  temp_dir = ensure_temp_dir()
-  temp_path = temp_dir / (file.filename or "upload.tmp")
 
-  max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-  written = 0
+  def __init__(self):
+    self.emitted = 0
+    self._pending = ""
+    self._started = False
 
-  with temp_path.open("wb") as out:
+  def feed(self, piece: str) -> str:
+    if not piece:
+      return ""
+    text = self._pending + piece
+    held_cr = text.endswith("\r")
+    if held_cr:
+      text = text[:-1]
+    text = _clean(text.replace("\r\n", "\n"))
+    if not self._started:
+      text = text.lstrip(" \n")
+      self._started = bool(text)
+    body = text.rstrip(" \n")
+    self._pending = text[len(body):] + ("\r" if held_cr else "")
+    self.emitted += len(body)
+    return body
+
+  def finish(self) -> str:
+    # Only whitespace is ever held back, and sanitize_text strips it from the end.
+    self._pending = ""
+    return ""
+
+
+async def read_upload_bytes(file: UploadFile, max_bytes: int) -> tuple[bytes, str]:
+  """
+  Read the upload into memory with a hard size limit. No temp file: concurrent uploads
+  with the same filename can no longer clobber each other.
+  Returns (data, sha256 hex digest); the digest is computed chunk by chunk while reading.
+  """
+  buffer = bytearray()
+  digest = hashlib.sha256()
+  with stage_timer("upload_read"):
     while True:
       chunk = await file.read(1024 * 1024)
       if not chunk:
         break
-      written += len(chunk)
-      if written > max_bytes:
-        out.close()
-        try:
-          os.remove(temp_path)
-        except OSError:
-          pass
+      if len(buffer) + len(chunk) > max_bytes:
         raise ValueError("file too large")
-      out.write(chunk)
+      buffer += chunk
+      digest.update(chunk)
+  payload_bytes.labels("upload_document").observe(len(buffer))
+  return bytes(buffer), digest.hexdigest()
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> list[str]:
+  """
+  Process-pool worker: extract text for pages [start, end) of the PDF at path. Top-level so it
+  can be pickled; takes a path so the document is not pickled into every task.
+  """
+  reader = PdfReader(path)
+  return [reader.pages[i].extract_text() or "" for i in range(start, min(end, len(reader.pages)))]
+
+
+_pdf_pool: ProcessPoolExecutor | None = None
+
+
+def _parse_workers() -> int:
+  return settings.FILE_PARSE_WORKERS or os.cpu_count() or 1
+
 
+def _get_pdf_pool() -> ProcessPoolExecutor | None:
+  global _pdf_pool
+  workers = _parse_workers()
+  if workers <= 1:
+    return None
+  if _pdf_pool is None:
+    _pdf_pool = ProcessPoolExecutor(max_workers=workers)
+  return _pdf_pool
+
+
+def shutdown_parse_pool() -> None:
+  global _pdf_pool
+  if _pdf_pool is not None:
+    _pdf_pool.shutdown(wait=False, cancel_futures=True)
+    _pdf_pool = None
+
+
+def _pooled_pdf_pages(pool: ProcessPoolExecutor, data: bytes, total_pages: int) -> Generator[str, None, None]:
+  """
+  Page texts in order, extracted in batches with at most one batch per worker in flight, so a
+  caller that stops early (char limit reached) leaves the remaining pages unparsed. The document
+  is written to a temp file once and workers read it from there.
+  """
+  batch = max(1, settings.FILE_PDF_PAGES_PER_TASK)
+  max_in_flight = _parse_workers()
+  pending: deque[Future] = deque()
+  fd, path = tempfile.mkstemp(suffix=".pdf", prefix="parse-")
   try:
-    if ext_part == "txt":
-      raw_text = temp_path.read_text(encoding="utf-8", errors="ignore")
-    elif ext_part == "pdf":
-      reader = PdfReader(str(temp_path))
-      pages = [page.extract_text() or "" for page in reader.pages]
-      raw_text = "\n".join(pages)
-    elif ext_part in ("doc", "docx"):
-      doc = docx.Document(str(temp_path))
-      paragraphs = [p.text for p in doc.paragraphs]
-      raw_text = "\n".join(paragraphs)
-    else:
-      raw_text = ""
+    with os.fdopen(fd, "wb") as out:
+      out.write(data)
+    for start in range(0, total_pages, batch):
+      pending.append(pool.submit(_extract_pdf_pages, path, start, start + batch))
+      if len(pending) >= max_in_flight:
+        yield from pending.popleft().result()
+    while pending:
+      yield from pending.popleft().result()
   finally:
-    try:
-      os.remove(temp_path)
-    except OSError:
-      pass
+    # Closing the generator early cancels the batches that have not started yet.
+    for future in pending:
+      future.cancel()
+    # A batch still running has already read the file.
+    with contextlib.suppress(OSError):
+      os.remove(path)
+
 
-  cleaned = sanitize_text(raw_text)
+def _pdf_pages(data: bytes) -> tuple[int, Generator[str, None, None]]:
+  """
+  Returns (total_pages, lazy page texts). Large documents are split into page batches across
+  the process pool.
+  """
+  reader = PdfReader(io.BytesIO(data))
+  total_pages = len(reader.pages)
+  pool = _get_pdf_pool() if total_pages >= settings.FILE_PDF_PARALLEL_MIN_PAGES else None
+  if pool is None:
+    return total_pages, (page.extract_text() or "" for page in reader.pages)
+  return total_pages, _pooled_pdf_pages(pool, data, total_pages)
+
+
+def _docx_paragraphs(data: bytes) -> tuple[int, Generator[str, None, None]]:
+  """
+  Returns (total_paragraphs, lazy paragraph texts).
+  """
+  paragraphs = docx.Document(io.BytesIO(data)).paragraphs
+  # p.text is computed from the run XML on every access; read it once, on demand.
+  return len(paragraphs), (p.text for p in paragraphs)
+
+
+_TXT_CHUNK = 64 * 1024
+
+
+def _txt_chunks(data: bytes) -> Generator[str, None, None]:
+  """
+  Lazy utf-8 decode of a text upload in fixed-size chunks; invalid bytes are dropped.
+  """
+  decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+  view = memoryview(data)
+  for start in range(0, len(view), _TXT_CHUNK):
+    yield decoder.decode(view[start:start + _TXT_CHUNK])
+  yield decoder.decode(b"", final=True)
+
+
+def _sanitize_pieces(pieces: Generator[str, None, None], char_limit: int, sep: str = "\n") -> tuple[str, int, bool]:
+  """
+  Sanitize sep-joined pieces incrementally, stopping once more than char_limit clean
+  characters exist. Returns (text, pieces_consumed, stopped_early); text[:char_limit] equals
+  the sanitized full document cut at char_limit.
+  """
+  sanitizer = StreamingSanitizer()
+  out: list[str] = []
+  consumed = 0
+  try:
+    for piece in pieces:
+      out.append(sanitizer.feed(piece if consumed == 0 else sep + piece))
+      consumed += 1
+      if sanitizer.emitted > char_limit:
+        return "".join(out), consumed, True
+  finally:
+    pieces.close()
+  out.append(sanitizer.finish())
+  return "".join(out), consumed, False
+
+
+def extract_text(data: bytes, ext_part: str, char_limit: int) -> tuple[str, dict]:
+  """
+  Parse an in-memory document into sanitized text of at most char_limit characters.
+  Pages/paragraphs (text in decoded chunks) are sanitized as they are extracted and parsing
+  stops once char_limit clean characters exist. Returns (text, info) with info keys pages, pages_parsed and truncated.
+  CPU-bound: call from a worker thread. Raises ValueError if the document cannot be parsed.
+  """
+  pages: int | None = None
+  pages_parsed: int | None = None
+  stopped_early = False
+  try:
+    with stage_timer(f"extract_{ext_part}"):
+      if ext_part == "txt":
+        cleaned, _, stopped_early = _sanitize_pieces(_txt_chunks(data), char_limit, sep="")
+      elif ext_part == "pdf":
+        pages, page_texts = _pdf_pages(data)
+        cleaned, pages_parsed, stopped_early = _sanitize_pieces(page_texts, char_limit)
+      elif ext_part in ("doc", "docx"):
+        _, paragraphs = _docx_paragraphs(data)
+        cleaned, _, stopped_early = _sanitize_pieces(paragraphs, char_limit)
+      else:
+        cleaned = ""
+  except Exception as e:  # noqa: BLE001
+    raise ValueError(f"failed to parse {ext_part}: {e}") from e
+
+  truncated = stopped_early or len(cleaned) > char_limit
+  cleaned = cleaned[:char_limit]
   if not cleaned:
     cleaned = f"[{ext_part}] parser returned empty text"
-  return cleaned
+  return cleaned, {"pages": pages, "pages_parsed": pages_parsed, "truncated": truncated}
+
+
+def document_cache_key(digest: str, ext_part: str, char_limit: int) -> str:
+  return make_cache_key(digest, ext_part, str(char_limit), PARSER_VERSION)
+
+
+def parse_char_limit() -> int:
+  return settings.FILE_PARSE_CHAR_LIMIT or settings.TEXT_LIMIT
+
+
+async def parse_document(data: bytes, digest: str, ext_part: str, char_limit: int | None = None) -> tuple[str, dict]:
+  """
+  Parse (or fetch from the on-disk document cache) an in-memory upload, off the event loop,
+  keeping at most char_limit characters (default parse_char_limit()).
+  Returns (text, info); info["cached"] tells whether parsing was skipped.
+  Raises ValueError if the document cannot be parsed.
+  """
+  char_limit = char_limit or parse_char_limit()
+  key = document_cache_key(digest, ext_part, char_limit)
+
+  if settings.DOC_CACHE_ENABLED:
+    entry = await run_in_threadpool(document_cache.get, key)
+    if entry is not None:
+      text, info = entry
+      info.update(size=len(data), cached=True)
+      return text, info
+
+  text, info = await run_in_threadpool(extract_text, data, ext_part, char_limit)
+  if settings.DOC_CACHE_ENABLED:
+    await run_in_threadpool(document_cache.set, key, text, info)
+  info.update(size=len(data), cached=False)
+  return text, info
+
+
+async def read_file_content(file: UploadFile) -> tuple[str, dict]:
+  """
+  Read file content into text. Supports txt/pdf/docx. Other allowed types can be extended here.
+  Enforces size limit while streaming into memory; parsing (and light sanitization) runs off
+  the event loop and stops early after parse_char_limit() characters. Re-uploads of the
+  same content are served from the on-disk document cache without parsing.
+  Returns (text, info); raises ValueError on rejected or unparseable uploads.
+  """
+  ext_part, _ = validate_file(file)
+  data, digest = await read_upload_bytes(file, settings.MAX_FILE_SIZE_MB * 1024 * 1024)
+  return await parse_document(data, digest, ext_part)
@@ -0,0 +1,386 @@
+"""
+Background jobs: accept work in milliseconds, run it on a bounded worker pool, poll for the result.
+
+Jobs live in a JobStore: SqlJobStore persists them in DATABASE_URL so queued and interrupted
+jobs are picked up again after a restart; MemoryJobStore is process-local (tests, dev).
+Uploads are spooled to JOB_SPOOL_DIR until their job finishes. Jobs shed by an upstream guard
+go back to the queue after its Retry-After instead of failing. Run workers in one app
+process per database, otherwise every process re-queues the same unfinished jobs on startup.
+"""
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Optional, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+  from apscheduler.schedulers.asyncio import AsyncIOScheduler  # type: ignore
+except ImportError:  # pragma: no cover
+  AsyncIOScheduler = None  # type: ignore
+
+from server.app.cache.cache_service import register_stats
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.core.upstream_guard import UpstreamUnavailableError
+from server.app.dbs.daos import JobDAO
+from server.app.dbs.models import Job
+from server.app.dbs.session import run_db
+from server.app.schemas.file import FileMeta
+from server.app.schemas.text import SummarizeRequest
+from server.app.services import file_service, meal_service, text_service
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = [SUCCEEDED, FAILED]
+UNFINISHED = [QUEUED, RUNNING]
+
+
+class JobQueueFullError(ValueError):
+  """
+  Raised by submit() when JOB_MAX_PENDING jobs are already waiting.
+  """
+
+
+class JobStore(Protocol):
+  async def create(self, job: Job) -> Job: ...
+  async def get(self, job_id: str) -> Optional[Job]: ...
+  async def update(self, job_id: str, **fields: Any) -> Optional[Job]: ...
+  async def list_by_status(self, statuses: list[str]) -> list[Job]: ...
+  async def purge_finished_before(self, cutoff: datetime) -> list[Job]: ...
+
+
+class MemoryJobStore:
+  """
+  Process-local store; jobs are lost on restart.
+  """
+
+  def __init__(self):
+    self._jobs: dict[str, Job] = {}
+
+  async def create(self, job: Job) -> Job:
+    self._jobs[job.id] = job
+    return job
+
+  async def get(self, job_id: str) -> Optional[Job]:
+    return self._jobs.get(job_id)
+
+  async def update(self, job_id: str, **fields: Any) -> Optional[Job]:
+    job = self._jobs.get(job_id)
+    if job is not None:
+      for name, value in fields.items():
+        setattr(job, name, value)
+    return job
+
+  async def list_by_status(self, statuses: list[str]) -> list[Job]:
+    return sorted((j for j in self._jobs.values() if j.status in statuses), key=lambda j: j.created_at)
+
+  async def purge_finished_before(self, cutoff: datetime) -> list[Job]:
+    stale = [j for j in self._jobs.values() if j.status in FINISHED and j.finished_at and j.finished_at < cutoff]
+    for job in stale:
+      del self._jobs[job.id]
+    return stale
+
+
+class SqlJobStore:
+  """
+  Store backed by the SQLModel database, on the async engine.
+  """
+
+  async def create(self, job: Job) -> Job:
+    return await run_db(JobDAO.create, job)
+
+  async def get(self, job_id: str) -> Optional[Job]:
+    return await run_db(JobDAO.get_by_id, job_id)
+
+  async def update(self, job_id: str, **fields: Any) -> Optional[Job]:
+    return await run_db(JobDAO.update, job_id, fields)
+
+  async def list_by_status(self, statuses: list[str]) -> list[Job]:
+    return await run_db(JobDAO.list_by_status, statuses)
+
+  async def purge_finished_before(self, cutoff: datetime) -> list[Job]:
+    def purge(db) -> list[Job]:
+      stale = JobDAO.list_finished_before(cutoff, FINISHED, db)
+      JobDAO.delete_many([j.id for j in stale], db)
+      return stale
+
+    return await run_db(purge)
+
+
+JobHandler = Callable[[dict], Awaitable[dict]]
+_handlers: dict[str, JobHandler] = {}
+
+
+def register_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+  def decorator(fn: JobHandler) -> JobHandler:
+    _handlers[kind] = fn
+    return fn
+
+  return decorator
+
+
+async def spool_upload(data: bytes, suffix: str) -> str:
+  """
+  Persist upload bytes for a job; the job payload carries the returned path.
+  """
+  def write() -> str:
+    directory = Path(settings.JOB_SPOOL_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{uuid.uuid4().hex}.{suffix}"
+    path.write_bytes(data)
+    return str(path)
+
+  return await run_in_threadpool(write)
+
+
+def discard_spool(payload: dict) -> None:
+  path = payload.get("spool_path")
+  if path:
+    Path(path).unlink(missing_ok=True)
+
+
+class JobQueue:
+  """
+  Fixed pool of asyncio workers draining an in-process queue of job ids. The store is the
+  source of truth; the queue only orders work for this process.
+  """
+
+  def __init__(self, store: JobStore, workers: int, max_pending: int, max_attempts: int):
+    self.store = store
+    self.workers = max(1, workers)
+    self.max_pending = max(1, max_pending)
+    self.max_attempts = max(1, max_attempts)
+    self.submitted = 0
+    self.rejected = 0
+    self.requeued = 0
+    self.succeeded = 0
+    self.failed = 0
+    self.deferred = 0
+    self.running = 0
+    self._queue: asyncio.Queue[str] = asyncio.Queue()
+    self._tasks: list[asyncio.Task] = []
+    self._retries: set[asyncio.TimerHandle] = set()
+
+  async def start(self) -> None:
+    """
+    Re-queue jobs left unfinished by a previous process, then start the workers.
+    Jobs that were interrupted max_attempts times are failed instead of retried forever.
+    """
+    for job in await self.store.list_by_status(UNFINISHED):
+      if job.status == RUNNING and job.attempts >= self.max_attempts:
+        await self.store.update(
+          job.id, status=FAILED, error=f"interrupted after {job.attempts} attempts", finished_at=datetime.now(timezone.utc)
+        )
+        discard_spool(json.loads(job.payload))
+        continue
+      if job.status == RUNNING:
+        await self.store.update(job.id, status=QUEUED)
+      self._queue.put_nowait(job.id)
+      self.requeued += 1
+    if self.requeued:
+      log_event("jobs.requeue", count=self.requeued)
+    self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(self.workers)]
+
+  async def stop(self) -> None:
+    # Running and deferred jobs stay unfinished in the store and are retried by the next start().
+    for handle in self._retries:
+      handle.cancel()
+    self._retries.clear()
+    for task in self._tasks:
+      task.cancel()
+    await asyncio.gather(*self._tasks, return_exceptions=True)
+    self._tasks = []
+
+  async def submit(self, kind: str, payload: dict) -> Job:
+    """
+    Store and enqueue a job. Raises JobQueueFullError when the backlog is at max_pending.
+    """
+    if kind not in _handlers:
+      raise ValueError(f"unknown job kind: {kind}")
+    if self._queue.qsize() >= self.max_pending:
+      self.rejected += 1
+      raise JobQueueFullError("job queue is full, retry later")
+    job = Job(id=uuid.uuid4().hex, kind=kind, status=QUEUED, payload=json.dumps(payload, ensure_ascii=False))
+    job = await self.store.create(job)
+    self._queue.put_nowait(job.id)
+    self.submitted += 1
+    return job
+
+  async def get(self, job_id: str) -> Optional[Job]:
+    return await self.store.get(job_id)
+
+  async def _worker(self) -> None:
+    while True:
+      job_id = await self._queue.get()
+      try:
+        await self._run(job_id)
+      except Exception as e:  # noqa: BLE001
+        # Store errors must not kill the worker; the job is retried on the next start().
+        log_event("jobs.worker_error", level=logging.ERROR, job_id=job_id, err=e)
+      finally:
+        self._queue.task_done()
+
+  async def _run(self, job_id: str) -> None:
+    job = await self.store.get(job_id)
+    if job is None or job.status != QUEUED:
+      return
+    job = await self.store.update(job_id, status=RUNNING, attempts=job.attempts + 1, started_at=datetime.now(timezone.utc))
+    payload = json.loads(job.payload)
+    handler = _handlers.get(job.kind)
+    started = time.perf_counter()
+    self.running += 1
+    try:
+      if handler is None:
+        raise ValueError(f"unknown job kind: {job.kind}")
+      result = await handler(payload)
+    except UpstreamUnavailableError as e:
+      # The upstream asked callers to back off: not the job's fault, so no attempt is used up.
+      self.deferred += 1
+      await self.store.update(job_id, status=QUEUED, attempts=job.attempts - 1, started_at=None)
+      self._requeue_later(job_id, e.retry_after)
+      log_event("jobs.deferred", sample=True, job_id=job_id, kind=job.kind, retry_after_s=e.retry_after)
+      return
+    except Exception as e:  # noqa: BLE001
+      self.failed += 1
+      await self.store.update(job_id, status=FAILED, error=str(e) or type(e).__name__, finished_at=datetime.now(timezone.utc))
+      log_event("jobs.failed", level=logging.WARNING, job_id=job_id, kind=job.kind, attempt=job.attempts, err=e)
+    else:
+      self.succeeded += 1
+      await self.store.update(
+        job_id, status=SUCCEEDED, result=json.dumps(result, ensure_ascii=False), finished_at=datetime.now(timezone.utc)
+      )
+      log_event("jobs.done", sample=True, job_id=job_id, kind=job.kind, ms=round((time.perf_counter() - started) * 1000, 1))
+    finally:
+      self.running -= 1
+    discard_spool(payload)
+
+  def _requeue_later(self, job_id: str, delay: float) -> None:
+    def put() -> None:
+      self._retries.discard(handle)
+      self._queue.put_nowait(job_id)
+
+    handle = asyncio.get_running_loop().call_later(max(1.0, delay), put)
+    self._retries.add(handle)
+
+  async def purge(self) -> None:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.JOB_RESULT_TTL_SECONDS)
+    stale = await self.store.purge_finished_before(cutoff)
+    for job in stale:
+      discard_spool(json.loads(job.payload))
+    if stale:
+      log_event("jobs.purge", count=len(stale))
+
+  def stats(self) -> dict:
+    return {
+      "backend": type(self.store).__name__,
+      "workers": len(self._tasks),
+      "queued": self._queue.qsize(),
+      "running": self.running,
+      "submitted": self.submitted,
+      "rejected": self.rejected,
+      "requeued": self.requeued,
+      "succeeded": self.succeeded,
+      "failed": self.failed,
+      "deferred": self.deferred,
+      "waiting_retry": len(self._retries),
+    }
+
+
+job_queue: Optional[JobQueue] = None
+_scheduler: Optional["AsyncIOScheduler"] = None
+
+
+def _build_store() -> JobStore:
+  if settings.JOB_BACKEND == "memory":
+    return MemoryJobStore()
+  if settings.JOB_BACKEND == "sql":
+    return SqlJobStore()
+  raise ValueError(f"unsupported JOB_BACKEND: {settings.JOB_BACKEND}")
+
+
+async def init_jobs() -> None:
+  global job_queue, _scheduler
+  job_queue = JobQueue(
+    _build_store(),
+    workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_MAX_PENDING,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+  )
+  register_stats("jobs", job_queue)
+  await job_queue.start()
+  if AsyncIOScheduler is not None:
+    _scheduler = AsyncIOScheduler()
+    _scheduler.add_job(
+      job_queue.purge, "interval", seconds=settings.JOB_CLEANUP_INTERVAL_SECONDS, max_instances=1, coalesce=True
+    )
+    _scheduler.start()
+
+
+def get_job_queue() -> JobQueue:
+  if job_queue is None:
+    raise RuntimeError("Job queue is not running")
+  return job_queue
+
+
+async def shutdown_jobs() -> None:
+  global job_queue, _scheduler
+  if _scheduler is not None:
+    _scheduler.shutdown(wait=False)
+    _scheduler = None
+  if job_queue is not None:
+    await job_queue.stop()
+    job_queue = None
+
+
+async def _read_spool(payload: dict) -> bytes:
+  return await run_in_threadpool(Path(payload["spool_path"]).read_bytes)
+
+
+@register_handler("summarize")
+async def _summarize_job(payload: dict) -> dict:
+  response = await text_service.summarize_request(SummarizeRequest(**payload))
+  if not response.summary:
+    raise ValueError("No content to summarize")
+  return response.model_dump()
+
+
+@register_handler("file_parse")
+async def _file_parse_job(payload: dict) -> dict:
+  """
+  Parse a spooled upload; with payload["summarize"] set, summarize the extracted text as well.
+  Summaries may use map-reduce, so the document is then parsed up to SUMMARY_MAX_INPUT_CHARS.
+  """
+  data = await _read_spool(payload)
+  summarize = payload.get("summarize")
+  char_limit = file_service.parse_char_limit()
+  if summarize is not None:
+    char_limit = max(char_limit, settings.SUMMARY_MAX_INPUT_CHARS)
+  text, info = await file_service.parse_document(data, payload["digest"], payload["ext"], char_limit)
+  meta = FileMeta(
+    filename=payload["filename"],
+    size=info["size"],
+    ext=payload["ext"],
+    pages=info["pages"],
+    pages_parsed=info["pages_parsed"],
+    truncated=info["truncated"],
+    cached=info["cached"],
+  )
+  result: dict = {"text": text, "meta": meta.model_dump(), "summary": None}
+  if summarize is not None:
+    result["summary"] = await _summarize_job({**summarize, "text": text})
+  return result
+
+
+@register_handler("meal_analyze")
+async def _meal_analyze_job(payload: dict) -> dict:
+  data = await _read_spool(payload)
+  response = await meal_service.analyze_meal(data, payload["mime"], payload["filename"], payload["size"])
+  return response.model_dump()
@@ -0,0 +1,142 @@
+"""
+Per-user meal history: analyzed meals are stored as MealRecord rows and folded into
+DailyNutritionSummary rows on insert, so daily/weekly/monthly rollups read at most one row
+per day in the range instead of rescanning raw meals.
+"""
+import json
+import logging
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.dbs.daos import MealRecordDAO
+from server.app.dbs.models import DailyNutritionSummary, MealRecord
+from server.app.dbs.session import run_db
+from server.app.schemas.meal import HistoryPeriod, MealAnalyzeResponse, NutritionHistoryResponse, NutritionRollup
+from server.app.services.meal_service import meal_totals
+
+HISTORY_TZ = ZoneInfo(settings.MEAL_HISTORY_TZ)
+# Default window per period when the caller gives no start.
+DEFAULT_SPANS = {"daily": 30, "weekly": 7 * 12, "monthly": 366}
+
+
+def local_day(moment: datetime) -> date:
+  if moment.tzinfo is None:
+    moment = moment.replace(tzinfo=timezone.utc)
+  return moment.astimezone(HISTORY_TZ).date()
+
+
+def today() -> date:
+  return local_day(datetime.now(timezone.utc))
+
+
+async def record_meal(user_id: str, response: MealAnalyzeResponse, eaten_at: datetime | None = None) -> int | None:
+  """
+  Store one analysis for a user and update their day's summary. Returns the record id, or
+  None when storage fails: losing a history entry must not fail the analysis itself.
+  A naive eaten_at is taken as MEAL_HISTORY_TZ local time.
+  """
+  eaten_at = eaten_at or datetime.now(timezone.utc)
+  if eaten_at.tzinfo is None:
+    eaten_at = eaten_at.replace(tzinfo=HISTORY_TZ)
+  totals = response.totals
+  record = MealRecord(
+    user_id=user_id,
+    eaten_at=eaten_at.astimezone(timezone.utc),
+    day=local_day(eaten_at),
+    filename=response.meta.filename,
+    foods=json.dumps([food.model_dump() for food in response.foods], ensure_ascii=False),
+    weight=totals.weight,
+    calories=totals.calories,
+    carbohydrates=totals.carbohydrates,
+    protein=totals.protein,
+    fat=totals.fat,
+  )
+
+  try:
+    record_id = (await run_db(MealRecordDAO.create, record)).id
+  except SQLAlchemyError as e:
+    log_event("meal_history.error", level=logging.ERROR, user=user_id, err=e)
+    return None
+  log_event("meal_history.record", sample=True, user=user_id, record_id=record_id, day=record.day, calories=totals.calories)
+  return record_id
+
+
+def period_start(day: date, period: HistoryPeriod) -> date:
+  if period == "weekly":
+    return day - timedelta(days=day.weekday())  # ISO weeks start on Monday
+  if period == "monthly":
+    return day.replace(day=1)
+  return day
+
+
+def period_end(start: date, period: HistoryPeriod) -> date:
+  if period == "weekly":
+    return start + timedelta(days=6)
+  if period == "monthly":
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+  return start
+
+
+def resolve_range(period: HistoryPeriod, start: date | None, end: date | None) -> tuple[date, date]:
+  """
+  Default and validate a rollup range; the ends are widened to whole periods.
+  Raises ValueError on an inverted or too long range.
+  """
+  end = end or today()
+  start = start or end - timedelta(days=DEFAULT_SPANS[period] - 1)
+  if start > end:
+    raise ValueError("start must not be after end")
+  start, end = period_start(start, period), period_end(period_start(end, period), period)
+  if (end - start).days + 1 > settings.MEAL_HISTORY_MAX_DAYS:
+    raise ValueError(f"range too long (max {settings.MEAL_HISTORY_MAX_DAYS} days)")
+  return start, end
+
+
+def rollup(days: list[DailyNutritionSummary], period: HistoryPeriod) -> list[NutritionRollup]:
+  """
+  Group day summaries (ordered by day) into periods in one pass.
+  """
+  items: list[NutritionRollup] = []
+  group: list[DailyNutritionSummary] = []
+  group_start: date | None = None
+
+  def flush() -> None:
+    if group:
+      items.append(NutritionRollup(
+        start=group_start,
+        end=period_end(group_start, period),
+        meals=sum(day.meals for day in group),
+        totals=meal_totals(group),
+      ))
+
+  for day in days:
+    start = period_start(day.day, period)
+    if start != group_start:
+      flush()
+      group, group_start = [], start
+    group.append(day)
+  flush()
+  return items
+
+
+async def nutrition_history(user_id: str, period: HistoryPeriod, start: date | None, end: date | None) -> NutritionHistoryResponse:
+  """
+  Rollups for one user. Raises ValueError on a bad range.
+  """
+  start, end = resolve_range(period, start, end)
+
+  days = await run_db(MealRecordDAO.list_daily, user_id, start, end)
+  return NutritionHistoryResponse(
+    user_id=user_id,
+    period=period,
+    start=start,
+    end=end,
+    meals=sum(day.meals for day in days),
+    totals=meal_totals(days),
+    items=rollup(days, period),
+  )
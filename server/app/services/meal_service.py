@@ -1,10 +1,43 @@
+import asyncio
 import base64
+import hashlib
+import io
 import json
+import logging
+import math
 import mimetypes
+import time
+from collections.abc import AsyncIterator, Iterable
+from dataclasses import dataclass
 
 from fastapi import UploadFile
-
+from starlette.concurrency import run_in_threadpool
+
+try:
+  from PIL import Image, ImageOps  # type: ignore
+except ImportError:  # pragma: no cover
+  Image = None  # type: ignore
+  ImageOps = None  # type: ignore
+
+from server.app.cache.cache_service import make_cache_key, meal_phash_index, meal_result_cache, register_stats
+from server.app.cache.singleflight import SingleFlight
+from server.app.core import http_core
+from server.app.core.concurrency import BudgetLease, ByteBudget, KeyedSemaphore
 from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.core.metrics import observe_upstream, payload_bytes, record_error, stage_duration, stage_timer
+from server.app.core.upstream_guard import UpstreamUnavailableError, qwen_guard
+from server.app.schemas.meal import (
+  FoodNutritionItem,
+  MealAnalyzeMeta,
+  MealAnalyzeResponse,
+  MealBatchItem,
+  MealBatchMeta,
+  MealBatchResponse,
+  MealTotals,
+)
+from server.app.services import nutrition_service
+from server.app.services.storage_service import image_store
 
 
 FOOD_NUTRITION_SCHEMA = {
@@ -32,6 +65,108 @@ FOOD_NUTRITION_SCHEMA = {
   "additionalProperties": False,
 }
 
+# MEAL_IDENTIFY_ONLY: names and weights only, nutrients come from the local table.
+FOOD_IDENTIFY_SCHEMA = {
+  "type": "object",
+  "properties": {
+    "foods": {
+      "type": "array",
+      "items": {
+        "type": "object",
+        "properties": {
+          "food_name": {"type": "string", "description": "标准化的食物名称"},
+          "weight": {"type": "number", "description": "重量，单位为克(g)", "minimum": 0},
+          "unit": {"type": "string", "description": "单位，建议为g"},
+        },
+        "required": ["food_name", "weight", "unit"],
+        "additionalProperties": False,
+      },
+    }
+  },
+  "required": ["foods"],
+  "additionalProperties": False,
+}
+
+
+MEAL_SYSTEM_PROMPT = (
+  "你是一个专业的营养学家，擅长根据餐食照片估算营养成分。"
+  "请只输出严格符合 JSON Schema 的 JSON，不要输出任何解释、前后缀、Markdown 代码块。"
+  "所有数值字段必须是数字类型，不能带单位；重量单位为克(g)，能量单位为千卡(kcal)。"
+  "如果图中有多个食物，请分别列出。"
+)
+MEAL_USER_PROMPT = (
+  "请识别图片中的所有食物，并估算每种食物的可食部分重量，以及热量、碳水、蛋白质、脂肪。"
+  "输出字段：food_name, weight, unit, calories, carbohydrates, protein, fat。"
+  "unit 请统一用 'g'。"
+)
+
+MEAL_IDENTIFY_USER_PROMPT = (
+  "请识别图片中的所有食物，并估算每种食物的可食部分重量，不需要估算营养成分。"
+  "food_name 请使用常见的中文菜名或食材名。输出字段：food_name, weight, unit。"
+  "unit 请统一用 'g'。"
+)
+
+
+def _prompt_version(user_prompt: str, schema: dict) -> str:
+  return hashlib.sha256(
+    (MEAL_SYSTEM_PROMPT + user_prompt + json.dumps(schema, sort_keys=True)).encode("utf-8")
+  ).hexdigest()[:16]
+
+
+# Changes whenever prompts or schema change, so cached results never outlive them.
+MEAL_PROMPT_VERSION = _prompt_version(MEAL_USER_PROMPT, FOOD_NUTRITION_SCHEMA)
+MEAL_IDENTIFY_PROMPT_VERSION = _prompt_version(MEAL_IDENTIFY_USER_PROMPT, FOOD_IDENTIFY_SCHEMA)
+
+
+def _prompt_mode() -> tuple[str, dict, str, int]:
+  """
+  (user_prompt, schema, prompt_version, max_tokens) for the configured analysis mode.
+  """
+  if settings.MEAL_IDENTIFY_ONLY:
+    return MEAL_IDENTIFY_USER_PROMPT, FOOD_IDENTIFY_SCHEMA, MEAL_IDENTIFY_PROMPT_VERSION, settings.QWEN_VL_IDENTIFY_MAX_TOKENS
+  return MEAL_USER_PROMPT, FOOD_NUTRITION_SCHEMA, MEAL_PROMPT_VERSION, settings.QWEN_VL_MAX_TOKENS
+
+
+analyze_flight = SingleFlight("meal_analyze")
+register_stats("singleflight_meal_analyze", analyze_flight)
+
+# Batch fan-out caps: per user first, so one large batch cannot take every global slot.
+batch_user_limits = KeyedSemaphore(settings.MEAL_BATCH_USER_CONCURRENCY)
+batch_global_limit = asyncio.Semaphore(max(1, settings.MEAL_BATCH_CONCURRENCY))
+register_stats("meal_batch_users", batch_user_limits)
+
+MiB = 1024 * 1024
+# Upload bytes held in memory by /meal requests, reserved before an upload is read and
+# released once its analysis, and any shared analysis it started, is done. The jobs routes
+# hold an upload only while spooling it, and job workers are bounded by JOB_WORKERS.
+image_budget = ByteBudget("meal image memory", settings.MEAL_INFLIGHT_MAX_MB * MiB, settings.MEAL_INFLIGHT_WAIT_SECONDS)
+register_stats("meal_memory", image_budget)
+
+# Stands in for the image URL in the request JSON until the streamed body splices the image in.
+_IMAGE_URL_PLACEHOLDER = "__meal_image_url__"
+# A multiple of 3, so per-chunk encodings concatenate to exactly the whole image's base64.
+_B64_CHUNK = 3 * 64 * 1024
+
+
+def _preprocess_fingerprint() -> str:
+  if not settings.MEAL_IMAGE_PREPROCESS:
+    return "raw"
+  return f"{settings.MEAL_IMAGE_FORMAT.lower()}:{settings.MEAL_IMAGE_MAX_EDGE}:{settings.MEAL_IMAGE_QUALITY}"
+
+
+def meal_cache_key(image_bytes: bytes) -> str:
+  """
+  Content-addressed cache key: image digest plus everything that shapes the model output.
+  """
+  return make_cache_key(
+    hashlib.sha256(image_bytes).digest(),
+    settings.QWEN_VL_MODEL,
+    _prompt_mode()[2],
+    str(settings.QWEN_VL_USE_JSON_SCHEMA),
+    str(settings.QWEN_VL_ENABLE_THINKING),
+    _preprocess_fingerprint(),
+  )
+
 
 def _looks_like_schema_unsupported(err: Exception) -> bool:
   msg = str(err).lower()
@@ -46,8 +181,10 @@ def _guess_mime_type(filename: str, content_type: str | None) -> str:
 
 
 def _image_bytes_to_data_url(image_bytes: bytes, mime_type: str) -> str:
-  image_b64 = base64.b64encode(image_bytes).decode("utf-8")
-  return f"data:{mime_type};base64,{image_b64}"
+  payload_bytes.labels("upstream_image").observe(len(image_bytes))
+  with stage_timer("base64_encode"):
+    image_b64 = base64.b64encode(image_bytes).decode("utf-8")
+    return f"data:{mime_type};base64,{image_b64}"
 
 
 def _extract_json_object(text: str) -> dict:
@@ -61,60 +198,135 @@ def _extract_json_object(text: str) -> dict:
     raise
 
 
-def _get_api_key() -> str:
-  if not settings.DASHSCOPE_API_KEY:
-    raise ValueError("DASHSCOPE_API_KEY not configured")
-  return settings.DASHSCOPE_API_KEY
+class QwenStatusError(ValueError):
+  """
+  A non-200 answer to a streamed-body request; status_code lets the upstream guard tell
+  overload (429/5xx) from a rejected request.
+  """
+
+  def __init__(self, status_code: int, body: str):
+    super().__init__(f"Qwen-VL error: {status_code} {body}")
+    self.status_code = status_code
+
 
+class _ImageRequestBody:
+  """
+  A chat-completion request JSON with the image spliced in as a base64 data URL, produced in
+  pieces: the JSON up to the URL, the image encoded _B64_CHUNK bytes at a time, then the rest.
+  At most one encoded chunk exists at once, and the length is known up front, so the body is
+  sent with Content-Length rather than chunked. Each iteration produces the whole body again.
+  """
 
-def _get_openai_client():
+  def __init__(self, request: dict, image: bytes | bytearray, mime_type: str):
+    head, tail = json.dumps(request, ensure_ascii=False).split(json.dumps(_IMAGE_URL_PLACEHOLDER), 1)
+    self._head = f'{head}"data:{mime_type};base64,'.encode()
+    self._tail = f'"{tail}'.encode()
+    self._image = image
+    self.length = len(self._head) + 4 * math.ceil(len(image) / 3) + len(self._tail)
+    self.encode_seconds = 0.0
+
+  async def __aiter__(self) -> AsyncIterator[bytes]:
+    yield self._head
+    with memoryview(self._image) as view:
+      for start in range(0, len(view), _B64_CHUNK):
+        started = time.perf_counter()
+        chunk = base64.b64encode(view[start : start + _B64_CHUNK])
+        self.encode_seconds += time.perf_counter() - started
+        yield chunk
+    yield self._tail
+
+  def release(self) -> None:
+    """
+    Drop the image. httpx keeps the request, and so this body, in a reference cycle with the
+    response; without this the buffer lives until the next GC pass, after its budget
+    reservation has been handed back.
+    """
+    self._image = b""
+
+
+async def _post_image_completion(request_kwargs: dict, image: bytes | bytearray, mime_type: str) -> tuple[str, dict | None]:
+  """
+  POST /chat/completions with the image streamed into the body (see _ImageRequestBody).
+  Returns (content, usage).
+  """
+  client = http_core.get_qwen_http_client()
+  request = {k: v for k, v in request_kwargs.items() if k != "extra_body"}
+  request.update(request_kwargs.get("extra_body") or {})
+  body = _ImageRequestBody(request, image, mime_type)
+  payload_bytes.labels("upstream_image").observe(len(image))
   try:
-    from openai import OpenAI  # type: ignore[import-not-found]
-  except ImportError as e:  # pragma: no cover
-    raise ValueError("Missing dependency: pip install openai") from e
-
-  return OpenAI(
-    api_key=_get_api_key(),
-    base_url=settings.DASHSCOPE_BASE_URL,
-    timeout=settings.QWEN_VL_TIMEOUT,
-    max_retries=0,
-  )
+    resp = await client.post(
+      f"{settings.DASHSCOPE_BASE_URL.rstrip('/')}/chat/completions",
+      content=body,
+      headers={
+        "Authorization": f"Bearer {settings.DASHSCOPE_API_KEY}",
+        "Content-Type": "application/json",
+        "Content-Length": str(body.length),
+      },
+    )
+  finally:
+    body.release()
+  stage_duration.labels("base64_encode").observe(body.encode_seconds)
+  if resp.status_code != 200:
+    raise QwenStatusError(resp.status_code, resp.text[:1000])
+  data = resp.json()
+  return data["choices"][0]["message"].get("content") or "", data.get("usage")
 
 
-def analyze_meal_photo(image_data_url: str) -> tuple[dict, bool, str]:
+async def _create_completion(request_kwargs: dict, image: bytes | bytearray | None, mime_type: str) -> tuple[str, dict | None]:
+  """
+  One guarded Qwen-VL completion, recorded in the upstream metrics. Returns (content, usage).
+  With an image, the messages hold _IMAGE_URL_PLACEHOLDER and the request is sent with a
+  streamed body; without one it goes through the SDK with the data URL already in place.
+  """
+  async with qwen_guard.acquire():
+    started = time.perf_counter()
+    try:
+      if image is not None:
+        content, usage = await _post_image_completion(request_kwargs, image, mime_type)
+      else:
+        response = await http_core.get_qwen_client().chat.completions.create(**request_kwargs)
+        content = response.choices[0].message.content or ""
+        usage = response.usage.model_dump() if response.usage is not None else None
+    except Exception as e:
+      observe_upstream("qwen_vl", started, error=e)
+      raise
+  observe_upstream("qwen_vl", started, usage=usage)
+  return content, usage
+
+
+async def analyze_meal_photo(image: bytes | bytearray, mime_type: str, image_url: str | None = None) -> tuple[dict, bool, str]:
   """
-  Call DashScope Qwen-VL for meal photo analysis.
+  Call DashScope Qwen-VL for meal photo analysis on the shared connection pool. With
+  image_url (a signed object storage URL) the model downloads the image and the bytes are not sent.
   Returns (result_json, used_json_schema, model).
   Raises ValueError on missing config or request failure.
   """
-  client = _get_openai_client()
-
-  system_prompt = (
-    "你是一个专业的营养学家，擅长根据餐食照片估算营养成分。"
-    "请只输出严格符合 JSON Schema 的 JSON，不要输出任何解释、前后缀、Markdown 代码块。"
-    "所有数值字段必须是数字类型，不能带单位；重量单位为克(g)，能量单位为千卡(kcal)。"
-    "如果图中有多个食物，请分别列出。"
-  )
-  user_prompt = (
-    "请识别图片中的所有食物，并估算每种食物的可食部分重量，以及热量、碳水、蛋白质、脂肪。"
-    "输出字段：food_name, weight, unit, calories, carbohydrates, protein, fat。"
-    "unit 请统一用 'g'。"
-  )
+  user_prompt, schema, _, max_tokens = _prompt_mode()
+  stream_body = settings.QWEN_VL_STREAM_BODY and image_url is None
+  # Missing config fails here, before the upstream guard could count it as an outage.
+  if stream_body:
+    http_core.get_qwen_http_client()
+  else:
+    http_core.get_qwen_client()
+  if image_url is None:
+    image_url = _IMAGE_URL_PLACEHOLDER if stream_body else _image_bytes_to_data_url(image, mime_type)
+  streamed_image = image if stream_body else None
 
   request_kwargs: dict = {
     "model": settings.QWEN_VL_MODEL,
     "messages": [
-      {"role": "system", "content": system_prompt},
+      {"role": "system", "content": MEAL_SYSTEM_PROMPT},
       {
         "role": "user",
         "content": [
-          {"type": "image_url", "image_url": {"url": image_data_url}},
+          {"type": "image_url", "image_url": {"url": image_url}},
           {"type": "text", "text": user_prompt},
         ],
       },
     ],
     "temperature": settings.QWEN_VL_TEMPERATURE,
-    "max_tokens": settings.QWEN_VL_MAX_TOKENS,
+    "max_tokens": max_tokens,
     "stream": False,
     "extra_body": {"enable_thinking": settings.QWEN_VL_ENABLE_THINKING},
   }
@@ -126,7 +338,7 @@ def analyze_meal_photo(image_data_url: str) -> tuple[dict, bool, str]:
       "type": "json_schema",
       "json_schema": {
         "name": "food_nutrition_analysis",
-        "schema": FOOD_NUTRITION_SCHEMA,
+        "schema": schema,
         "strict": True,
       },
     }
@@ -136,19 +348,24 @@ def analyze_meal_photo(image_data_url: str) -> tuple[dict, bool, str]:
   for attempt in range(retries + 1):
     try:
       try:
-        response = client.chat.completions.create(**request_kwargs)
+        content, _ = await _create_completion(request_kwargs, streamed_image, mime_type)
+      except UpstreamUnavailableError:
+        raise
       except Exception as e:
         if used_json_schema and _looks_like_schema_unsupported(e):
           request_kwargs.pop("response_format", None)
           used_json_schema = False
-          response = client.chat.completions.create(**request_kwargs)
+          content, _ = await _create_completion(request_kwargs, streamed_image, mime_type)
         else:
           raise
 
-      content = (response.choices[0].message.content or "").strip()
+      content = content.strip()
       if not content:
         raise ValueError("Empty content from Qwen-VL")
       return _extract_json_object(content), used_json_schema, request_kwargs["model"]
+    except UpstreamUnavailableError:
+      # Shed or circuit open: retrying here would only add load.
+      raise
     except Exception as e:  # noqa: BLE001
       last_error = e
       if attempt >= retries:
@@ -170,35 +387,401 @@ def validate_image_upload(file: UploadFile) -> tuple[str, int]:
   return ext_part, size_attr or 0
 
 
-async def read_image_upload(file: UploadFile) -> tuple[bytes, str, int]:
+def upload_reservation(file: UploadFile) -> int:
   """
-  Read uploaded image into memory with a hard size limit.
-  Returns (bytes, mime_type, size).
+  Bytes to reserve from image_budget for an upload: its size as recorded by the multipart
+  parser, else the size limit.
   """
-  validate_image_upload(file)
-  filename = file.filename or "upload"
-  mime_type = _guess_mime_type(filename, file.content_type)
+  return getattr(file, "size", None) or settings.MAX_IMAGE_SIZE_MB * MiB
 
-  max_bytes = settings.MAX_IMAGE_SIZE_MB * 1024 * 1024
-  written = 0
-  chunks: list[bytes] = []
 
+def _read_into_buffer(fileobj, size_hint: int, max_bytes: int) -> bytearray:
+  """
+  Read a whole upload into one bytearray with readinto: allocated once from the part size
+  (one spare byte detects an upload larger than announced), grown only when the size is
+  unknown. Blocking (large parts are spooled to disk): call from a worker thread.
+  """
+  buf = bytearray(min(size_hint, max_bytes) + 1 if size_hint else MiB)
+  filled = 0
   while True:
-    chunk = await file.read(1024 * 1024)
-    if not chunk:
+    if filled == len(buf):
+      if filled > max_bytes:
+        raise ValueError("image too large")
+      buf.extend(bytes(min(len(buf), max_bytes + 1 - filled)))
+    with memoryview(buf) as view:
+      read = fileobj.readinto(view[filled:])
+    if not read:
       break
-    written += len(chunk)
-    if written > max_bytes:
-      raise ValueError("image too large")
-    chunks.append(chunk)
+    filled += read
+  if filled > max_bytes:
+    raise ValueError("image too large")
+  del buf[filled:]
+  return buf
+
 
-  data = b"".join(chunks)
+async def read_image_upload(file: UploadFile) -> tuple[bytearray, str, int]:
+  """
+  Read uploaded image into memory with a hard size limit, into a single buffer.
+  Returns (buffer, mime_type, size); the bytearray is accepted wherever bytes are.
+  """
+  validate_image_upload(file)
+  filename = file.filename or "upload"
+  mime_type = _guess_mime_type(filename, file.content_type)
+
+  max_bytes = settings.MAX_IMAGE_SIZE_MB * MiB
+  with stage_timer("upload_read"):
+    data = await run_in_threadpool(_read_into_buffer, file.file, getattr(file, "size", None) or 0, max_bytes)
+
+  payload_bytes.labels("upload_image").observe(len(data))
   if not data:
     raise ValueError("empty image file")
-  return data, mime_type, written
+  return data, mime_type, len(data)
+
+
+def _dhash_from_image(img: "Image.Image") -> int:
+  pixels = list(img.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+  value = 0
+  for row in range(8):
+    offset = row * 9
+    for col in range(8):
+      value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+  return value
+
+
+def compute_image_dhash(image_bytes: bytes) -> int | None:
+  """
+  64-bit difference hash of a 9x8 grayscale thumbnail, robust to re-compression and small crops.
+  Returns None when Pillow is unavailable or the image cannot be decoded.
+  CPU-bound: call from a worker thread.
+  """
+  if Image is None:
+    return None
+  try:
+    with Image.open(io.BytesIO(image_bytes)) as img:
+      # JPEG draft mode decodes at 1/2..1/8 scale, skipping most of the IDCT work.
+      img.draft("L", (64, 64))
+      return _dhash_from_image(img)
+  except Exception as e:  # noqa: BLE001
+    log_event("meal_dhash.skip", level=logging.WARNING, err=e)
+    return None
+
+
+def _encode_for_upload(img: "Image.Image") -> tuple[bytes, str]:
+  fmt = settings.MEAL_IMAGE_FORMAT.lower()
+  out = io.BytesIO()
+  if fmt == "webp":
+    if img.mode not in ("RGB", "RGBA"):
+      img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+    img.save(out, "WEBP", quality=settings.MEAL_IMAGE_QUALITY, method=4)
+    return out.getvalue(), "image/webp"
+
+  if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+    rgba = img.convert("RGBA")
+    flat = Image.new("RGB", rgba.size, (255, 255, 255))
+    flat.paste(rgba, mask=rgba.getchannel("A"))
+    img = flat
+  elif img.mode != "RGB":
+    img = img.convert("RGB")
+  img.save(out, "JPEG", quality=settings.MEAL_IMAGE_QUALITY, optimize=True)
+  return out.getvalue(), "image/jpeg"
+
+
+def prepare_image(image_bytes: bytes, mime_type: str) -> tuple[bytes, str, int | None]:
+  """
+  Decode once, apply EXIF orientation, downscale to MEAL_IMAGE_MAX_EDGE and re-encode
+  for the upstream request; the dHash is taken from the same decoded image.
+  Returns (bytes_to_send, mime_to_send, dhash). Falls back to the original bytes when
+  Pillow is missing, decoding fails, or re-encoding would not make the payload smaller.
+  CPU-bound: call from a worker thread.
+  """
+  if not settings.MEAL_IMAGE_PREPROCESS:
+    image_hash = compute_image_dhash(image_bytes) if settings.MEAL_PHASH_ENABLED else None
+    return image_bytes, mime_type, image_hash
+  if Image is None:
+    return image_bytes, mime_type, None
+
+  max_edge = settings.MEAL_IMAGE_MAX_EDGE
+  try:
+    with Image.open(io.BytesIO(image_bytes)) as src:
+      src.draft("RGB", (max_edge, max_edge))
+      img = ImageOps.exif_transpose(src)
+      resized = max(img.size) > max_edge
+      if resized:
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+      image_hash = _dhash_from_image(img) if settings.MEAL_PHASH_ENABLED else None
+      encoded, encoded_mime = _encode_for_upload(img)
+  except Exception as e:  # noqa: BLE001
+    log_event("meal_prepare.skip", level=logging.WARNING, mime=mime_type, err=e)
+    return image_bytes, mime_type, None
+
+  if not resized and len(encoded) >= len(image_bytes):
+    return image_bytes, mime_type, image_hash
+  return encoded, encoded_mime, image_hash
+
+
+async def _store_image(image_bytes: bytes | bytearray, mime_type: str) -> str | None:
+  """
+  Store the image and sign a URL for it; None (send inline) when storing fails.
+  """
+  try:
+    return image_store.signed_url(await image_store.put_image(image_bytes, mime_type))
+  except Exception as e:  # noqa: BLE001
+    record_error("image_store", e)
+    log_event("image_store.error", level=logging.WARNING, size=len(image_bytes), err=e)
+    return None
+
 
+# The loop only keeps weak references to tasks; an upload must not be collected half way.
+_store_tasks: set["asyncio.Task[str | None]"] = set()
+
+
+def start_image_store(image_bytes: bytes | bytearray, mime_type: str) -> "asyncio.Task[str | None] | None":
+  """
+  Start storing an image that will be sent by URL (storage enabled and the image at least
+  MEAL_IMAGE_URL_MIN_KB), so the upload overlaps the rest of the request. Returns the task,
+  resolving to the signed URL, or None when the image goes inline. The caller must await or
+  cancel it while still holding the image memory budget: the task holds the image bytes.
+  """
+  if not image_store.enabled or len(image_bytes) < settings.MEAL_IMAGE_URL_MIN_KB * 1024:
+    return None
+  task = asyncio.ensure_future(_store_image(image_bytes, mime_type))
+  _store_tasks.add(task)
+  task.add_done_callback(_store_tasks.discard)
+  return task
+
+
+async def _analyze_photo(image_bytes: bytes | bytearray, mime_type: str, image_url: str | None) -> tuple[dict, bool, str]:
+  if image_url is not None:
+    try:
+      return await analyze_meal_photo(image_bytes, mime_type, image_url)
+    except UpstreamUnavailableError:
+      raise
+    except ValueError as e:
+      # e.g. the provider could not download the URL: the inline request still works.
+      log_event("meal_analyze.url_fallback", level=logging.WARNING, err=e)
+  return await analyze_meal_photo(image_bytes, mime_type)
+
+
+async def _analyze_holding(
+  image_bytes: bytes | bytearray, mime_type: str, image_url: str | None, lease: BudgetLease | None
+) -> tuple[dict, bool, str]:
+  try:
+    return await _analyze_photo(image_bytes, mime_type, image_url)
+  finally:
+    if lease is not None:
+      lease.release()
+
+
+async def analyze_meal_image_bytes(
+  image_bytes: bytes, mime_type: str, image_url: str | None = None, lease: BudgetLease | None = None
+) -> tuple[dict, bool, str]:
+  """
+  Analyze image bytes; identical concurrent requests (e.g. one photo shared in a group chat)
+  share a single upstream call. Keyed like the result cache (plus the MIME type), so calls
+  made under different model settings never share an answer. With image_url (the signed URL
+  of the stored image) the image is sent by URL. lease is the caller's image memory lease: a
+  call that starts the shared analysis keeps a share of it until the analysis ends, since the
+  analysis holds this caller's bytes even if the caller goes away first.
+  """
+  key = make_cache_key(meal_cache_key(image_bytes), mime_type)
+  result, _ = await analyze_flight.do(
+    key,
+    lambda: _analyze_holding(image_bytes, mime_type, image_url, lease.share() if lease is not None else None),
+  )
+  return result
+
+
+def meal_totals(items: Iterable) -> MealTotals:
+  """
+  Totals over anything with weight/calories/carbohydrates/protein/fat attributes (food items,
+  MealTotals, summary rows) in a single pass.
+  """
+  weight = calories = carbohydrates = protein = fat = 0.0
+  for item in items:
+    weight += item.weight
+    calories += item.calories
+    carbohydrates += item.carbohydrates
+    protein += item.protein
+    fat += item.fat
+  return MealTotals(
+    weight=round(weight, 1),
+    calories=round(calories, 1),
+    carbohydrates=round(carbohydrates, 1),
+    protein=round(protein, 1),
+    fat=round(fat, 1),
+  )
+
+
+async def analyze_meal(
+  image_bytes: bytes, mime_type: str, filename: str, size: int, lease: BudgetLease | None = None
+) -> MealAnalyzeResponse:
+  """
+  Full analysis of one uploaded photo: exact and near-duplicate cache lookups, preprocessing,
+  the upstream call and output validation. Shared by the /meal routes and background jobs.
+  lease is the image memory lease covering image_bytes, if the caller holds one.
+  Raises ValueError when the upstream fails or returns output that does not validate.
+  """
+  cache_key = meal_cache_key(image_bytes)
+  cached = await meal_result_cache.get(cache_key)
+  exact_hit = cached is not None
+  near_duplicate = False
+  image_hash: int | None = None
+  send_bytes, send_mime = image_bytes, mime_type
+  stored = None
+  if cached is None:
+    with stage_timer("image_preprocess"):
+      send_bytes, send_mime, image_hash = await run_in_threadpool(prepare_image, image_bytes, mime_type)
+    # Kept even if a near-duplicate answers this request: stored images can be re-analyzed.
+    stored = start_image_store(send_bytes, send_mime)
+
+  try:
+    near_key = meal_phash_index.lookup(image_hash) if cached is None and image_hash is not None else None
+    if near_key is not None:
+      cached = await meal_result_cache.get(near_key)
+      if cached is not None:
+        near_duplicate = True
+        meal_phash_index.record_near_hit()
+
+    # Resolved here rather than inside the shared analysis, so cancelling this request only
+    # cancels its own upload. Finished even when a near duplicate answers, while the caller's
+    # image memory lease still covers the bytes it holds.
+    image_url = await stored if stored is not None else None
+  except BaseException:
+    if stored is not None:
+      stored.cancel()
+    raise
+
+  if cached is not None:
+    result, used_json_schema, model = cached["result"], cached["used_json_schema"], cached["model"]
+  else:
+    try:
+      result, used_json_schema, model = await analyze_meal_image_bytes(send_bytes, send_mime, image_url, lease)
+    except ValueError as e:
+      record_error("meal_analyze", e)
+      log_event("meal_analyze.error", level=logging.ERROR, filename=filename, size=size, mime=mime_type, err=e)
+      raise
+
+  identify_only = settings.MEAL_IDENTIFY_ONLY
+  try:
+    with stage_timer("output_validation"):
+      foods_raw = (result or {}).get("foods") or []
+      # The cache keeps the model's raw items; table lookups are re-applied on every read.
+      items, matched, outliers = nutrition_service.apply_nutrition(foods_raw, identify_only=identify_only)
+      foods = [FoodNutritionItem(**item) for item in items]
+  except Exception as e:  # noqa: BLE001
+    record_error("meal_output_validation", e)
+    log_event("meal_analyze.invalid_output", level=logging.ERROR, filename=filename, err=e, raw=result)
+    raise ValueError(f"Invalid model output: {e}") from e
+
+  if not exact_hit:
+    # Only cache outputs that validated, so a bad answer is retried next time.
+    await meal_result_cache.set(
+      cache_key,
+      {"result": {"foods": foods_raw}, "used_json_schema": used_json_schema, "model": model},
+    )
+    if image_hash is not None and not near_duplicate:
+      meal_phash_index.add(image_hash, cache_key)
+
+  totals = meal_totals(foods)
+  meta = MealAnalyzeMeta(
+    filename=filename,
+    size=size,
+    mime=mime_type,
+    sent_size=None if cached is not None else len(send_bytes),
+    sent_mime=None if cached is not None else send_mime,
+    model=model,
+    used_json_schema=used_json_schema,
+    cached=cached is not None,
+    near_duplicate=near_duplicate,
+    identify_only=identify_only,
+    nutrition_matched=matched,
+    outliers=outliers,
+  )
+  log_event(
+    "meal_analyze", sample=True, filename=filename, size=size, sent_size=meta.sent_size, mime=mime_type,
+    foods=len(foods), model=model, schema=used_json_schema, cached=meta.cached, near_dup=near_duplicate,
+    matched=matched, outliers=outliers, stored=stored is not None,
+  )
+  return MealAnalyzeResponse(foods=foods, totals=totals, meta=meta)
+
+
+@dataclass
+class BatchImage:
+  index: int
+  filename: str
+  data: bytes = b""
+  mime_type: str = ""
+  size: int = 0
+  error: str | None = None
+
+
+async def read_batch_uploads(files: list[UploadFile]) -> list[BatchImage]:
+  """
+  Read and validate every upload of a batch (closing each file). Rejected uploads are kept
+  as BatchImage.error so the batch still reports one item per image.
+  """
+  images: list[BatchImage] = []
+  for index, file in enumerate(files):
+    filename = file.filename or "unnamed"
+    try:
+      data, mime_type, size = await read_image_upload(file)
+      images.append(BatchImage(index, filename, data, mime_type, size))
+    except ValueError as e:
+      log_event("meal_batch.reject", level=logging.WARNING, index=index, filename=filename, err=e)
+      images.append(BatchImage(index, filename, error=str(e)))
+    finally:
+      await file.close()
+  return images
+
+
+async def _analyze_batch_image(image: BatchImage, user_key: str, lease: BudgetLease | None) -> MealBatchItem:
+  if image.error is not None:
+    return MealBatchItem(index=image.index, filename=image.filename, status_code=400, error=image.error)
+  async with batch_user_limits.acquire(user_key), batch_global_limit:
+    try:
+      result = await analyze_meal(image.data, image.mime_type, image.filename, image.size, lease)
+    except UpstreamUnavailableError as e:
+      return MealBatchItem(index=image.index, filename=image.filename, status_code=503, error=str(e))
+    except ValueError as e:
+      return MealBatchItem(index=image.index, filename=image.filename, status_code=502, error=str(e))
+  return MealBatchItem(index=image.index, filename=image.filename, status_code=200, result=result)
+
+
+async def analyze_meal_batch(
+  images: list[BatchImage], user_key: str, lease: BudgetLease | None = None
+) -> AsyncIterator[MealBatchItem]:
+  """
+  Analyze a batch concurrently (within MEAL_BATCH_USER_CONCURRENCY for user_key and
+  MEAL_BATCH_CONCURRENCY overall), yielding items in completion order. Wall time is roughly
+  the slowest call rather than the sum. Closing the iterator early cancels unfinished work.
+  lease is the batch's image memory lease; an analysis shared with other requests keeps the
+  whole of it until that analysis ends.
+  """
+  tasks = [asyncio.ensure_future(_analyze_batch_image(image, user_key, lease)) for image in images]
+  try:
+    for next_done in asyncio.as_completed(tasks):
+      yield await next_done
+  finally:
+    for task in tasks:
+      task.cancel()
+
+
+def batch_summary(items: list[MealBatchItem], started: float) -> tuple[MealTotals, MealBatchMeta]:
+  results = [item.result for item in items if item.result is not None]
+  meta = MealBatchMeta(
+    images=len(items),
+    succeeded=len(results),
+    failed=len(items) - len(results),
+    wall_ms=round((time.perf_counter() - started) * 1000, 1),
+  )
+  return meal_totals(r.totals for r in results), meta
 
-def analyze_meal_image_bytes(image_bytes: bytes, mime_type: str) -> tuple[dict, bool, str]:
-  image_data_url = _image_bytes_to_data_url(image_bytes, mime_type)
-  return analyze_meal_photo(image_data_url)
 
+async def analyze_meal_batch_response(
+  images: list[BatchImage], user_key: str, lease: BudgetLease | None = None
+) -> MealBatchResponse:
+  started = time.perf_counter()
+  items = [item async for item in analyze_meal_batch(images, user_key, lease)]
+  items.sort(key=lambda item: item.index)
+  totals, meta = batch_summary(items, started)
+  return MealBatchResponse(items=items, totals=totals, meta=meta)
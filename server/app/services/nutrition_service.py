@@ -0,0 +1,277 @@
+"""
+Local nutrition table (per 100 g of edible portion) and a fuzzy food-name index.
+
+Qwen-VL is good at naming foods and estimating portion weights but makes up the per-item
+calorie/macro numbers. After each analysis the food names are matched against this table
+and matched items get their nutrients recomputed from the estimated weight; model numbers
+that disagree badly with the table are flagged as outliers. With MEAL_IDENTIFY_ONLY the
+model is only asked for names and weights and every nutrient comes from here.
+
+The table is loaded once at import. Nutrient columns are array('f') and the index maps
+character bigrams to arrays of key ids (~0.6 KB per food including its name index).
+"""
+import csv
+import logging
+import unicodedata
+from array import array
+from pathlib import Path
+
+from server.app.cache.cache_service import register_stats
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+
+NUTRIENTS = ("calories", "carbohydrates", "protein", "fat")
+DEFAULT_TABLE_PATH = Path(__file__).resolve().parent.parent / "data" / "nutrition.csv"
+
+# Descriptors the model likes to add that do not change what the food is.
+_NAME_NOISE = ("一份", "一碗", "一盘", "一杯", "一个", "少许", "约")
+
+
+def normalize_food_name(name: str) -> str:
+  """
+  NFKC (full-width -> half-width), lowercase, keep letters/digits/CJK only, drop portion words.
+  """
+  text = unicodedata.normalize("NFKC", name or "").lower()
+  for noise in _NAME_NOISE:
+    text = text.replace(noise, "")
+  return "".join(ch for ch in text if ch.isalnum())
+
+
+def _bigrams(text: str) -> set[str]:
+  if len(text) < 2:
+    return {text} if text else set()
+  return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def _as_float(value) -> float | None:
+  try:
+    number = float(value)
+  except (TypeError, ValueError):
+    return None
+  return number if number >= 0 else None
+
+
+class NutritionTable:
+  """
+  Rows of per-100 g nutrients plus a name index. Every canonical name and alias is a key;
+  lookups try the exact normalized key first, then rank keys sharing character bigrams
+  (CJK food names are short and unsegmented, so bigrams beat word tokens or edit distance).
+  A fuzzy key must end the name (the head of the dish) unless it scores at least
+  strong_score: "牛肉饭" is rice and "鸡蛋汤" a soup, and neither has beef's or egg's numbers.
+  """
+
+  def __init__(
+    self,
+    rows: list[tuple[str, list[str], tuple[float, float, float, float]]],
+    min_score: float,
+    strong_score: float = 0.9,
+  ):
+    self.min_score = min_score
+    self.strong_score = strong_score
+    self.names: list[str] = []
+    self.columns: dict[str, array] = {nutrient: array("f") for nutrient in NUTRIENTS}
+    self._exact: dict[str, int] = {}
+    self._key_row = array("I")
+    self._key_grams = array("H")
+    self._keys: list[str] = []
+    self._postings: dict[str, array] = {}
+    self.lookups = 0
+    self.exact_hits = 0
+    self.fuzzy_hits = 0
+    self.misses = 0
+
+    for name, aliases, values in rows:
+      row = len(self.names)
+      self.names.append(name)
+      for nutrient, value in zip(NUTRIENTS, values):
+        self.columns[nutrient].append(value)
+      for key in dict.fromkeys(normalize_food_name(k) for k in (name, *aliases)):
+        if key and key not in self._exact:
+          self._add_key(key, row)
+
+  def _add_key(self, key: str, row: int) -> None:
+    key_id = len(self._key_row)
+    self._exact[key] = row
+    grams = _bigrams(key)
+    self._key_row.append(row)
+    self._key_grams.append(len(grams))
+    self._keys.append(key)
+    for gram in grams:
+      self._postings.setdefault(gram, array("I")).append(key_id)
+
+  @classmethod
+  def load(cls, path: str | Path, min_score: float, strong_score: float = 0.9) -> "NutritionTable":
+    """
+    CSV with a header: name, aliases ("|"-separated), calories, carbohydrates, protein, fat.
+    Raises ValueError on a malformed row.
+    """
+    rows = []
+    with open(path, newline="", encoding="utf-8") as f:
+      for line_no, record in enumerate(csv.DictReader(f), start=2):
+        try:
+          values = tuple(float(record[nutrient]) for nutrient in NUTRIENTS)
+        except (KeyError, TypeError, ValueError) as e:
+          raise ValueError(f"{path}:{line_no}: bad nutrient value ({e})") from e
+        aliases = [a.strip() for a in (record.get("aliases") or "").split("|") if a.strip()]
+        rows.append((record["name"].strip(), aliases, values))
+    return cls(rows, min_score, strong_score)
+
+  def __len__(self) -> int:
+    return len(self.names)
+
+  def match(self, food_name: str) -> tuple[int, float] | None:
+    """
+    Best row for a free-form food name as (row, score in (0, 1]), or None below min_score or
+    when no key ending the name scores enough (see the class docstring).
+    Ties go to a key that ends the name, then to the longer key.
+    """
+    self.lookups += 1
+    query = normalize_food_name(food_name)
+    if not query:
+      self.misses += 1
+      return None
+    row = self._exact.get(query)
+    if row is not None:
+      self.exact_hits += 1
+      return row, 1.0
+
+    grams = _bigrams(query)
+    shared: dict[int, int] = {}
+    for gram in grams:
+      for key_id in self._postings.get(gram, ()):
+        shared[key_id] = shared.get(key_id, 0) + 1
+
+    best: tuple[float, bool, int, int] | None = None
+    for key_id, count in shared.items():
+      key_grams = self._key_grams[key_id]
+      # Dice alone punishes "红烧鸡腿" vs "鸡腿"; averaging with how much of the key the name
+      # covers rewards a key contained in a name that only adds a cooking method (but not the
+      # reverse: "鸡肉" is not "鸡肉汉堡").
+      score = (2.0 * count / (len(grams) + key_grams) + count / key_grams) / 2
+      key = self._keys[key_id]
+      # Chinese dish names are head-final: "炸鸡翅" is a kind of 鸡翅, not of 炸鸡.
+      is_head = query.endswith(key)
+      if not is_head and score < self.strong_score:
+        continue
+      candidate = (score, is_head, len(key), -key_id)
+      if best is None or candidate > best:
+        best = candidate
+    if best is None or best[0] < self.min_score:
+      self.misses += 1
+      return None
+    self.fuzzy_hits += 1
+    return self._key_row[-best[3]], best[0]
+
+  def scale(self, rows: list[int], weights: list[float]) -> dict[str, list[float]]:
+    """
+    Nutrients for (row, grams) pairs, one column at a time.
+    """
+    factors = [w / 100.0 for w in weights]
+    out = {}
+    for nutrient in NUTRIENTS:
+      column = self.columns[nutrient]
+      out[nutrient] = [round(column[r] * f, 1) for r, f in zip(rows, factors)]
+    return out
+
+  def stats(self) -> dict:
+    return {
+      "foods": len(self.names),
+      "keys": len(self._key_row),
+      "lookups": self.lookups,
+      "exact_hits": self.exact_hits,
+      "fuzzy_hits": self.fuzzy_hits,
+      "misses": self.misses,
+    }
+
+
+def _is_outlier(item: dict, reference: dict | None) -> bool:
+  """
+  Model numbers that are implausible on their own (huge portion, calories that do not add up
+  from the macros) or far from the table's value for the same food and weight.
+  """
+  weight = _as_float(item.get("weight"))
+  if weight is not None and weight > settings.NUTRITION_MAX_ITEM_WEIGHT:
+    return True
+  calories = _as_float(item.get("calories"))
+  if calories is None:
+    return False
+  if reference is not None:
+    expected = reference["calories"]
+    return abs(calories - expected) > max(settings.NUTRITION_OUTLIER_MIN_KCAL, expected * settings.NUTRITION_OUTLIER_RATIO)
+  macros = [_as_float(item.get(k)) for k in ("carbohydrates", "protein", "fat")]
+  if None in macros:
+    return False
+  atwater = 4 * macros[0] + 4 * macros[1] + 9 * macros[2]
+  return abs(calories - atwater) > max(settings.NUTRITION_OUTLIER_MIN_KCAL, calories * settings.NUTRITION_OUTLIER_RATIO)
+
+
+def apply_nutrition(foods: list[dict], identify_only: bool = False) -> tuple[list[dict], int, int]:
+  """
+  Normalize names and recompute nutrients for the model's food items (dicts as returned by
+  Qwen-VL, not yet validated). Returns (items, matched, outliers). Matched items take the
+  canonical name (the model's name is kept in raw_name) and table nutrients; unmatched items
+  keep the model's numbers, or zeros when identify_only. The input list is not modified.
+  """
+  items = [dict(item) if isinstance(item, dict) else item for item in foods]
+  if nutrition_table is None:
+    if identify_only:
+      for item in items:
+        if isinstance(item, dict):
+          for nutrient in NUTRIENTS:
+            item.setdefault(nutrient, 0.0)
+    return items, 0, 0
+
+  rows: list[int] = []
+  weights: list[float] = []
+  positions: list[int] = []
+  for pos, item in enumerate(items):
+    if not isinstance(item, dict):
+      continue
+    weight = _as_float(item.get("weight"))
+    found = nutrition_table.match(str(item.get("food_name") or ""))
+    if found is None or weight is None:
+      continue
+    rows.append(found[0])
+    weights.append(weight)
+    positions.append(pos)
+
+  scaled = nutrition_table.scale(rows, weights)
+  references = {
+    pos: (row, {nutrient: scaled[nutrient][i] for nutrient in NUTRIENTS})
+    for i, (pos, row) in enumerate(zip(positions, rows))
+  }
+
+  outliers = 0
+  for pos, item in enumerate(items):
+    if not isinstance(item, dict):
+      continue
+    row, reference = references.get(pos, (None, None))
+    item["outlier"] = not identify_only and _is_outlier(item, reference)
+    outliers += item["outlier"]
+    if reference is not None:
+      canonical = nutrition_table.names[row]
+      if canonical != item.get("food_name"):
+        item["raw_name"] = item.get("food_name")
+        item["food_name"] = canonical
+      item.update(reference)
+      item["matched"] = True
+    elif identify_only:
+      for nutrient in NUTRIENTS:
+        item.setdefault(nutrient, 0.0)
+  return items, len(positions), outliers
+
+
+def _load_table() -> NutritionTable | None:
+  if not settings.NUTRITION_DB_ENABLED:
+    return None
+  path = settings.NUTRITION_DB_PATH or DEFAULT_TABLE_PATH
+  try:
+    table = NutritionTable.load(path, settings.NUTRITION_MATCH_MIN_SCORE, settings.NUTRITION_MATCH_STRONG_SCORE)
+  except (OSError, ValueError) as e:
+    log_event("nutrition.disabled", level=logging.WARNING, path=path, err=e)
+    return None
+  register_stats("nutrition", table)
+  return table
+
+
+nutrition_table = _load_table()
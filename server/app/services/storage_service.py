@@ -0,0 +1,201 @@
+"""
+Content-addressed object storage for images sent to model providers.
+
+image_store.put_image(data, mime_type) stores the bytes under
+<STORAGE_KEY_PREFIX><sha256>.<ext> and returns the key; image_store.signed_url(key) is a
+short-lived GET URL the provider downloads the image from, so the request body carries a URL
+instead of megabytes of base64. Identical content is uploaded once: keys known to be stored are
+remembered in-process, the backend is asked before uploading otherwise, and concurrent puts of
+one key share a single upload. Stored images stay available for re-analysis.
+
+Backends (STORAGE_BACKEND):
+  oss    Alibaba Cloud OSS through oss2 (OSS_* settings), presigned URLs
+  local  a directory (STORAGE_LOCAL_DIR) served by /api/storage/objects with HMAC-signed,
+         expiring URLs under STORAGE_PUBLIC_BASE_URL; stands in for OSS/MinIO in development
+  none   disabled; images are always sent inline
+"""
+import hashlib
+import hmac
+import mimetypes
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+  import oss2  # type: ignore
+except ImportError:  # pragma: no cover
+  oss2 = None  # type: ignore
+
+from server.app.cache.cache_service import TTLCache, register_stats
+from server.app.cache.singleflight import SingleFlight
+from server.app.core.config import settings
+from server.app.core.metrics import payload_bytes, stage_timer
+
+# Keys known to exist skip the backend round trip; the TTL bounds how long a key removed by a
+# bucket lifecycle rule can still be handed out.
+_KNOWN_KEYS_MAX_ENTRIES = 10000
+_KNOWN_KEYS_TTL_SECONDS = 3600
+
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+
+def object_key(digest: bytes, mime_type: str) -> str:
+  ext = _EXTENSIONS.get(mime_type) or mimetypes.guess_extension(mime_type) or ""
+  return f"{settings.STORAGE_KEY_PREFIX}{digest.hex()}{ext}"
+
+
+class OssStore:
+  """
+  A bucket on Alibaba Cloud OSS. oss2 is blocking: call from a worker thread.
+  """
+
+  name = "oss"
+
+  def __init__(self):
+    if oss2 is None:
+      raise ValueError("oss2 is not installed")
+    if not (settings.OSS_ACCESS_KEY_ID and settings.OSS_ACCESS_KEY_SECRET and settings.OSS_BUCKET_NAME and settings.OSS_ENDPOINT):
+      raise ValueError("OSS_ACCESS_KEY_ID, OSS_ACCESS_KEY_SECRET, OSS_BUCKET_NAME and OSS_ENDPOINT must be set")
+    auth = oss2.Auth(settings.OSS_ACCESS_KEY_ID, settings.OSS_ACCESS_KEY_SECRET)
+    self._bucket = oss2.Bucket(auth, settings.OSS_ENDPOINT, settings.OSS_BUCKET_NAME)
+
+  def exists(self, key: str) -> bool:
+    return self._bucket.object_exists(key)
+
+  def put(self, key: str, data: bytes | bytearray, content_type: str) -> None:
+    # oss2 takes bytes, str or file objects.
+    self._bucket.put_object(key, bytes(data) if isinstance(data, bytearray) else data, headers={"Content-Type": content_type})
+
+  def signed_url(self, key: str, expires_in: int) -> str:
+    return self._bucket.sign_url("GET", key, expires_in, slash_safe=True)
+
+
+def _local_signature(key: str, expires: int) -> str:
+  message = f"{key}\n{expires}".encode()
+  return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+class LocalStore:
+  """
+  Objects as files under STORAGE_LOCAL_DIR, written atomically. Blocking: call from a worker
+  thread.
+  """
+
+  name = "local"
+
+  def __init__(self):
+    if not settings.STORAGE_PUBLIC_BASE_URL:
+      raise ValueError("STORAGE_PUBLIC_BASE_URL must be set for the local storage backend")
+    self.root = Path(settings.STORAGE_LOCAL_DIR).resolve()
+
+  def path(self, key: str) -> Path:
+    path = (self.root / key).resolve()
+    if self.root not in path.parents:
+      raise ValueError("invalid object key")
+    return path
+
+  def exists(self, key: str) -> bool:
+    return self.path(key).is_file()
+
+  def put(self, key: str, data: bytes | bytearray, content_type: str) -> None:
+    path = self.path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+    try:
+      with os.fdopen(fd, "wb") as out:
+        out.write(data)
+      os.replace(tmp_path, path)
+    except BaseException:
+      os.unlink(tmp_path)
+      raise
+
+  def signed_url(self, key: str, expires_in: int) -> str:
+    expires = int(time.time()) + expires_in
+    base = settings.STORAGE_PUBLIC_BASE_URL.rstrip("/")
+    return f"{base}{settings.API_PREFIX}/storage/objects/{key}?expires={expires}&signature={_local_signature(key, expires)}"
+
+  def verified_path(self, key: str, expires: int, signature: str) -> Path:
+    """
+    The file behind a URL from signed_url. Raises ValueError when the signature does not
+    match or the URL has expired.
+    """
+    if not hmac.compare_digest(signature.encode(), _local_signature(key, expires).encode()):
+      raise ValueError("invalid signature")
+    if expires < time.time():
+      raise ValueError("url expired")
+    return self.path(key)
+
+
+_BACKENDS = {"oss": OssStore, "local": LocalStore}
+
+
+class ImageStore:
+  """
+  The configured backend plus deduplication; stats() is exposed on /health and /metrics.
+  """
+
+  def __init__(self):
+    self.stored = 0
+    self.stored_bytes = 0
+    self.deduplicated = 0
+    self._backend: OssStore | LocalStore | None = None
+    self._known = TTLCache(_KNOWN_KEYS_MAX_ENTRIES, _KNOWN_KEYS_TTL_SECONDS)
+    self._flight = SingleFlight("image_store")
+
+  @property
+  def enabled(self) -> bool:
+    return settings.STORAGE_BACKEND.lower() != "none"
+
+  def backend(self) -> OssStore | LocalStore:
+    """
+    The backend, created on first use. Raises ValueError on an unknown backend or missing config.
+    """
+    if self._backend is None:
+      backend_cls = _BACKENDS.get(settings.STORAGE_BACKEND.lower())
+      if backend_cls is None:
+        raise ValueError(f"unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+      self._backend = backend_cls()
+    return self._backend
+
+  async def put_image(self, data: bytes | bytearray, mime_type: str) -> str:
+    """
+    Store the image unless identical content already is; returns its key.
+    """
+    key = object_key(hashlib.sha256(data).digest(), mime_type)
+    if self._known.get(key):
+      self.deduplicated += 1
+      return key
+    await self._flight.do(key, lambda: self._upload(key, data, mime_type))
+    self._known.set(key, True)
+    return key
+
+  async def _upload(self, key: str, data: bytes | bytearray, mime_type: str) -> None:
+    backend = self.backend()
+    with stage_timer("image_store"):
+      if await run_in_threadpool(backend.exists, key):
+        self.deduplicated += 1
+        return
+      await run_in_threadpool(backend.put, key, data, mime_type)
+    self.stored += 1
+    self.stored_bytes += len(data)
+    payload_bytes.labels("stored_image").observe(len(data))
+
+  def signed_url(self, key: str) -> str:
+    return self.backend().signed_url(key, settings.STORAGE_URL_EXPIRE_SECONDS)
+
+  def stats(self) -> dict:
+    return {
+      "backend": settings.STORAGE_BACKEND.lower(),
+      "stored": self.stored,
+      "stored_bytes": self.stored_bytes,
+      "deduplicated": self.deduplicated,
+      "known_keys": len(self._known),
+      "in_flight": len(self._flight),
+    }
+
+
+image_store = ImageStore()
+register_stats("image_store", image_store)
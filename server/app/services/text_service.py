@@ -1,9 +1,44 @@
-import requests
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from collections.abc import AsyncIterator
+
+import httpx
+
+from server.app.cache.cache_service import make_cache_key, register_stats, summary_cache, summary_chunk_cache
+from server.app.cache.singleflight import SingleFlight
+from server.app.core import http_core
 from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.core.metrics import observe_upstream
+from server.app.core.upstream_guard import openrouter_guard
+from server.app.schemas.text import SummarizeMeta, SummarizeRequest, SummarizeResponse
+from server.app.services.file_service import sanitize_text
+
+# Rate limiting and transient upstream failures; everything else is not worth retrying.
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# CJK and Latin sentence terminators (plus closing quotes/brackets), or a line break.
+_SENTENCE_END = re.compile(r"[。！？；!?;…]+[”’」』）)\"']*|\.(?=\s)|\n+")
+
+
+SUMMARY_PROMPT = "请用中文总结以下内容，输出一个适合用来听的摘要版本，保留关键要点，输出纯文本：\n\n"
+CHUNK_SUMMARY_PROMPT = "以下是一篇长文档中的一个片段，请用中文提炼该片段的关键要点，不要遗漏重要事实和数字，输出纯文本：\n\n"
+MERGE_SUMMARY_PROMPT = "以下是一篇长文档各部分的要点，请合并去重，按原文顺序整理成更精炼的要点，输出纯文本：\n\n"
+
+_CJK_CHAR = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_PARAGRAPH_SPLIT = re.compile(r"\n\s*\n|\n")
+_WHITESPACE_RUN = re.compile(r"\s+")
 
+summarize_flight = SingleFlight("summarize_llm")
+register_stats("singleflight_summarize_llm", summarize_flight)
 
-def clamp_text(content: str) -> tuple[str, bool]:
-  limit = settings.TEXT_LIMIT
+
+def clamp_text(content: str, limit: int | None = None) -> tuple[str, bool]:
+  limit = limit or settings.TEXT_LIMIT
   if len(content) > limit:
     return content[:limit], True
   return content, False
@@ -21,59 +56,444 @@ def summarize_mock(text: str, ratio: float, max_tokens: int) -> tuple[str, bool]
   return summary, truncated
 
 
-def summarize_llm(text: str, ratio: float, max_tokens: int) -> tuple[str, bool, str]:
+def _extract_summary(data: dict) -> str:
+  choices = data.get("choices") or []
+  if not choices:
+    raise ValueError("No choices returned from OpenRouter")
+  message = choices[0].get("message") or {}
+  content = (message.get("content") or "").strip()
+  if not content:
+    raise ValueError("Empty content from OpenRouter")
+  return content
+
+
+def _backoff_delay(attempt: int, retry_after: str | None) -> float:
   """
-  Call OpenRouter for summarization. Returns (summary, truncated_output, model).
-  Raises ValueError on missing config or request failure.
+  Full-jitter exponential backoff, capped at OPENROUTER_BACKOFF_MAX.
+  A numeric Retry-After from the upstream wins when present.
   """
-  if not settings.OPENROUTER_API_KEY:
-    raise ValueError("OPENROUTER_API_KEY not configured")
+  cap = settings.OPENROUTER_BACKOFF_MAX
+  if retry_after:
+    try:
+      return min(cap, max(0.0, float(retry_after)))
+    except ValueError:
+      pass
+  return random.uniform(0, min(cap, settings.OPENROUTER_BACKOFF_BASE * (2 ** attempt)))
+
 
-  target_len = min(
+def summary_target_len(text: str, ratio: float, max_tokens: int) -> int:
+  return min(
     max_tokens,
     max(settings.SUMMARY_MIN_LENGTH, int(len(text) * ratio)),
   )
-  prompt = (
-    f"请用中文总结以下内容，输出一个适合用来听的摘要版本，保留关键要点，输出纯文本：\n\n{text}"
-  )
+
+
+def _build_summary_request(
+  text: str,
+  max_tokens: int,
+  stream: bool = False,
+  prompt: str = SUMMARY_PROMPT,
+) -> tuple[dict, dict]:
+  """
+  Returns (payload, headers) for an OpenRouter chat completion.
+  Raises ValueError on missing config.
+  """
+  if not settings.OPENROUTER_API_KEY:
+    raise ValueError("OPENROUTER_API_KEY not configured")
 
   payload = {
     "model": settings.OPENROUTER_MODEL,
     "messages": [
-      {"role": "user", "content": prompt}
+      {"role": "user", "content": prompt + text}
     ],
     "max_tokens": max_tokens,
     "temperature": 0.2
   }
+  if stream:
+    payload["stream"] = True
   headers = {
     "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
     "Content-Type": "application/json"
   }
+  return payload, headers
+
 
+async def _request_summary(text: str, max_tokens: int, prompt: str) -> tuple[str, str]:
+  """
+  One OpenRouter completion with retries. Returns (content, model).
+  Retries 429/5xx and network errors with backoff; other 4xx fail immediately.
+  """
+  payload, headers = _build_summary_request(text, max_tokens, prompt=prompt)
+  client = http_core.get_openrouter_client()
   last_error: Exception | None = None
   retries = max(0, settings.OPENROUTER_RETRIES)
   for attempt in range(retries + 1):
+    retry_after: str | None = None
     try:
-      resp = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
-        json=payload,
-        headers=headers,
-        timeout=settings.OPENROUTER_TIMEOUT,
-      )
-      if resp.status_code != 200:
-        raise ValueError(f"OpenRouter error: {resp.status_code} {resp.text}")
-      data = resp.json()
-      choices = data.get("choices") or []
-      if not choices:
-        raise ValueError("No choices returned from OpenRouter")
-      message = choices[0].get("message") or {}
-      content = message.get("content", "").strip()
-      if not content:
-        raise ValueError("Empty content from OpenRouter")
-      truncated_output = len(content) > target_len
-      return content, truncated_output, payload["model"]
-    except Exception as e:  # noqa: BLE001
+      async with openrouter_guard.acquire() as slot:
+        started = time.perf_counter()
+        resp = await client.post("/chat/completions", json=payload, headers=headers)
+        if resp.status_code in RETRYABLE_STATUS:
+          slot.fail()
+        elif resp.status_code != 200:
+          slot.skip_latency()  # rejected requests answer fast and say nothing about load
+    except httpx.HTTPError as e:
+      observe_upstream("openrouter", started, error=e)
       last_error = e
-      if attempt >= retries:
-        break
+    else:
+      if resp.status_code == 200:
+        try:
+          data = resp.json()
+          observe_upstream("openrouter", started, usage=data.get("usage"))
+          return _extract_summary(data), payload["model"]
+        except ValueError as e:
+          last_error = e
+      else:
+        observe_upstream("openrouter", started, error=f"http_{resp.status_code}")
+        last_error = ValueError(f"OpenRouter error: {resp.status_code} {resp.text}")
+        if resp.status_code not in RETRYABLE_STATUS:
+          break
+        retry_after = resp.headers.get("Retry-After")
+    if attempt >= retries:
+      break
+    await asyncio.sleep(_backoff_delay(attempt, retry_after))
   raise ValueError(str(last_error) if last_error else "OpenRouter summarize failed")
+
+
+async def summarize_llm(
+  text: str,
+  ratio: float,
+  max_tokens: int,
+  prompt: str = SUMMARY_PROMPT,
+) -> tuple[str, bool, str]:
+  """
+  Call OpenRouter for summarization on the shared async client. Returns (summary, truncated_output, model).
+  Identical concurrent calls share one upstream request.
+  Raises ValueError on missing config or request failure.
+  """
+  if not settings.OPENROUTER_API_KEY:
+    raise ValueError("OPENROUTER_API_KEY not configured")
+  key = make_cache_key(text, str(max_tokens), prompt, settings.OPENROUTER_MODEL)
+  (content, model), _ = await summarize_flight.do(key, lambda: _request_summary(text, max_tokens, prompt))
+  return content, len(content) > summary_target_len(text, ratio, max_tokens), model
+
+
+def _parse_stream_line(line: str) -> str | None:
+  """
+  Content delta from one SSE line of an OpenAI-style stream; None for keep-alives, [DONE] and empty deltas.
+  """
+  if not line.startswith("data:"):
+    return None
+  data = line[5:].strip()
+  if not data or data == "[DONE]":
+    return None
+  try:
+    chunk = json.loads(data)
+  except json.JSONDecodeError:
+    return None
+  if chunk.get("error"):
+    raise ValueError(f"OpenRouter stream error: {chunk['error']}")
+  choices = chunk.get("choices") or []
+  if not choices:
+    return None
+  return (choices[0].get("delta") or {}).get("content") or None
+
+
+async def stream_summarize_llm(text: str, max_tokens: int) -> AsyncIterator[str]:
+  """
+  Stream a summary from OpenRouter, yielding content deltas as they arrive.
+  Connection and status failures are retried like summarize_llm, but only until the
+  first delta has been yielded; a failure after that raises ValueError mid-stream.
+  """
+  payload, headers = _build_summary_request(text, max_tokens, stream=True)
+  client = http_core.get_openrouter_client()
+  last_error: Exception | None = None
+  retries = max(0, settings.OPENROUTER_RETRIES)
+  for attempt in range(retries + 1):
+    retry_after: str | None = None
+    started = False
+    try:
+      async with openrouter_guard.acquire() as slot:
+        call_started = time.perf_counter()
+        async with client.stream("POST", "/chat/completions", json=payload, headers=headers) as resp:
+          if resp.status_code != 200:
+            observe_upstream("openrouter", call_started, error=f"http_{resp.status_code}")
+            body = (await resp.aread()).decode("utf-8", errors="replace")
+            last_error = ValueError(f"OpenRouter error: {resp.status_code} {body}")
+            if resp.status_code not in RETRYABLE_STATUS:
+              slot.skip_latency()
+              break
+            slot.fail()
+            retry_after = resp.headers.get("Retry-After")
+          else:
+            async for line in resp.aiter_lines():
+              delta = _parse_stream_line(line)
+              if delta:
+                if not started:
+                  # The stream's length depends on the output; time to first token is the latency signal.
+                  slot.mark_latency()
+                  started = True
+                yield delta
+            if started:
+              observe_upstream("openrouter", call_started)
+              return
+            observe_upstream("openrouter", call_started, error="empty")
+            last_error = ValueError("Empty content from OpenRouter")
+    except httpx.HTTPError as e:
+      observe_upstream("openrouter", call_started, error=e)
+      if started:
+        raise ValueError(f"OpenRouter stream interrupted: {e}") from e
+      last_error = e
+    if attempt >= retries:
+      break
+    await asyncio.sleep(_backoff_delay(attempt, retry_after))
+  raise ValueError(str(last_error) if last_error else "OpenRouter summarize failed")
+
+
+class SentenceChunker:
+  """
+  Re-slices streamed text into sentence-boundary chunks of at most `limit` characters,
+  so TTS can start on the first sentence while the rest is still generating.
+  """
+
+  def __init__(self, limit: int):
+    self.limit = max(1, limit)
+    self._buffer = ""
+
+  def feed(self, delta: str) -> list[str]:
+    self._buffer += delta
+    chunks: list[str] = []
+    while True:
+      match = _SENTENCE_END.search(self._buffer)
+      if match is None or match.end() > self.limit:
+        break
+      chunks.append(self._buffer[: match.end()])
+      self._buffer = self._buffer[match.end():]
+    while len(self._buffer) > self.limit:
+      chunks.append(self._buffer[: self.limit])
+      self._buffer = self._buffer[self.limit:]
+    return [c for c in (chunk.strip() for chunk in chunks) if c]
+
+  def flush(self) -> list[str]:
+    rest, self._buffer = self._buffer.strip(), ""
+    return [rest] if rest else []
+
+
+def estimate_tokens(text: str) -> int:
+  """
+  Cheap token estimate: one per CJK character, roughly four characters per token otherwise.
+  """
+  cjk = len(_CJK_CHAR.findall(text))
+  return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_oversized(piece: str, budget: int) -> list[str]:
+  """
+  Split a paragraph that exceeds the budget on sentence boundaries, hard-cutting run-on sentences.
+  """
+  sentences: list[str] = []
+  start = 0
+  for match in _SENTENCE_END.finditer(piece):
+    sentences.append(piece[start: match.end()])
+    start = match.end()
+  if start < len(piece):
+    sentences.append(piece[start:])
+
+  parts: list[str] = []
+  current, current_tokens = "", 0
+  for sentence in sentences:
+    tokens = estimate_tokens(sentence)
+    if tokens > budget:
+      if current:
+        parts.append(current)
+        current, current_tokens = "", 0
+      # Characters per token differ between scripts; cut by the ratio observed in this sentence.
+      step = max(1, len(sentence) * budget // tokens)
+      parts.extend(sentence[i: i + step] for i in range(0, len(sentence), step))
+      continue
+    if current and current_tokens + tokens > budget:
+      parts.append(current)
+      current, current_tokens = "", 0
+    current += sentence
+    current_tokens += tokens
+  if current:
+    parts.append(current)
+  return parts
+
+
+def split_into_chunks(text: str, budget: int) -> list[str]:
+  """
+  Greedily pack paragraphs into chunks of at most `budget` estimated tokens. Boundaries only
+  fall between paragraphs (or sentences, for oversized ones), so an edit to one section
+  leaves the other chunks byte-identical and their cached summaries reusable.
+  """
+  chunks: list[str] = []
+  current: list[str] = []
+  current_tokens = 0
+  for paragraph in _PARAGRAPH_SPLIT.split(text):
+    paragraph = paragraph.strip()
+    if not paragraph:
+      continue
+    tokens = estimate_tokens(paragraph)
+    pieces = [(paragraph, tokens)] if tokens <= budget else [
+      (part, estimate_tokens(part)) for part in _split_oversized(paragraph, budget)
+    ]
+    for piece, piece_tokens in pieces:
+      if current and current_tokens + piece_tokens > budget:
+        chunks.append("\n".join(current))
+        current, current_tokens = [], 0
+      current.append(piece)
+      current_tokens += piece_tokens
+  if current:
+    chunks.append("\n".join(current))
+  return chunks
+
+
+async def _summarize_chunks(chunks: list[str], prompt: str, semaphore: asyncio.Semaphore) -> tuple[list[str], int]:
+  """
+  Summarize chunks concurrently (bounded by the semaphore), reusing cached chunk summaries.
+  Returns (partial_summaries_in_order, cached_count).
+  """
+  max_tokens = settings.SUMMARY_CHUNK_SUMMARY_TOKENS
+  cached_count = 0
+
+  async def run(chunk: str) -> str:
+    nonlocal cached_count
+    key = make_cache_key(chunk, settings.OPENROUTER_MODEL, prompt, str(max_tokens))
+    cached = await summary_chunk_cache.get(key)
+    if cached is not None:
+      cached_count += 1
+      return cached
+    async with semaphore:
+      partial, _, _ = await summarize_llm(chunk, ratio=1.0, max_tokens=max_tokens, prompt=prompt)
+    await summary_chunk_cache.set(key, partial)
+    return partial
+
+  partials = await asyncio.gather(*(run(chunk) for chunk in chunks))
+  return list(partials), cached_count
+
+
+async def summarize_map_reduce(text: str, ratio: float, max_tokens: int) -> tuple[str, bool, str, dict]:
+  """
+  Hierarchical summarization for documents beyond TEXT_LIMIT: split into token-budgeted chunks,
+  summarize them concurrently (map), merge partial summaries level by level until they fit one
+  chunk, then produce the final summary (reduce).
+  Returns (summary, truncated_output, model, stats) where stats has chunks, cached_chunks,
+  parallelism, levels and wall_ms.
+  Raises ValueError on missing config or request failure.
+  """
+  started = time.perf_counter()
+  budget = settings.SUMMARY_CHUNK_TOKENS
+  semaphore = asyncio.Semaphore(max(1, settings.SUMMARY_CHUNK_CONCURRENCY))
+
+  chunks = split_into_chunks(text, budget)
+  if not chunks:
+    raise ValueError("No content to summarize")
+  partials, cached_chunks = await _summarize_chunks(chunks, CHUNK_SUMMARY_PROMPT, semaphore)
+  levels = 1
+
+  combined = "\n".join(partials)
+  while len(partials) > 1 and estimate_tokens(combined) > budget and levels < settings.SUMMARY_MAX_LEVELS:
+    groups = split_into_chunks(combined, budget)
+    if len(groups) >= len(partials):
+      break  # partial summaries are not shrinking; let the final reduce handle it
+    partials, merged_cached = await _summarize_chunks(groups, MERGE_SUMMARY_PROMPT, semaphore)
+    cached_chunks += merged_cached
+    combined = "\n".join(partials)
+    levels += 1
+
+  if len(chunks) == 1:
+    summary, truncated_output, model = await summarize_llm(chunks[0], ratio=ratio, max_tokens=max_tokens)
+  else:
+    reduce_input, _ = clamp_text(combined)
+    summary, truncated_output, model = await summarize_llm(reduce_input, ratio=ratio, max_tokens=max_tokens)
+  stats = {
+    "chunks": len(chunks),
+    "cached_chunks": cached_chunks,
+    "parallelism": min(len(chunks), settings.SUMMARY_CHUNK_CONCURRENCY),
+    "levels": levels,
+    "wall_ms": round((time.perf_counter() - started) * 1000, 1),
+  }
+  return summary, truncated_output, model, stats
+
+
+def normalize_text(cleaned: str) -> str:
+  """
+  Collapse all whitespace in sanitized text, so trivially different copies of the same
+  article share one cache key. Only the key: the text summarized keeps its line breaks,
+  which chunking splits on.
+  """
+  return _WHITESPACE_RUN.sub(" ", cleaned).strip()
+
+
+async def summarize(text: str, ratio: float, max_tokens: int, use_map_reduce: bool) -> tuple[dict, bool]:
+  """
+  Cached, single-flight summarization of sanitized text, keyed on its normalized form.
+  Returns (result, from_cache) where result has summary, truncated, model and stats.
+  Raises ValueError on missing config or request failure.
+  """
+  cleaned = sanitize_text(text)
+  mode = "map_reduce" if use_map_reduce else "single"
+  key = make_cache_key(
+    normalize_text(cleaned),
+    settings.OPENROUTER_MODEL,
+    mode,
+    repr(float(ratio)),
+    str(max_tokens),
+    SUMMARY_PROMPT,
+  )
+
+  async def compute() -> dict:
+    stats: dict = {}
+    if use_map_reduce:
+      base_text, truncated_input = clamp_text(cleaned, settings.SUMMARY_MAX_INPUT_CHARS)
+      summary, truncated_output, model, stats = await summarize_map_reduce(base_text, ratio=ratio, max_tokens=max_tokens)
+    else:
+      base_text, truncated_input = clamp_text(cleaned)
+      summary, truncated_output, model = await summarize_llm(base_text, ratio=ratio, max_tokens=max_tokens)
+    return {
+      "summary": summary,
+      "truncated": truncated_input or truncated_output,
+      "model": model,
+      "stats": stats,
+    }
+
+  return await summary_cache.get_or_compute(key, compute)
+
+
+async def summarize_request(payload: SummarizeRequest) -> SummarizeResponse:
+  """
+  Summarize an API request: applies default ratio/max_tokens and picks the mode.
+  Shared by the /text/summarize route and background jobs. Raises ValueError on failure;
+  an empty summary means there was nothing to summarize.
+  """
+  started = time.perf_counter()
+  ratio = payload.ratio or settings.SUMMARY_DEFAULT_RATIO
+  max_tokens = payload.max_tokens or settings.TTS_SLICE_LIMIT
+  use_map_reduce = payload.mode == "map_reduce" or (
+    payload.mode == "auto" and settings.SUMMARY_MAP_REDUCE_ENABLED and len(payload.text) > settings.TEXT_LIMIT
+  )
+
+  try:
+    result, cached = await summarize(payload.text, ratio=ratio, max_tokens=max_tokens, use_map_reduce=use_map_reduce)
+  except ValueError as e:
+    log_event("summarize_text.error", level=logging.ERROR, len_in=len(payload.text), ratio=ratio, max_tokens=max_tokens, err=e)
+    raise
+
+  summary, model, stats = result["summary"], result["model"], result["stats"]
+  meta = SummarizeMeta(
+    ratio=ratio,
+    truncated=result["truncated"],
+    model=model,
+    mode="map_reduce" if use_map_reduce else "single",
+    chunks=stats.get("chunks"),
+    cached_chunks=stats.get("cached_chunks"),
+    parallelism=stats.get("parallelism"),
+    wall_ms=round((time.perf_counter() - started) * 1000, 1),
+    cached=cached,
+  )
+  log_event(
+    "summarize_text", sample=True, len_in=len(payload.text), ratio=ratio, max_tokens=max_tokens, len_out=len(summary),
+    model=model, truncated=meta.truncated, cached=cached, mode=meta.mode, chunks=meta.chunks, wall_ms=meta.wall_ms,
+  )
+  return SummarizeResponse(summary=summary, meta=meta)
@@ -1,17 +1,156 @@
-from sqlmodel import Session
+"""
+User accounts and authenticated-user resolution.
 
+get_current_user runs on every authenticated request, so both halves of it are cached:
+the decoded token (token_cache) and the user row by id (user_cache). Any change to a user
+must go through UserService so the cached copy is dropped.
+"""
+from sqlalchemy.exc import IntegrityError
+
+from server.app.cache.cache_service import register_stats, user_cache
+from server.app.cache.token_cache import TokenCache
 from server.app.core import security
+from server.app.core.config import settings
+from server.app.core.log_core import log_event
+from server.app.core.password_hasher import password_hasher
+from server.app.dbs import models
 from server.app.dbs.daos import UserDAO
+from server.app.dbs.session import run_db
+from server.app.schemas.auth import Token, UserPublic
+
+token_cache = TokenCache(
+  max_entries=settings.TOKEN_CACHE_MAX_ENTRIES,
+  ttl_seconds=settings.TOKEN_CACHE_TTL_SECONDS,
+  enabled=settings.AUTH_CACHE_ENABLED,
+)
+register_stats("auth_tokens", token_cache)
+
+# Checked against when a login names an unknown user, so that case costs the same as a
+# wrong password and response times do not reveal which usernames exist.
+_dummy_hash: str | None = None
+
+
+class UserExistsError(ValueError):
+  """
+  Raised by create_user when the username is taken.
+  """
 
 
 class UserService:
   """
-  Minimal user service wiring. Extend or replace when auth is required.
+  User reads and writes. Writes invalidate the user cache in this process and in Redis;
+  other processes' local copies expire within USER_CACHE_TTL_SECONDS.
   """
 
-  def __init__(self, db: Session):
-    self.db = db
+  @staticmethod
+  async def create_user(username: str, password: str) -> models.User:
+    """
+    Raises UserExistsError when the username is taken.
+    """
+    if await run_db(UserDAO.get_by_username, username) is not None:
+      raise UserExistsError("Username already registered")
+    hashed = await password_hasher.hash(password)
+    try:
+      user = await run_db(UserDAO.create_user, username, hashed)
+    except IntegrityError as e:  # lost a race with a concurrent registration
+      raise UserExistsError("Username already registered") from e
+    log_event("auth.register", user_id=user.id)
+    return user
+
+  @staticmethod
+  async def authenticate(username: str, password: str) -> models.User | None:
+    """
+    The user when the password matches, else None. A hash made with an outdated work
+    factor is replaced while the plaintext is at hand.
+    """
+    global _dummy_hash
+    user = await run_db(UserDAO.get_by_username, username)
+    if user is None:
+      if _dummy_hash is None:
+        _dummy_hash = await password_hasher.hash("dummy-password")
+      await password_hasher.verify(password, _dummy_hash)
+      return None
+    if not await password_hasher.verify(password, user.password_hash):
+      return None
+    if security.password_needs_rehash(user.password_hash):
+      await run_db(UserDAO.update_password, user.id, await password_hasher.hash(password))
+      log_event("auth.rehash", user_id=user.id, rounds=settings.AUTH_BCRYPT_ROUNDS)
+    return user
+
+  @staticmethod
+  def issue_tokens(user_id: int) -> Token:
+    return Token(
+      access_token=security.create_access_token(str(user_id)),
+      refresh_token=security.create_refresh_token(str(user_id)),
+    )
 
-  def create_user(self, username: str, password: str):
-    hashed = security.get_password_hash(password)
-    return UserDAO.create_user(username, hashed, self.db)
+  @staticmethod
+  async def refresh(refresh_token: str) -> Token:
+    """
+    A new token pair for a valid refresh token. Raises ValueError when the token is
+    invalid or its user no longer exists.
+    """
+    payload = security.decode_token(refresh_token, token_type="refresh")
+    try:
+      user_id = int(payload["sub"])
+    except ValueError as e:
+      raise ValueError("Invalid token subject") from e
+    if await UserService.get_user(user_id) is None:
+      raise ValueError("User not found")
+    return UserService.issue_tokens(user_id)
+
+  @staticmethod
+  async def get_user(user_id: int) -> UserPublic | None:
+    """
+    The user by id, from the cache when possible. None when no such user exists.
+    """
+    async def load() -> dict:
+      user = await run_db(UserDAO.get_by_id, user_id)
+      if user is None:
+        raise LookupError(user_id)
+      return UserPublic.model_validate(user, from_attributes=True).model_dump(mode="json")
+
+    try:
+      if not settings.AUTH_CACHE_ENABLED:
+        return UserPublic.model_validate(await load())
+      data, _ = await user_cache.get_or_compute(str(user_id), load)
+    except LookupError:
+      return None
+    return UserPublic.model_validate(data)
+
+  @staticmethod
+  async def change_password(user_id: int, password: str) -> bool:
+    hashed = await password_hasher.hash(password)
+    updated = await run_db(UserDAO.update_password, user_id, hashed)
+    await UserService.invalidate(user_id)
+    return updated
+
+  @staticmethod
+  async def delete_user(user_id: int) -> bool:
+    deleted = await run_db(UserDAO.delete, user_id)
+    await UserService.invalidate(user_id)
+    return deleted
+
+  @staticmethod
+  async def invalidate(user_id: int) -> None:
+    """
+    Drop a user from the cache; call after any write to the user outside this service.
+    """
+    await user_cache.delete(str(user_id))
+    log_event("auth.invalidate", user_id=user_id)
+
+
+async def resolve_user(token: str) -> UserPublic:
+  """
+  The user an access token belongs to. Raises ValueError when the token is invalid or
+  the user no longer exists.
+  """
+  payload = token_cache.decode(token, security.decode_token)
+  try:
+    user_id = int(payload["sub"])
+  except ValueError as e:
+    raise ValueError("Invalid token subject") from e
+  user = await UserService.get_user(user_id)
+  if user is None:
+    raise ValueError("User not found")
+  return user
@@ -1,15 +1,44 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from server.app.api.routes import router as api_router
+from server.app.cache.cache_service import document_cache, get_cache_stats, register_stats
+from server.app.core import http_core, metrics, redis_core
 from server.app.core.config import settings
+from server.app.core.log_core import RequestIdMiddleware, log_pipeline
+from server.app.core.password_hasher import password_hasher
+from server.app.dbs.session import close_db, init_db
+from server.app.services import file_service, job_service
 from fastapi.middleware.cors import CORSMiddleware
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  if settings.CACHE_USE_REDIS:
+    await redis_core.init_redis()
+  await http_core.init_http_clients()
+  await run_in_threadpool(init_db)
+  await job_service.init_jobs()
+  try:
+    yield
+  finally:
+    await job_service.shutdown_jobs()
+    await http_core.close_http_clients()
+    file_service.shutdown_parse_pool()
+    password_hasher.shutdown()
+    document_cache.close()
+    await close_db()
+    await redis_core.close_redis()
+
+
 def create_app() -> FastAPI:
   """
   Application factory to wire routers, dependencies, and startup/shutdown hooks.
   Extend here when adding middleware, CORS, tracing, etc.
   """
-  app = FastAPI(title="TTS Backend", version="0.1.0")
+  app = FastAPI(title="TTS Backend", version="0.1.0", lifespan=lifespan)
 
   # CORS: allow all origins (adjust in production as needed)
   app.add_middleware(
@@ -18,14 +47,27 @@ def create_app() -> FastAPI:
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[settings.REQUEST_ID_HEADER],
   )
 
+  # Metrics: outside CORS so it times the full request
+  if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware, exclude_paths=[settings.METRICS_PATH])
+
+    @app.get(settings.METRICS_PATH, tags=["health"], include_in_schema=False)
+    def metrics_endpoint():
+      return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+  # Request ids: added last so it is outermost and every log line of a request carries the id
+  app.add_middleware(RequestIdMiddleware, exclude_paths=["/health", settings.METRICS_PATH])
+  register_stats("logging", log_pipeline)
+
   # Routers
   app.include_router(api_router, prefix=settings.API_PREFIX)
 
   @app.get("/health", tags=["health"])
   def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "caches": get_cache_stats()}
 
   return app
 
@@ -0,0 +1,53 @@
+"""
+Settings are read when server.app.core.config is imported, so everything the app writes to is
+pointed at a throwaway directory here, before any test module imports the app.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="server-tests-")
+
+os.environ.update(
+  DEBUG="false",
+  DATABASE_URL=f"sqlite:///{_TMP}/app.db",
+  TEMP_DIR=_TMP,
+  DOC_CACHE_PATH=f"{_TMP}/doc_cache.sqlite3",
+  JOB_SPOOL_DIR=f"{_TMP}/jobs",
+  JOB_BACKEND="memory",
+  STORAGE_LOCAL_DIR=f"{_TMP}/objects",
+  LOG_QUEUE_SIZE="0",
+  LOG_LEVEL="WARNING",
+  CACHE_USE_REDIS="false",
+  AUTH_BCRYPT_ROUNDS="4",
+)
+
+
+@pytest.fixture(scope="session")
+def client():
+  """
+  The app with its lifespan running (database, job queue, hashing pool), shared by all tests.
+  """
+  from fastapi.testclient import TestClient
+
+  from server.main import app
+
+  with TestClient(app) as test_client:
+    yield test_client
+
+
+@pytest.fixture
+def user(client) -> dict:
+  """
+  A freshly registered account: {"id", "username", "password", "headers"}.
+  """
+  from server.app.services.user_service import UserService
+
+  username, password = f"user-{uuid.uuid4().hex[:12]}", "secret-password"
+  response = client.post("/api/auth/register", json={"username": username, "password": password})
+  assert response.status_code == 201, response.text
+  user_id = response.json()["id"]
+  token = UserService.issue_tokens(user_id).access_token
+  return {"id": user_id, "username": username, "password": password, "headers": {"Authorization": f"Bearer {token}"}}
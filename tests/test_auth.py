@@ -0,0 +1,82 @@
+import time
+
+import pytest
+from sqlmodel import Session
+
+from server.app.cache.token_cache import TokenCache
+from server.app.core.config import settings
+from server.app.dbs.daos import UserDAO
+from server.app.dbs.session import engine
+from server.app.services.user_service import UserService
+
+
+def _password_hash(username: str) -> str:
+  with Session(engine) as db:
+    return UserDAO.get_by_username(username, db).password_hash
+
+
+def test_json_and_form_login_issue_working_tokens(client, user):
+  credentials = {"username": user["username"], "password": user["password"]}
+  for response in (client.post("/api/auth/login", json=credentials), client.post("/api/auth/token", data=credentials)):
+    assert response.status_code == 200, response.text
+    token = response.json()
+    assert token["token_type"] == "bearer"
+    me = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token['access_token']}"})
+    assert me.json()["username"] == user["username"]
+
+
+def test_login_rejects_wrong_passwords_and_unknown_users(client, user):
+  wrong = client.post("/api/auth/token", data={"username": user["username"], "password": "wrong-password"})
+  unknown = client.post("/api/auth/login", json={"username": "nobody-here", "password": "whatever"})
+  assert wrong.status_code == unknown.status_code == 401
+  assert wrong.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_login_rehashes_an_outdated_work_factor(client, user, monkeypatch):
+  old_hash = _password_hash(user["username"])
+  assert old_hash.startswith("$2b$04$")
+  monkeypatch.setattr(settings, "AUTH_BCRYPT_ROUNDS", 5)
+  credentials = {"username": user["username"], "password": user["password"]}
+  assert client.post("/api/auth/login", json=credentials).status_code == 200
+  new_hash = _password_hash(user["username"])
+  assert new_hash.startswith("$2b$05$")
+  assert client.post("/api/auth/login", json=credentials).status_code == 200
+  assert _password_hash(user["username"]) == new_hash
+
+
+def test_deleted_users_lose_access_despite_cached_tokens(client, user):
+  assert client.get("/api/auth/me", headers=user["headers"]).status_code == 200
+  assert client.portal.call(UserService.delete_user, user["id"])
+  assert client.get("/api/auth/me", headers=user["headers"]).status_code == 401
+
+
+def test_token_cache_stores_only_successful_unexpired_decodes():
+  cache = TokenCache(max_entries=10, ttl_seconds=60)
+  decodes: list[str] = []
+
+  def verify(token: str) -> dict:
+    decodes.append(token)
+    if token == "bad":
+      raise ValueError("invalid token")
+    return {"sub": "1", "exp": time.time() + (-1 if token == "stale" else 60)}
+
+  assert cache.decode("good", verify) == cache.decode("good", verify)
+  for _ in range(2):
+    with pytest.raises(ValueError):
+      cache.decode("bad", verify)
+  cache.decode("stale", verify)
+  cache.decode("stale", verify)
+  assert decodes == ["good", "bad", "bad", "stale", "stale"]
+  assert (cache.hits, cache.expired) == (1, 1)
+
+  cache.clear()
+  cache.decode("good", verify)
+  assert decodes[-1] == "good"
+
+
+def test_token_cache_can_be_disabled():
+  cache = TokenCache(max_entries=10, ttl_seconds=60, enabled=False)
+  calls = []
+  for _ in range(2):
+    cache.decode("token", lambda token: calls.append(token) or {"exp": time.time() + 60})
+  assert len(calls) == 2
@@ -0,0 +1,117 @@
+import asyncio
+import gc
+import io
+
+import pytest
+
+from server.app.core.concurrency import BudgetExhaustedError, ByteBudget
+from server.app.services import meal_service
+
+
+def test_waiters_are_served_first_come_first_served():
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=5)
+    order: list[str] = []
+    first = await budget.acquire(80)
+
+    async def take(name: str, nbytes: int):
+      async with budget.reserve(nbytes):
+        order.append(name)
+        await asyncio.sleep(0)
+
+    big = asyncio.ensure_future(take("big", 60))
+    await asyncio.sleep(0)
+    small = asyncio.ensure_future(take("small", 10))  # would fit now, but queues behind "big"
+    await asyncio.sleep(0)
+    assert order == [] and budget.stats()["waiting"] == 2
+    first.release()
+    await asyncio.gather(big, small)
+    return budget, order
+
+  budget, order = asyncio.run(scenario())
+  assert order == ["big", "small"]
+  assert budget.in_use == 0
+  assert (budget.peak, budget.waited) == (80, 2)
+
+
+def test_oversized_reservations_are_clamped_to_the_budget():
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=5)
+    lease = await budget.acquire(10_000)
+    return budget, lease
+
+  budget, lease = asyncio.run(scenario())
+  assert lease.nbytes == budget.in_use == 100
+
+
+def test_timeout_raises_and_unblocks_smaller_waiters():
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=0.05)
+    held = await budget.acquire(50)
+    blocked = asyncio.ensure_future(budget.acquire(100))
+    await asyncio.sleep(0)
+    small = asyncio.ensure_future(budget.acquire(30))
+    with pytest.raises(BudgetExhaustedError) as info:
+      await blocked
+    small_lease = await asyncio.wait_for(small, 1)
+    held.release()
+    small_lease.release()
+    return budget, info.value
+
+  budget, error = asyncio.run(scenario())
+  assert budget.rejected == 1 and budget.in_use == 0
+  assert error.retry_after_header == "1"
+
+
+def test_cancelled_waiters_leave_the_queue():
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=5)
+    held = await budget.acquire(100)
+    waiter = asyncio.ensure_future(budget.acquire(60))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await waiter
+    held.release()
+    return budget
+
+  budget = asyncio.run(scenario())
+  assert budget.stats()["waiting"] == 0 and budget.in_use == 0
+
+
+def test_lease_release_is_idempotent_and_happens_on_collection():
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=5)
+    lease = await budget.acquire(40)
+    lease.release()
+    lease.release()
+    assert budget.in_use == 0
+    await budget.acquire(70)  # dropped without release
+    gc.collect()
+    return budget
+
+  assert asyncio.run(scenario()).in_use == 0
+
+
+def test_shared_leases_release_once_every_holder_has():
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=5)
+    lease = await budget.acquire(40)
+    shared = lease.share()
+    lease.release()
+    lease.release()
+    held = budget.in_use
+    shared.release()
+    return held, budget.in_use
+
+  assert asyncio.run(scenario()) == (40, 0)
+
+
+def test_upload_is_read_into_one_buffer_with_a_size_limit():
+  data = bytes(range(256)) * 5000
+  buffer = meal_service._read_into_buffer(io.BytesIO(data), len(data), len(data))
+  assert isinstance(buffer, bytearray) and buffer == data
+  unknown_size = meal_service._read_into_buffer(io.BytesIO(data), 0, len(data))
+  assert unknown_size == data
+  with pytest.raises(ValueError):
+    meal_service._read_into_buffer(io.BytesIO(data), 0, len(data) - 1)
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from server.app.cache import document_cache as document_cache_module
+from server.app.cache.document_cache import DocumentCache
+from server.app.services import file_service
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  ticks = itertools.count(1000.0)
+  monkeypatch.setattr(document_cache_module, "time", SimpleNamespace(time=lambda: next(ticks)))
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+  cache = DocumentCache(str(tmp_path / "docs.sqlite3"), max_bytes=30)
+  yield cache
+  cache.close()
+
+
+def test_round_trip_survives_reopening(cache):
+  cache.set("k", "parsed text", {"pages": 3})
+  cache.close()
+  reopened = DocumentCache(cache.path, max_bytes=30)
+  assert reopened.get("k") == ("parsed text", {"pages": 3})
+  assert reopened.get("missing") is None
+  assert (reopened.hits, reopened.misses) == (1, 1)
+  reopened.close()
+
+
+def test_evicts_least_recently_used_until_under_max_bytes(cache):
+  for key in "abc":
+    cache.set(key, key * 10, {})
+  assert cache.get("a") is not None  # "b" is now the oldest
+  cache.set("d", "d" * 10, {})
+  assert cache.get("b") is None
+  assert all(cache.get(key) is not None for key in "acd")
+  stats = cache.stats()
+  assert stats["evictions"] == 1
+  assert (stats["entries"], stats["bytes"]) == (3, 30)
+
+
+def test_stats_track_totals_without_querying(cache):
+  cache.set("a", "a" * 10, {})
+  cache.set("b", "b" * 10, {})
+  cache.set("a", "a" * 5, {})
+  assert (cache.stats()["entries"], cache.stats()["bytes"]) == (2, 15)
+  cache.close()
+
+  reopened = DocumentCache(cache.path, max_bytes=30)
+  reopened.get("a")  # totals are loaded on connect
+  reopened.close()
+  assert (reopened.stats()["entries"], reopened.stats()["bytes"]) == (2, 15)
+
+
+def test_oversized_entries_are_not_stored(cache):
+  cache.set("big", "x" * 31, {})
+  assert cache.get("big") is None
+  assert cache.stats()["entries"] == 0
+
+
+def test_sqlite_errors_degrade_to_a_miss(cache, monkeypatch):
+  def broken():
+    raise sqlite3.OperationalError("disk I/O error")
+
+  monkeypatch.setattr(cache, "_connect", broken)
+  cache.set("k", "text", {})
+  assert cache.get("k") is None
+  assert cache.errors == 2
+
+
+def test_parse_document_serves_repeat_uploads_from_the_cache():
+  data = "第一段。\n\nSecond paragraph.".encode()
+  digest = "test-" + data.hex()
+  text, info = asyncio.run(file_service.parse_document(data, digest, "txt"))
+  again, cached_info = asyncio.run(file_service.parse_document(data, digest, "txt"))
+  assert again == text == "第一段。\n\nSecond paragraph."
+  assert (info["cached"], cached_info["cached"]) == (False, True)
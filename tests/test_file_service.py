@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import Future
+
+from server.app.core.config import settings
+from server.app.services import file_service
+
+
+class RecordingPool:
+  """
+  Runs submitted page batches inline, recording how many were submitted before each result
+  was consumed.
+  """
+
+  def __init__(self):
+    self.submitted: list[int] = []
+    self.paths: set[str] = set()
+
+  def submit(self, fn, path, start, end) -> Future:
+    assert os.path.exists(path)
+    self.paths.add(path)
+    self.submitted.append(start)
+    future: Future = Future()
+    future.set_result([f"page {i}" for i in range(start, min(end, 100))])
+    return future
+
+
+def test_pooled_pages_keep_one_batch_per_worker_in_flight(monkeypatch):
+  monkeypatch.setattr(settings, "FILE_PARSE_WORKERS", 2)
+  monkeypatch.setattr(settings, "FILE_PDF_PAGES_PER_TASK", 10)
+  pool = RecordingPool()
+  pages = file_service._pooled_pdf_pages(pool, b"", 100)
+  assert next(pages) == "page 0"
+  assert pool.submitted == [0, 10]
+  for _ in range(10):
+    next(pages)
+  assert pool.submitted == [0, 10, 20]
+  pages.close()
+  assert len(pool.submitted) == 3
+  # Every batch reads the one temp file, removed once the pages are closed.
+  (path,) = pool.paths
+  assert not os.path.exists(path)
+
+
+def test_pooled_pages_yield_every_page_in_order(monkeypatch):
+  monkeypatch.setattr(settings, "FILE_PARSE_WORKERS", 3)
+  monkeypatch.setattr(settings, "FILE_PDF_PAGES_PER_TASK", 7)
+  assert list(file_service._pooled_pdf_pages(RecordingPool(), b"", 100)) == [f"page {i}" for i in range(100)]
+
+
+def test_parse_char_limit_defaults_to_text_limit(monkeypatch):
+  monkeypatch.setattr(settings, "FILE_PARSE_CHAR_LIMIT", 0)
+  assert file_service.parse_char_limit() == settings.TEXT_LIMIT
+  monkeypatch.setattr(settings, "FILE_PARSE_CHAR_LIMIT", 1234)
+  assert file_service.parse_char_limit() == 1234
+
+
+SANITIZER_CASES = [
+  "",
+  "plain text",
+  "  leading and trailing  \n\n",
+  "a\r\nb\rc\n\n\n\nd",
+  "tabs\tand   spaces\u200b and zero\u200dwidth\x00\x07 chars",
+  "中文段落。\r\n\r\n\r\n第二段\u3000全角空格",
+  "line\r",
+]
+
+
+def _streamed(pieces: list[str]) -> str:
+  sanitizer = file_service.StreamingSanitizer()
+  out = [sanitizer.feed(piece if i == 0 else "\n" + piece) for i, piece in enumerate(pieces)]
+  out.append(sanitizer.finish())
+  return "".join(out)
+
+
+def test_streaming_sanitizer_matches_batch_for_any_split():
+  for text in SANITIZER_CASES:
+    expected = file_service.sanitize_text(text)
+    for cut in range(len(text) + 1):
+      sanitizer = file_service.StreamingSanitizer()
+      joined = sanitizer.feed(text[:cut]) + sanitizer.feed(text[cut:]) + sanitizer.finish()
+      assert joined == expected, (text, cut)
+
+
+def test_streaming_sanitizer_matches_newline_joined_pieces():
+  pieces = ["Page one.  ", "", "\r\n  Page three\r", "\nafter CR", "   ", "end\x0c"]
+  assert _streamed(pieces) == file_service.sanitize_text("\n".join(pieces))
+
+
+def test_sanitize_pieces_stops_past_the_char_limit():
+  pieces = (f"paragraph {i} " * 5 for i in range(1000))
+  text, consumed, stopped = file_service._sanitize_pieces(pieces, 200)
+  assert stopped
+  assert consumed < 10
+  full = file_service.sanitize_text("\n".join(f"paragraph {i} " * 5 for i in range(1000)))
+  assert text[:200] == full[:200]
+
+
+def test_txt_is_sanitized_in_chunks_up_to_the_char_limit(monkeypatch):
+  monkeypatch.setattr(file_service, "_TXT_CHUNK", 7)
+  text = "第一行\r\n\r\n\r\nzero\u200bwidth  spaces\tand tabs\n" * 20
+  data = text.encode("utf-8")
+  cleaned, info = file_service.extract_text(data, "txt", 10_000)
+  assert cleaned == file_service.sanitize_text(text)
+  assert not info["truncated"]
+
+  # Characters dropped by sanitizing do not count towards the limit.
+  noisy = ("\x00" * 50 + "word ") * 200
+  cleaned, info = file_service.extract_text(noisy.encode("utf-8"), "txt", 100)
+  assert cleaned == file_service.sanitize_text(noisy)[:100]
+  assert len(cleaned) == 100
+  assert info["truncated"]
@@ -0,0 +1,160 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from server.app.core.config import settings
+from server.app.core.upstream_guard import UpstreamUnavailableError
+from server.app.dbs.models import Job
+from server.app.services import job_service
+from server.app.services.job_service import FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobQueueFullError, MemoryJobStore
+
+
+@pytest.fixture
+def handlers(monkeypatch):
+  async def echo(payload: dict) -> dict:
+    return {"echo": payload["value"]}
+
+  async def fail(payload: dict) -> dict:
+    raise ValueError("handler failed")
+
+  monkeypatch.setitem(job_service._handlers, "echo", echo)
+  monkeypatch.setitem(job_service._handlers, "fail", fail)
+
+
+def _new_queue(**overrides) -> JobQueue:
+  options = {"workers": 2, "max_pending": 10, "max_attempts": 2, **overrides}
+  return JobQueue(MemoryJobStore(), **options)
+
+
+async def _drain(queue: JobQueue) -> None:
+  await queue.start()
+  try:
+    await asyncio.wait_for(queue._queue.join(), 5)
+  finally:
+    await queue.stop()
+
+
+def test_submitted_jobs_run_to_success_or_failure(handlers, tmp_path):
+  spool = tmp_path / "upload.bin"
+  spool.write_bytes(b"data")
+
+  async def scenario():
+    queue = _new_queue()
+    ok = await queue.submit("echo", {"value": 42, "spool_path": str(spool)})
+    bad = await queue.submit("fail", {})
+    await _drain(queue)
+    return queue, await queue.get(ok.id), await queue.get(bad.id)
+
+  queue, ok, bad = asyncio.run(scenario())
+  assert ok.status == SUCCEEDED and json.loads(ok.result) == {"echo": 42}
+  assert bad.status == FAILED and bad.error == "handler failed"
+  assert (ok.attempts, bad.attempts) == (1, 1)
+  assert not spool.exists()
+  assert (queue.succeeded, queue.failed) == (1, 1)
+
+
+def test_submit_rejects_unknown_kinds_and_a_full_queue(handlers):
+  async def scenario():
+    queue = _new_queue(max_pending=2)
+    with pytest.raises(ValueError, match="unknown job kind"):
+      await queue.submit("nope", {})
+    await queue.submit("echo", {"value": 1})
+    await queue.submit("echo", {"value": 2})
+    with pytest.raises(JobQueueFullError):
+      await queue.submit("echo", {"value": 3})
+    return queue
+
+  assert asyncio.run(scenario()).rejected == 1
+
+
+def test_start_requeues_interrupted_jobs_within_max_attempts(handlers):
+  async def scenario():
+    store = MemoryJobStore()
+    retry = await store.create(Job(id="retry", kind="echo", status=RUNNING, attempts=1, payload='{"value": 1}'))
+    waiting = await store.create(Job(id="waiting", kind="echo", status=QUEUED, payload='{"value": 2}'))
+    exhausted = await store.create(Job(id="exhausted", kind="echo", status=RUNNING, attempts=2, payload='{"value": 3}'))
+    queue = JobQueue(store, workers=1, max_pending=10, max_attempts=2)
+    await _drain(queue)
+    return queue, retry, waiting, exhausted
+
+  queue, retry, waiting, exhausted = asyncio.run(scenario())
+  assert (retry.status, retry.attempts) == (SUCCEEDED, 2)
+  assert waiting.status == SUCCEEDED
+  assert exhausted.status == FAILED and "interrupted" in exhausted.error
+  assert queue.requeued == 2
+
+
+def test_shed_jobs_are_requeued_without_using_an_attempt(monkeypatch, tmp_path):
+  spool = tmp_path / "upload.bin"
+  spool.write_bytes(b"data")
+  calls = 0
+
+  async def flaky(payload: dict) -> dict:
+    nonlocal calls
+    calls += 1
+    if calls == 1:
+      raise UpstreamUnavailableError("fake", "overloaded", 0.0)
+    return {"ok": True}
+
+  monkeypatch.setitem(job_service._handlers, "flaky", flaky)
+
+  async def scenario():
+    queue = _new_queue(max_attempts=1)
+    await queue.start()
+    try:
+      job = await queue.submit("flaky", {"spool_path": str(spool)})
+      await asyncio.wait_for(queue._queue.join(), 5)
+      deferred = (job.status, job.attempts, spool.exists(), queue.stats()["waiting_retry"])
+      while job.status != SUCCEEDED:
+        await asyncio.sleep(0.05)
+      return queue, job, deferred
+    finally:
+      await queue.stop()
+
+  queue, job, deferred = asyncio.run(asyncio.wait_for(scenario(), 5))
+  assert deferred == (QUEUED, 0, True, 1)
+  assert (job.attempts, calls, queue.deferred, queue.failed) == (1, 2, 1, 0)
+  assert not spool.exists()
+
+
+def test_purge_drops_old_finished_jobs_and_their_spools(handlers, tmp_path, monkeypatch):
+  monkeypatch.setattr(settings, "JOB_RESULT_TTL_SECONDS", 60)
+  spool = tmp_path / "stale.bin"
+  spool.write_bytes(b"data")
+  now = datetime.now(timezone.utc)
+
+  async def scenario():
+    store = MemoryJobStore()
+    payload = json.dumps({"spool_path": str(spool)})
+    await store.create(Job(id="old", kind="echo", status=SUCCEEDED, payload=payload, finished_at=now - timedelta(seconds=120)))
+    await store.create(Job(id="recent", kind="echo", status=FAILED, payload="{}", finished_at=now))
+    await store.create(Job(id="queued", kind="echo", status=QUEUED, payload="{}"))
+    await JobQueue(store, workers=1, max_pending=10, max_attempts=2).purge()
+    return [job_id for job_id in ("old", "recent", "queued") if await store.get(job_id)]
+
+  assert asyncio.run(scenario()) == ["recent", "queued"]
+  assert not spool.exists()
+
+
+def test_file_parse_job_parses_enough_text_to_summarize(monkeypatch, tmp_path):
+  monkeypatch.setattr(settings, "DOC_CACHE_ENABLED", False)
+  monkeypatch.setattr(settings, "FILE_PARSE_CHAR_LIMIT", 100)
+  monkeypatch.setattr(settings, "SUMMARY_MAX_INPUT_CHARS", 5000)
+  summarized: list[int] = []
+
+  async def summarize_job(payload: dict) -> dict:
+    summarized.append(len(payload["text"]))
+    return {"summary": "short"}
+
+  monkeypatch.setattr(job_service, "_summarize_job", summarize_job)
+  spool = tmp_path / "doc.txt"
+  spool.write_text("word " * 2000)
+  payload = {"spool_path": str(spool), "digest": "d", "ext": "txt", "filename": "doc.txt"}
+
+  parsed = asyncio.run(job_service._file_parse_job({**payload, "summarize": None}))
+  summarized_result = asyncio.run(job_service._file_parse_job({**payload, "summarize": {"ratio": 0.2}}))
+  assert len(parsed["text"]) == 100 and parsed["meta"]["truncated"]
+  assert summarized == [5000]
+  assert summarized_result["summary"] == {"summary": "short"}
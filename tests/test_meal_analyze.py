@@ -0,0 +1,59 @@
+import asyncio
+
+from server.app.core.concurrency import ByteBudget
+from server.app.core.config import settings
+from server.app.services import meal_service
+
+
+def test_analysis_settings_split_the_single_flight(monkeypatch):
+  calls: list[int] = []
+
+  async def analyze_photo(image_bytes, mime_type, stored):
+    call = len(calls)
+    calls.append(call)
+    await asyncio.sleep(0.01)
+    return {"call": call}, True, "fake-model"
+
+  monkeypatch.setattr(meal_service, "_analyze_photo", analyze_photo)
+
+  async def run() -> list:
+    monkeypatch.setattr(settings, "QWEN_VL_USE_JSON_SCHEMA", True)
+    first = asyncio.ensure_future(meal_service.analyze_meal_image_bytes(b"photo", "image/jpeg"))
+    same = asyncio.ensure_future(meal_service.analyze_meal_image_bytes(b"photo", "image/jpeg"))
+    await asyncio.sleep(0)
+    monkeypatch.setattr(settings, "QWEN_VL_USE_JSON_SCHEMA", False)
+    other = asyncio.ensure_future(meal_service.analyze_meal_image_bytes(b"photo", "image/jpeg"))
+    return await asyncio.gather(first, same, other)
+
+  results = asyncio.run(run())
+  assert [result for result, _, _ in results] == [{"call": 0}, {"call": 0}, {"call": 1}]
+  assert len(calls) == 2
+
+
+def test_shared_analysis_keeps_the_leaders_memory_until_it_ends(monkeypatch):
+  release = asyncio.Event()
+
+  async def analyze_photo(image_bytes, mime_type, stored):
+    await release.wait()
+    return {"foods": []}, True, "fake-model"
+
+  monkeypatch.setattr(meal_service, "_analyze_photo", analyze_photo)
+
+  async def scenario():
+    budget = ByteBudget("test", max_bytes=100, wait_timeout=5)
+    leader_lease = await budget.acquire(30)
+    leader = asyncio.ensure_future(meal_service.analyze_meal_image_bytes(b"shared", "image/jpeg", lease=leader_lease))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(meal_service.analyze_meal_image_bytes(b"shared", "image/jpeg"))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    leader_lease.release()
+    held_after_leader_left = budget.in_use
+    release.set()
+    result = await follower
+    return held_after_leader_left, budget.in_use, result
+
+  held, after, result = asyncio.run(asyncio.wait_for(scenario(), 2))
+  assert (held, after) == (30, 0)
+  assert result == ({"foods": []}, True, "fake-model")
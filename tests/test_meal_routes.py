@@ -0,0 +1,54 @@
+from server.app.schemas.meal import FoodNutritionItem, MealAnalyzeMeta, MealAnalyzeResponse, MealTotals
+from server.app.services import meal_service
+
+BAD_TOKEN = {"Authorization": "Bearer not-a-token"}
+
+
+def _fake_analysis(monkeypatch) -> list[str]:
+  calls: list[str] = []
+
+  async def analyze_meal(image_bytes, mime_type, filename, size, lease=None) -> MealAnalyzeResponse:
+    calls.append(filename)
+    food = FoodNutritionItem(food_name="米饭", weight=200, calories=232, carbohydrates=51.8, protein=5.2, fat=0.6)
+    return MealAnalyzeResponse(
+      foods=[food],
+      totals=MealTotals(weight=200, calories=232, carbohydrates=51.8, protein=5.2, fat=0.6),
+      meta=MealAnalyzeMeta(filename=filename, size=size, mime=mime_type),
+    )
+
+  monkeypatch.setattr(meal_service, "analyze_meal", analyze_meal)
+  return calls
+
+
+def _upload(name: str = "meal.jpg") -> dict:
+  return {"file": (name, b"\xff\xd8\xff\xe0 not really a jpeg", "image/jpeg")}
+
+
+def test_history_requires_a_valid_token(client):
+  assert client.get("/api/meal/history/daily").status_code == 401
+  assert client.get("/api/meal/history/daily", headers=BAD_TOKEN).status_code == 401
+  assert client.get("/api/meal/history/daily", headers={"X-User-Id": "someone-else"}).status_code == 401
+
+
+def test_analysis_is_recorded_for_the_token_user_only(client, user, monkeypatch):
+  calls = _fake_analysis(monkeypatch)
+  anonymous = client.post("/api/meal/analyze", files=_upload(), headers={"X-User-Id": str(user["id"])})
+  assert anonymous.status_code == 200 and anonymous.json()["record_id"] is None
+
+  signed_in = client.post("/api/meal/analyze", files=_upload(), headers=user["headers"])
+  assert signed_in.status_code == 200 and signed_in.json()["record_id"] is not None
+
+  history = client.get("/api/meal/history/daily", headers=user["headers"])
+  assert history.status_code == 200
+  body = history.json()
+  assert (body["user_id"], body["meals"]) == (str(user["id"]), 1)
+  assert len(calls) == 2
+
+
+def test_invalid_token_is_rejected_before_analysis(client, monkeypatch):
+  calls = _fake_analysis(monkeypatch)
+  response = client.post("/api/meal/analyze", files=_upload(), headers=BAD_TOKEN)
+  assert response.status_code == 401
+  batch = client.post("/api/meal/analyze/batch", files=[("files", ("a.jpg", b"x", "image/jpeg"))], headers=BAD_TOKEN)
+  assert batch.status_code == 401
+  assert calls == []
@@ -0,0 +1,33 @@
+import asyncio
+
+from server.app.core import metrics
+
+
+async def _ok(scope, receive, send):
+  await send({"type": "http.response.start", "status": 204, "headers": []})
+  await send({"type": "http.response.body", "body": b""})
+
+
+def _call(middleware: metrics.MetricsMiddleware, content_length: bytes) -> list[dict]:
+  sent: list[dict] = []
+
+  async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+  async def send(message):
+    sent.append(message)
+
+  scope = {"type": "http", "method": "POST", "path": "/size-test", "headers": [(b"content-length", content_length)]}
+  asyncio.run(middleware(scope, receive, send))
+  return sent
+
+
+def test_malformed_content_length_skips_the_size_sample():
+  middleware = metrics.MetricsMiddleware(_ok)
+  _, request_size, _ = middleware._series_for("POST", "<unmatched>", 204)
+  before = sum(request_size.counts)
+
+  assert _call(middleware, b"not-a-number")[0]["status"] == 204
+  assert sum(request_size.counts) == before
+  _call(middleware, b"42")
+  assert sum(request_size.counts) == before + 1
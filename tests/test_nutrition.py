@@ -0,0 +1,56 @@
+import pytest
+
+from server.app.services import nutrition_service
+from server.app.services.nutrition_service import DEFAULT_TABLE_PATH, NutritionTable, apply_nutrition, normalize_food_name
+
+
+@pytest.fixture(scope="module")
+def table() -> NutritionTable:
+  return NutritionTable.load(DEFAULT_TABLE_PATH, min_score=0.6)
+
+
+def _matched_name(table: NutritionTable, query: str) -> str | None:
+  found = table.match(query)
+  return table.names[found[0]] if found else None
+
+
+def test_normalize_food_name_drops_width_case_and_portion_words():
+  assert normalize_food_name("一碗 Ｃｏｋｅ！") == "coke"
+  assert normalize_food_name("约200g米饭") == "200g米饭"
+
+
+@pytest.mark.parametrize("query, expected", [
+  ("米饭", "米饭"),
+  ("一碗白米饭", "米饭"),
+  ("西红柿炒鸡蛋", "番茄炒蛋"),
+  ("红烧鸡腿", "鸡腿"),
+  ("炸鸡翅", "鸡翅"),
+])
+def test_matches_names_aliases_and_dishes_ending_in_a_food(table, query, expected):
+  assert _matched_name(table, query) == expected
+
+
+@pytest.mark.parametrize("query", ["牛肉饭", "牛肉汤", "鸡蛋汤", "鸡肉", "宫保皮蛋酥"])
+def test_rejects_foods_that_only_contain_a_known_food(table, query):
+  assert _matched_name(table, query) is None
+
+
+def test_strong_scores_do_not_need_to_end_the_name():
+  rows = [("卤牛肉", [], (246.0, 3.2, 31.4, 11.9))]
+  assert NutritionTable(rows, min_score=0.6, strong_score=0.9).match("卤牛肉片") is not None
+  assert NutritionTable(rows, min_score=0.6, strong_score=0.95).match("卤牛肉片") is None
+
+
+def test_apply_nutrition_recomputes_matches_and_keeps_model_numbers_otherwise(table, monkeypatch):
+  monkeypatch.setattr(nutrition_service, "nutrition_table", table)
+  foods = [
+    {"food_name": "一碗白米饭", "weight": 200, "calories": 230, "carbohydrates": 52, "protein": 5, "fat": 1},
+    {"food_name": "牛肉饭", "weight": 400, "calories": 620, "carbohydrates": 80, "protein": 30, "fat": 18},
+  ]
+  items, matched, outliers = apply_nutrition(foods)
+  assert (matched, outliers) == (1, 0)
+  rice, beef_rice = items
+  assert (rice["food_name"], rice["raw_name"], rice["matched"]) == ("米饭", "一碗白米饭", True)
+  assert rice["calories"] == pytest.approx(232.0)
+  assert beef_rice["calories"] == 620 and "matched" not in beef_rice
+  assert foods[0]["food_name"] == "一碗白米饭"
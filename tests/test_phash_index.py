@@ -0,0 +1,69 @@
+import io
+import random
+
+import pytest
+
+from server.app.cache.phash_index import PerceptualHashIndex
+from server.app.services.meal_service import compute_image_dhash
+
+
+def flip(image_hash: int, *bits: int) -> int:
+  for bit in bits:
+    image_hash ^= 1 << bit
+  return image_hash
+
+
+def test_lookup_within_max_distance():
+  index = PerceptualHashIndex(max_entries=10, max_distance=4)
+  base = 0x0F0F_1234_ABCD_5678
+  index.add(base, "key")
+  assert index.lookup(base) == "key"
+  assert index.lookup(flip(base, 0, 17, 40, 63)) == "key"
+  assert index.lookup(flip(base, 0, 17, 40, 50, 63)) is None
+
+
+def test_lookup_prefers_the_closest_hash():
+  index = PerceptualHashIndex(max_entries=10, max_distance=4)
+  base = 0x1111_2222_3333_4444
+  index.add(flip(base, 1, 2, 3), "far")
+  index.add(flip(base, 60), "near")
+  assert index.lookup(base) == "near"
+
+
+def test_eviction_removes_the_least_recently_used_hash():
+  index = PerceptualHashIndex(max_entries=2, max_distance=2)
+  a, b, c = 0, (1 << 64) - 1, 0xFFFF_FFFF_0000_0000
+  index.add(a, "a")
+  index.add(b, "b")
+  assert index.lookup(a) == "a"  # "b" is now the least recently used
+  index.add(c, "c")
+  assert len(index) == 2
+  assert index.lookup(b) is None
+  assert index.lookup(a) == "a"
+  assert index.lookup(c) == "c"
+
+
+def test_matches_brute_force_search():
+  rnd = random.Random(7)
+  index = PerceptualHashIndex(max_entries=1000, max_distance=4)
+  stored = {rnd.getrandbits(64): str(i) for i in range(300)}
+  for image_hash, value in stored.items():
+    index.add(image_hash, value)
+  for image_hash in list(stored)[:100]:
+    query = flip(image_hash, *rnd.sample(range(64), rnd.randrange(0, 7)))
+    nearest = min(stored, key=lambda h: (h ^ query).bit_count())
+    expected = stored[nearest] if (nearest ^ query).bit_count() <= 4 else None
+    assert index.lookup(query) == expected
+
+
+def test_dhash_survives_reencoding():
+  Image = pytest.importorskip("PIL.Image")
+  img = Image.effect_noise((640, 480), 60).convert("RGB").resize((64, 48)).resize((640, 480))
+  original, recompressed = io.BytesIO(), io.BytesIO()
+  img.save(original, "PNG")
+  img.save(recompressed, "JPEG", quality=60)
+  first = compute_image_dhash(original.getvalue())
+  second = compute_image_dhash(recompressed.getvalue())
+  assert first is not None and second is not None
+  assert (first ^ second).bit_count() <= 4
+  assert compute_image_dhash(b"not an image") is None
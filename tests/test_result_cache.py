@@ -0,0 +1,129 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from server.app.cache import cache_service
+from server.app.cache.cache_service import ResultCache, TTLCache, make_cache_key
+
+
+class FakeClock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self) -> float:
+    return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+  fake = FakeClock()
+  # Only the cache module's clock: asyncio's own timers keep running on the real one.
+  monkeypatch.setattr(cache_service, "time", SimpleNamespace(monotonic=fake, perf_counter=time.perf_counter))
+  return fake
+
+
+def test_make_cache_key_is_length_prefixed():
+  assert make_cache_key("ab", "c") != make_cache_key("a", "bc")
+  assert make_cache_key("ab", b"c") == make_cache_key(b"ab", "c")
+
+
+def test_ttl_cache_expires_entries(clock):
+  cache = TTLCache(max_entries=10, ttl_seconds=60)
+  cache.set("a", 1)
+  clock.now += 59
+  assert cache.get("a") == 1
+  clock.now += 2
+  assert cache.get("a") is None
+  assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+  cache = TTLCache(max_entries=2, ttl_seconds=60)
+  cache.set("a", 1)
+  cache.set("b", 2)
+  assert cache.get("a") == 1  # "b" is now the least recently used
+  cache.set("c", 3)
+  assert cache.get("b") is None
+  assert cache.get("a") == 1
+  assert cache.get("c") == 3
+
+
+def test_result_cache_counts_hits_and_misses(clock):
+  cache = ResultCache("test_counts", max_entries=10, ttl_seconds=60)
+
+  async def scenario():
+    assert await cache.get("k") is None
+    await cache.set("k", {"v": 1})
+    assert await cache.get("k") == {"v": 1}
+    clock.now += 61
+    assert await cache.get("k") is None
+
+  asyncio.run(scenario())
+  stats = cache.stats()
+  assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_get_or_compute_shares_one_computation(clock):
+  cache = ResultCache("test_compute", max_entries=10, ttl_seconds=60)
+  calls = 0
+
+  async def compute():
+    nonlocal calls
+    calls += 1
+    await asyncio.sleep(0.01)
+    return "value"
+
+  async def scenario():
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+    assert [value for value, _ in results] == ["value"] * 5
+    assert sum(from_cache for _, from_cache in results) == 4
+    assert await cache.get_or_compute("k", compute) == ("value", True)
+
+  asyncio.run(scenario())
+  assert calls == 1
+
+
+def test_get_or_compute_does_not_cache_failures(clock):
+  cache = ResultCache("test_failure", max_entries=10, ttl_seconds=60)
+  attempts = 0
+
+  async def compute():
+    nonlocal attempts
+    attempts += 1
+    if attempts == 1:
+      raise ValueError("upstream down")
+    return "value"
+
+  async def scenario():
+    with pytest.raises(ValueError):
+      await cache.get_or_compute("k", compute)
+    assert await cache.get_or_compute("k", compute) == ("value", False)
+
+  asyncio.run(scenario())
+
+
+class FakeRedis:
+  def __init__(self, values: dict):
+    self.values = values
+
+  async def get(self, key: str):
+    return self.values.get(key)
+
+  async def set(self, key: str, value: str, ex: int | None = None) -> None:
+    self.values[key] = value
+
+
+def test_corrupt_redis_values_are_recomputed(monkeypatch):
+  cache = ResultCache("test_corrupt", max_entries=10, ttl_seconds=60, use_redis=True)
+  redis = FakeRedis({cache._redis_key("k"): b"\xff not json"})
+  monkeypatch.setattr(cache_service.redis_core, "redis_client", redis)
+
+  async def compute():
+    return {"fresh": True}
+
+  value, from_cache = asyncio.run(cache.get_or_compute("k", compute))
+  assert (value, from_cache) == ({"fresh": True}, False)
+  assert (cache.redis_errors, cache.misses) == (1, 1)
+  assert redis.values[cache._redis_key("k")] == '{"fresh": true}'
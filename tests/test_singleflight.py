@@ -0,0 +1,90 @@
+import asyncio
+
+from server.app.cache.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+  async def scenario():
+    flight = SingleFlight("test")
+    runs = 0
+
+    async def work():
+      nonlocal runs
+      runs += 1
+      await asyncio.sleep(0.01)
+      return "value"
+
+    results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+    return flight, runs, results
+
+  flight, runs, results = asyncio.run(scenario())
+  assert runs == 1
+  assert [value for value, _ in results] == ["value"] * 5
+  assert sorted(shared for _, shared in results) == [False] + [True] * 4
+  assert flight.stats()["coalesced"] == 4
+  assert len(flight) == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+  async def scenario():
+    flight = SingleFlight("test")
+    release = asyncio.Event()
+
+    async def work():
+      await release.wait()
+      return "value"
+
+    first = asyncio.ensure_future(flight.do("k", work))
+    second = asyncio.ensure_future(flight.do("k", work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    return flight, first, await second
+
+  flight, first, (value, shared) = asyncio.run(scenario())
+  assert first.cancelled()
+  assert (value, shared) == ("value", True)
+  assert flight.abandoned == 0
+
+
+def test_task_is_cancelled_when_every_waiter_is_gone():
+  async def scenario():
+    flight = SingleFlight("test")
+    cancelled = asyncio.Event()
+
+    async def work():
+      try:
+        await asyncio.sleep(10)
+      except asyncio.CancelledError:
+        cancelled.set()
+        raise
+
+    callers = [asyncio.ensure_future(flight.do("k", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for caller in callers:
+      caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    await asyncio.sleep(0)
+    return flight
+
+  flight = asyncio.run(scenario())
+  assert flight.abandoned == 1
+  assert len(flight) == 0
+
+
+def test_exceptions_reach_every_waiter_and_are_not_kept():
+  async def scenario():
+    flight = SingleFlight("test")
+
+    async def fail():
+      await asyncio.sleep(0.01)
+      raise ValueError("boom")
+
+    results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+    retry = await flight.do("k", lambda: asyncio.sleep(0, result="ok"))
+    return results, retry
+
+  results, retry = asyncio.run(scenario())
+  assert all(isinstance(r, ValueError) for r in results)
+  assert retry == ("ok", False)
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from server.app.core.config import settings
+from server.app.services import meal_service, storage_service
+from server.app.services.storage_service import ImageStore, LocalStore, OssStore
+
+
+@pytest.fixture
+def local_settings(monkeypatch, tmp_path):
+  monkeypatch.setattr(settings, "STORAGE_BACKEND", "local")
+  monkeypatch.setattr(settings, "STORAGE_LOCAL_DIR", str(tmp_path / "objects"))
+  monkeypatch.setattr(settings, "STORAGE_PUBLIC_BASE_URL", "http://testserver/")
+
+
+def _query(url: str) -> tuple[str, int, str]:
+  parts = urlsplit(url)
+  query = parse_qs(parts.query)
+  key = parts.path.removeprefix(f"{settings.API_PREFIX}/storage/objects/")
+  return key, int(query["expires"][0]), query["signature"][0]
+
+
+def test_local_signed_urls_verify_and_expire(local_settings):
+  store = LocalStore()
+  store.put("meal-images/abc.jpg", bytearray(b"image"), "image/jpeg")
+  key, expires, signature = _query(store.signed_url("meal-images/abc.jpg", 60))
+  assert key == "meal-images/abc.jpg"
+  assert store.verified_path(key, expires, signature).read_bytes() == b"image"
+
+  with pytest.raises(ValueError, match="signature"):
+    store.verified_path(key, expires + 1, signature)
+  with pytest.raises(ValueError, match="signature"):
+    store.verified_path("meal-images/other.jpg", expires, signature)
+  past = int(time.time()) - 1
+  with pytest.raises(ValueError, match="expired"):
+    store.verified_path(key, past, storage_service._local_signature(key, past))
+
+
+def test_local_keys_cannot_escape_the_root(local_settings):
+  store = LocalStore()
+  for key in ("../outside.jpg", "meal-images/../../outside.jpg", "/etc/passwd"):
+    with pytest.raises(ValueError, match="invalid object key"):
+      store.path(key)
+  expires = int(time.time()) + 60
+  with pytest.raises(ValueError):
+    store.verified_path("../outside.jpg", expires, storage_service._local_signature("../outside.jpg", expires))
+
+
+def test_storage_route_serves_only_signed_objects(client, local_settings, monkeypatch):
+  store = ImageStore()
+  monkeypatch.setattr(storage_service, "image_store", store)
+  monkeypatch.setattr("server.app.api.routes.storage.image_store", store)
+  key = asyncio.run(store.put_image(b"jpeg bytes", "image/jpeg"))
+  url = store.signed_url(key)
+  ok = client.get(urlsplit(url).path + "?" + urlsplit(url).query)
+  assert ok.status_code == 200 and ok.content == b"jpeg bytes"
+  assert client.get(urlsplit(url).path, params={"expires": 1, "signature": "0" * 64}).status_code == 403
+
+
+def test_identical_images_are_stored_once(local_settings):
+  store = ImageStore()
+
+  async def scenario():
+    keys = await asyncio.gather(*(store.put_image(b"same image", "image/png") for _ in range(3)))
+    keys.append(await store.put_image(b"same image", "image/png"))
+    return keys
+
+  keys = asyncio.run(scenario())
+  assert len(set(keys)) == 1 and keys[0].endswith(".png")
+  assert store.stored == 1
+
+
+def test_oss_urls_are_presigned_locally(monkeypatch):
+  pytest.importorskip("oss2")
+  monkeypatch.setattr(settings, "OSS_ACCESS_KEY_ID", "test-key-id")
+  monkeypatch.setattr(settings, "OSS_ACCESS_KEY_SECRET", "test-secret")
+  monkeypatch.setattr(settings, "OSS_BUCKET_NAME", "meal-bucket")
+  monkeypatch.setattr(settings, "OSS_ENDPOINT", "https://oss-cn-hangzhou.aliyuncs.com")
+  url = OssStore().signed_url("meal-images/abc.jpg", 900)
+  parts = urlsplit(url)
+  query = parse_qs(parts.query)
+  assert parts.scheme == "https" and parts.netloc == "meal-bucket.oss-cn-hangzhou.aliyuncs.com"
+  assert parts.path == "/meal-images/abc.jpg"
+  assert query["OSSAccessKeyId"] == ["test-key-id"]
+  assert 0 < int(query["Expires"][0]) - time.time() <= 900
+  assert query["Signature"][0]
+
+
+def test_oss_store_needs_credentials(monkeypatch):
+  monkeypatch.setattr(settings, "OSS_ACCESS_KEY_ID", None)
+  with pytest.raises(ValueError):
+    OssStore()
+
+
+def test_analyze_meal_finishes_the_store_before_returning(local_settings, monkeypatch):
+  monkeypatch.setattr(settings, "MEAL_IMAGE_URL_MIN_KB", 0)
+  monkeypatch.setattr(settings, "MEAL_IMAGE_PREPROCESS", False)
+  events: list[str] = []
+
+  async def store_image(image_bytes, mime_type):
+    await asyncio.sleep(0.05)
+    events.append("stored")
+    return "http://testserver/signed"
+
+  async def analyze(image_bytes, mime_type, image_url, lease=None):
+    events.append(f"analyzed {image_url}")
+    return {"foods": []}, True, "fake-model"
+
+  monkeypatch.setattr(meal_service, "_store_image", store_image)
+  monkeypatch.setattr(meal_service, "analyze_meal_image_bytes", analyze)
+
+  async def scenario():
+    response = await meal_service.analyze_meal(b"unique image for store test", "image/jpeg", "a.jpg", 27)
+    events.append("returned")
+    return response, len(meal_service._store_tasks)
+
+  _, pending = asyncio.run(scenario())
+  assert events == ["stored", "analyzed http://testserver/signed", "returned"]
+  assert pending == 0
+
+
+def test_cancelled_request_cancels_its_store(local_settings, monkeypatch):
+  monkeypatch.setattr(settings, "MEAL_IMAGE_URL_MIN_KB", 0)
+  monkeypatch.setattr(settings, "MEAL_IMAGE_PREPROCESS", False)
+
+  async def store_image(image_bytes, mime_type):
+    await asyncio.sleep(10)
+
+  monkeypatch.setattr(meal_service, "_store_image", store_image)
+
+  async def scenario():
+    request = asyncio.ensure_future(meal_service.analyze_meal(b"another unique image", "image/jpeg", "b.jpg", 20))
+    while not meal_service._store_tasks:
+      await asyncio.sleep(0)
+    tasks = list(meal_service._store_tasks)
+    request.cancel()
+    await asyncio.gather(request, *tasks, return_exceptions=True)
+    return [task.cancelled() for task in tasks], len(meal_service._store_tasks)
+
+  assert asyncio.run(asyncio.wait_for(scenario(), 2)) == ([True], 0)
+
+
+def test_cancelled_leader_does_not_fail_coalesced_requests(local_settings, monkeypatch):
+  monkeypatch.setattr(settings, "MEAL_IMAGE_URL_MIN_KB", 0)
+  monkeypatch.setattr(settings, "MEAL_IMAGE_PREPROCESS", False)
+  image = b"one photo shared by two requests"
+
+  async def store_image(image_bytes, mime_type):
+    await asyncio.sleep(0.01)
+    return "http://testserver/signed"
+
+  monkeypatch.setattr(meal_service, "_store_image", store_image)
+
+  async def scenario():
+    release = asyncio.Event()
+
+    async def analyze_meal_photo(image_bytes, mime_type, image_url=None):
+      await release.wait()
+      return {"foods": []}, True, f"fake-model via {image_url}"
+
+    monkeypatch.setattr(meal_service, "analyze_meal_photo", analyze_meal_photo)
+    key = meal_service.make_cache_key(meal_service.meal_cache_key(image), "image/jpeg")
+    leader = asyncio.ensure_future(meal_service.analyze_meal(image, "image/jpeg", "a.jpg", len(image)))
+    while not meal_service.analyze_flight.in_flight(key):
+      await asyncio.sleep(0.001)
+    follower = asyncio.ensure_future(meal_service.analyze_meal(image, "image/jpeg", "b.jpg", len(image)))
+    while meal_service.analyze_flight._flights[key].waiters < 2:
+      await asyncio.sleep(0.001)
+    leader.cancel()
+    await asyncio.gather(leader, return_exceptions=True)
+    release.set()
+    return leader.cancelled(), await follower
+
+  leader_cancelled, response = asyncio.run(asyncio.wait_for(scenario(), 2))
+  assert leader_cancelled
+  assert response.meta.model == "fake-model via http://testserver/signed"
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from server.app.core.config import settings
+from server.app.services import text_service
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+  monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test")
+  monkeypatch.setattr(settings, "SUMMARY_CHUNK_TOKENS", 60)
+  calls: list[str] = []
+
+  async def request_summary(text: str, max_tokens: int, prompt: str) -> tuple[str, str]:
+    calls.append(text)
+    return f"summary of {len(text)} chars", "fake-model"
+
+  monkeypatch.setattr(text_service, "_request_summary", request_summary)
+  return calls
+
+
+def _article(edited: str = "") -> str:
+  paragraphs = [f"Paragraph {i} talks about topic {i} at some length, with a few more words." * 2 for i in range(8)]
+  paragraphs[5] += edited
+  return "\r\n\r\n".join(paragraphs)
+
+
+def test_map_reduce_chunks_on_paragraphs_of_the_original_text(fake_llm):
+  result, cached = asyncio.run(text_service.summarize(_article(), ratio=0.3, max_tokens=200, use_map_reduce=True))
+  assert not cached
+  assert result["stats"]["chunks"] > 1
+  assert all(chunk.startswith("Paragraph") for chunk in fake_llm[:result["stats"]["chunks"]])
+
+
+def test_small_edit_reuses_other_chunk_summaries(fake_llm):
+  first, _ = asyncio.run(text_service.summarize(_article(" Edit A."), ratio=0.3, max_tokens=200, use_map_reduce=True))
+  second, _ = asyncio.run(text_service.summarize(_article(" Edit B."), ratio=0.3, max_tokens=200, use_map_reduce=True))
+  assert second["stats"]["chunks"] == first["stats"]["chunks"]
+  assert second["stats"]["cached_chunks"] == second["stats"]["chunks"] - 1
+
+
+def test_whitespace_variants_share_the_cache_entry(fake_llm):
+  text = "One line.\nAnother line with  extra   spaces."
+  asyncio.run(text_service.summarize(text, ratio=0.3, max_tokens=200, use_map_reduce=False))
+  _, cached = asyncio.run(text_service.summarize(text.replace("\n", "\r\n\r\n"), ratio=0.3, max_tokens=200, use_map_reduce=False))
+  assert cached
+  assert len(fake_llm) == 1
+  assert "\n" in fake_llm[0]
+
+
+def test_stream_summarizes_sanitized_text(client, monkeypatch):
+  seen: list[str] = []
+
+  async def stream(text: str, max_tokens: int):
+    seen.append(text)
+    yield "Short summary."
+
+  monkeypatch.setattr(text_service, "stream_summarize_llm", stream)
+  response = client.post("/api/text/summarize/stream", json={"text": "Zero​width\x07 text.\r\n\r\n\r\n\r\nNext  part."})
+  assert response.status_code == 200
+  assert "event: done" in response.text
+  assert seen == [text_service.sanitize_text("Zero​width\x07 text.\r\n\r\n\r\n\r\nNext  part.")]
+  assert "​" not in seen[0] and "\x07" not in seen[0] and "\r" not in seen[0]
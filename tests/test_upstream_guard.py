@@ -0,0 +1,181 @@
+import asyncio
+import random
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from server.app.core import http_core, upstream_guard
+from server.app.core.config import settings
+from server.app.core.upstream_guard import CLOSED, HALF_OPEN, OPEN, UpstreamGuard, UpstreamUnavailableError
+from server.app.services import text_service
+
+
+class Clock:
+  def __init__(self):
+    self.now = 1000.0
+
+  def monotonic(self) -> float:
+    return self.now
+
+  def advance(self, seconds: float) -> None:
+    self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock = Clock()
+  monkeypatch.setattr(upstream_guard, "time", SimpleNamespace(monotonic=clock.monotonic))
+  return clock
+
+
+def _guard(**overrides) -> UpstreamGuard:
+  options = {
+    "min_limit": 2, "initial_limit": 16, "max_limit": 16, "latency_tolerance": 2.0,
+    "queue_timeout": 0.05, "breaker_failures": 3, "breaker_cooldown": 10.0, **overrides,
+  }
+  return UpstreamGuard("fake", **options)
+
+
+async def _call(guard: UpstreamGuard, clock: Clock, latency: float, error: Exception | None = None) -> None:
+  """
+  One attempt against a fake upstream that answers after `latency` seconds (or raises `error`).
+  """
+  async with guard.acquire():
+    clock.advance(latency)
+    if error is not None:
+      raise error
+
+
+def test_variable_latency_keeps_the_limit(clock):
+  guard = _guard()
+  rnd = random.Random(1)
+
+  async def scenario():
+    for _ in range(300):
+      await _call(guard, clock, rnd.lognormvariate(0, 0.6))
+
+  asyncio.run(scenario())
+  assert int(guard.limit) == 16
+
+
+def test_sustained_slowdown_shrinks_the_limit_and_it_recovers(clock):
+  guard = _guard()
+
+  async def scenario(latency: float, calls: int) -> int:
+    for _ in range(calls):
+      await _call(guard, clock, latency)
+    return int(guard.limit)
+
+  assert asyncio.run(scenario(1.0, 100)) == 16
+  assert asyncio.run(scenario(3.0, 30)) == 2
+  assert asyncio.run(scenario(1.0, 200)) == 16
+
+
+def test_queued_calls_are_shed_after_the_queue_wait(clock):
+  guard = _guard(min_limit=1, initial_limit=1, max_limit=1)
+
+  async def scenario():
+    release = asyncio.Event()
+
+    async def hold():
+      async with guard.acquire():
+        await release.wait()
+
+    holder = asyncio.ensure_future(hold())
+    await asyncio.sleep(0)
+    with pytest.raises(UpstreamUnavailableError, match="overloaded"):
+      async with guard.acquire():
+        pass
+    release.set()
+    await holder
+
+  asyncio.run(scenario())
+  assert guard.shed == 1
+  assert guard.in_flight == 0
+
+
+def test_queue_wait_scales_with_baseline_latency(clock):
+  guard = _guard(queue_timeout=2.0)
+  assert guard.queue_wait() == 2.0
+
+  async def scenario():
+    for _ in range(30):
+      await _call(guard, clock, 5.0)
+
+  asyncio.run(scenario())
+  assert guard.queue_wait() == 10.0
+
+
+def test_breaker_opens_probes_and_closes(clock):
+  guard = _guard()
+  outage = httpx.ConnectError("refused")
+
+  async def scenario():
+    for _ in range(3):
+      with pytest.raises(httpx.ConnectError):
+        await _call(guard, clock, 0.1, outage)
+    assert guard.state == OPEN
+    with pytest.raises(UpstreamUnavailableError, match="circuit open"):
+      await _call(guard, clock, 0.1)
+
+    clock.advance(10.0)
+    with pytest.raises(httpx.ConnectError):
+      await _call(guard, clock, 0.1, outage)  # failed probe: open again
+    assert guard.state == OPEN
+
+    clock.advance(10.0)
+    release = asyncio.Event()
+
+    async def probe():
+      async with guard.acquire():
+        await release.wait()
+
+    prober = asyncio.ensure_future(probe())
+    await asyncio.sleep(0)
+    assert guard.state == HALF_OPEN
+    with pytest.raises(UpstreamUnavailableError, match="half-open"):
+      await _call(guard, clock, 0.1)
+    release.set()
+    await prober
+
+  asyncio.run(scenario())
+  assert guard.state == CLOSED
+  assert guard.opened == 2
+
+
+def test_client_errors_are_not_failures_or_latency_samples(clock):
+  guard = _guard()
+  rejected = httpx.HTTPStatusError("bad request", request=None, response=httpx.Response(400))
+
+  async def scenario():
+    for _ in range(5):
+      with pytest.raises(httpx.HTTPStatusError):
+        await _call(guard, clock, 0.1, rejected)
+    async with guard.acquire() as slot:
+      slot.skip_latency()
+
+  asyncio.run(scenario())
+  assert (guard.failures, guard.state) == (0, CLOSED)
+  assert guard.baseline_latency is None
+
+
+def test_summary_4xx_is_not_sampled(clock, monkeypatch):
+  guard = _guard()
+  monkeypatch.setattr(text_service, "openrouter_guard", guard)
+  monkeypatch.setattr(settings, "OPENROUTER_API_KEY", "test")
+  responses = iter([httpx.Response(400, text="bad model"), httpx.Response(503), httpx.Response(503)])
+
+  def handler(request: httpx.Request) -> httpx.Response:
+    return next(responses)
+
+  client = httpx.AsyncClient(transport=httpx.MockTransport(handler), base_url="http://fake")
+  monkeypatch.setattr(http_core, "get_openrouter_client", lambda: client)
+  monkeypatch.setattr(text_service, "_backoff_delay", lambda attempt, retry_after: 0)
+
+  with pytest.raises(ValueError, match="400"):
+    asyncio.run(text_service._request_summary("text", 100, text_service.SUMMARY_PROMPT))
+  assert (guard.successes, guard.failures, guard.baseline_latency) == (1, 0, None)
+  with pytest.raises(ValueError, match="503"):
+    asyncio.run(text_service._request_summary("text", 100, text_service.SUMMARY_PROMPT))
+  assert guard.failures == 2